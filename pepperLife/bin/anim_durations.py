@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+anim_durations.py — extraction rapide de la durée des animations (.qianim / .xar)
+
+Pas d'arbre XML complet:
+- .qianim : max(Key@frame) / fps. Balayage lexical des octets bruts (toutes les
+  clés doivent être lues, c'est ce qui coûte), repli sur iterparse en flux
+  (éléments vidés au fil de l'eau) si le fichier contient commentaires ou CDATA.
+  Les octets parasites après la racine (fichiers Choregraphe mal exportés) sont
+  ignorés sans relire ni redécoder le fichier.
+- .xar    : iterparse, arrêt dès la première balise Timeline (attributs fps / size).
+
+compute_durations() répartit le travail sur un pool de processus quand la
+bibliothèque est grande. Les workers sont lancés en 'spawn' (interpréteur neuf),
+jamais par fork: le service qi est multithread et un fork peut hériter d'un verrou
+tenu par un autre thread et bloquer le worker indéfiniment. Module volontairement
+sans dépendance à qi pour pouvoir être importé par les workers et par
+testScripts/bench_anim_durations.py.
+"""
+import os
+import re
+import multiprocessing
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_FPS = 25
+# Attributs lus par le balayage rapide des .qianim (octets bruts)
+RE_KEY_FRAME = re.compile(br'<Key\b[^>]*?\sframe="(-?\d+)"')
+RE_CURVE_FPS = re.compile(br'<ActuatorCurve\b[^>]*?\sfps="(\d+)"')
+# En dessous de ce nombre de fichiers, le coût de démarrage du pool dépasse le gain
+# (spawn: un interpréteur neuf par worker, ~0,3 ms de calcul séquentiel par fichier).
+POOL_MIN_FILES = 2000
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _qianim_scan_bytes(data):
+    """Balayage lexical des octets bruts (pas de décodage ni d'arbre XML).
+    Retourne (max_frame, fps) ou None si le fichier sort du format simple
+    (commentaires, CDATA, aucune clé) et doit passer par le parseur XML."""
+    if b'<!--' in data or b'<![CDATA[' in data:
+        return None
+    frames = RE_KEY_FRAME.findall(data)
+    if not frames:
+        return None
+    fps_values = RE_CURVE_FPS.findall(data)
+    fps = int(fps_values[-1]) if fps_values else DEFAULT_FPS
+    return max(int(f) for f in frames), fps
+
+
+def _qianim_iterparse(path):
+    """Lecture en flux (iterparse), chaque élément est vidé dès qu'il est lu."""
+    max_frame = 0
+    fps = DEFAULT_FPS
+    try:
+        for _event, elem in ET.iterparse(path, events=('end',)):
+            tag = _local_name(elem.tag)
+            if tag == 'Key':
+                try:
+                    frame = int(elem.get('frame'))
+                    if frame > max_frame:
+                        max_frame = frame
+                except (ValueError, TypeError):
+                    pass
+                elem.clear()
+            elif tag == 'ActuatorCurve':
+                raw_fps = elem.get('fps')
+                if raw_fps is not None:
+                    try:
+                        fps = int(raw_fps)
+                    except (ValueError, TypeError):
+                        pass
+                elem.clear()
+    except ET.ParseError as parse_err:
+        # Octets parasites après la racine: le document est complet, on garde le résultat.
+        if "junk after document element" not in str(parse_err).lower():
+            raise
+    return max_frame, fps
+
+
+def qianim_duration(path):
+    """Durée (s) d'un .qianim, 0.0 si aucune clé exploitable."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    scanned = _qianim_scan_bytes(data)
+    max_frame, fps = scanned if scanned is not None else _qianim_iterparse(path)
+    if max_frame > 0 and fps > 0:
+        return float(max_frame) / float(fps)
+    return 0.0
+
+
+def xar_duration(path):
+    """Durée (s) d'un behavior.xar d'après sa Timeline, 0.0 si absente."""
+    for _event, elem in ET.iterparse(path, events=('start',)):
+        if _local_name(elem.tag) == 'Timeline':
+            fps = float(elem.get('fps', DEFAULT_FPS))
+            size = float(elem.get('size', 0))
+            if fps > 0 and size > 0:
+                return size / fps
+            return 0.0
+    return 0.0
+
+
+def duration_for(path):
+    """Choisit l'extracteur selon l'extension. Retourne (path, durée, erreur|None)."""
+    try:
+        if path.endswith('.xar'):
+            return path, xar_duration(path), None
+        return path, qianim_duration(path), None
+    except Exception as e:
+        return path, 0.0, str(e)
+
+
+def compute_durations(paths, workers=None, min_pool_files=POOL_MIN_FILES):
+    """
+    Calcule les durées d'une liste de fichiers.
+    Retourne (durations {path: float}, errors {path: str}).
+    Pool de processus si len(paths) >= min_pool_files et plus d'un CPU, sinon séquentiel.
+    """
+    paths = list(paths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    results = None
+    if workers > 1 and len(paths) >= min_pool_files:
+        try:
+            chunksize = max(1, len(paths) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                results = list(pool.map(duration_for, paths, chunksize=chunksize))
+        except Exception:
+            results = None  # pool indisponible (processus interdits, mémoire...) -> séquentiel
+    if results is None:
+        results = [duration_for(p) for p in paths]
+    durations = {}
+    errors = {}
+    for path, duration, error in results:
+        durations[path] = duration
+        if error:
+            errors[path] = error
+    return durations, errors
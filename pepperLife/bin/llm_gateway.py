@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lanceur de la passerelle LLM partagée (services/chatBots/gatewayServer.py).
+
+À exécuter sur une machine du LAN (pas sur le robot), sans qi:
+    python3 bin/llm_gateway.py --config gateway.json --port 11500
+
+La config reprend les sections "openai" et "ollama" de config.json (clés, serveurs, modèles)
+plus une section "gateway_server" (workers, cache, limite par robot). Les robots passent en
+mode de chat 'gateway' avec gateway.url = http://<machine>:11500.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BIN_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(BIN_DIR)
+if PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, PACKAGE_DIR)
+
+from services.chatBots.gatewayServer import DEFAULT_PORT, serve  # noqa: E402
+
+VERBOSE = False
+
+
+def log(msg, level='info', **kwargs):
+    if level == 'debug' and not VERBOSE:
+        return
+    print("{} [{}] {}".format(time.strftime('%H:%M:%S'), level.upper(), msg))
+    sys.stdout.flush()
+
+
+def main():
+    global VERBOSE
+    parser = argparse.ArgumentParser(description="Passerelle LLM partagée PepperLife")
+    parser.add_argument('--config', default=os.path.join(PACKAGE_DIR, 'config.json'))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    VERBOSE = args.verbose
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    gateway, httpd = serve(config, host=args.host, port=args.port, logger=log)
+    log("Passerelle LLM à l'écoute sur {}:{} (workers {})".format(args.host, args.port, gateway.workers))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        log("Arrêt de la passerelle.")
+        gateway.stop()
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
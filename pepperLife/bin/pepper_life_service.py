@@ -12,6 +12,10 @@ Parole:
 - sayAnimatedIsRunning() -> bool
 - stopSayAnimated() -> bool
 - resolveAnimationTags(text) -> str
+- preRenderPhrases([text]) -> int      (cache audio sayToFile + ALAudioPlayer)
+- getPhraseCacheStats() -> {entries, disk_bytes, hits, misses, cache_overhead_ms, live_overhead_ms, ...}
+- clearPhraseCache() -> int
+- getSpeechTimeline(since) -> [[start, end]]  (epoch s, traces de latence par tour)
 
 Animations:
 - playAnimation(anim_path_or_file, block, preempt)  # on passe juste le chemin
@@ -21,6 +25,8 @@ Animations:
 - getApplications() -> [str]
 - getAnimationFamilies() -> [str]
 - getAnimationDurations() -> {str: float}
+- getGesturePool(kind) -> [str]  ('thinking' | 'listening')
+- getSchedulerStats() -> {threads, pending_events, events_run, jitter_ms_avg, jitter_ms_max}
 
 Pensif (loop):
 - think(anim_path_or_file, block, cancel_anims)
@@ -44,9 +50,57 @@ import os
 import time
 import re
 import random
+import heapq
+from collections import OrderedDict, deque
 from pathlib import Path
 import glob
-import xml.etree.ElementTree as ET
+import json
+import difflib
+import hashlib
+import wave
+
+from anim_durations import compute_durations, duration_for
+
+# Index persistant des animations (noms, natures, durées) clé = chemin + mtime + taille.
+# Incrémenter ANIM_CACHE_VERSION dès que le format des entrées change.
+ANIM_CACHE_VERSION = 1
+ANIM_CACHE_PATH = os.environ.get('PEPPER_ANIM_CACHE') or os.path.expanduser('~/.cache/pepperlife/animation_index.json')
+# Nombre de processus pour le calcul des durées (None = nombre de CPU)
+ANIM_SCAN_WORKERS = int(os.environ.get('PEPPER_ANIM_SCAN_WORKERS') or 0) or None
+# Préchargement: taille du warm set, familles les plus utilisées gardées chaudes,
+# attente max (s) d'un préchargement en cours avant de lancer la parole.
+ANIM_USAGE_PATH = os.path.join(os.path.dirname(ANIM_CACHE_PATH), 'animation_usage.json')
+WARM_SET_SIZE = 32
+WARM_TOP_FAMILIES = 6
+PRELOAD_WAIT_MAX = 0.25
+# Estimation de la durée de parole: secondes par caractère, calibrées par voix (EWMA)
+TTS_CALIBRATION_PATH = os.path.join(os.path.dirname(ANIM_CACHE_PATH), 'tts_calibration.json')
+TTS_DEFAULT_RATE = 0.065
+TTS_RATE_ALPHA = 0.2
+# Variantes retenues: les plus courtes couvrant la phrase, jusqu'à +15% de la meilleure
+ANIM_FIT_TOLERANCE = 1.15
+# Seuil difflib pour rattacher un tag inconnu à la famille la plus proche
+ANIM_FUZZY_CUTOFF = 0.75
+# Cache audio des phrases (sayToFile + ALAudioPlayer): dossier, budget disque LRU (Mo),
+# répétitions avant rendu d'une phrase du LLM, longueur max, relecture des réglages de voix (s).
+PHRASE_CACHE_DIR = os.environ.get('PEPPER_PHRASE_CACHE') or os.path.join(os.path.dirname(ANIM_CACHE_PATH), 'phrases')
+PHRASE_CACHE_BUDGET_MB = float(os.environ.get('PEPPER_PHRASE_CACHE_MB') or 50)
+PHRASE_MIN_REPEATS = 3
+PHRASE_MAX_CHARS = 160
+PHRASE_REPEATS_TRACKED = 500
+PHRASE_SETTINGS_CHECK = 5.0
+# Fréquence du PCM brut produit par sayToFile (NAOqi 2.5)
+PHRASE_RAW_RATE = 22050
+# Phrases fixes du robot, rendues au démarrage
+FIXED_PHRASES = [
+    u"Je suis prêt.",
+    u"Je suis réveillé !",
+    u"Petit pépin réseau, on réessaie.",
+    u"Je n'ai pas réussi à prendre de photo.",
+    u"Mode de base activé.",
+    u"Le chatbot est arrêté.",
+    u"Ok, je me mets en attente.",
+]
 
 def setup_logging():
     """Configure logging to a file, erasing it on each start."""
@@ -61,6 +115,354 @@ def setup_logging():
     return logging.getLogger(__name__)
 
 
+class AnimationScheduler(object):
+    """
+    Thread unique (par service) qui exécute à échéance les événements d'animation:
+    lancement, arrêt de sécurité, relance tant que la parole continue.
+    Les événements ne doivent pas bloquer: les comportements sont lancés en _async.
+    Une seconde instance (PepperLifeIO) exécute le travail bloquant (RPC TTS, fichiers) hors de ce thread.
+    """
+    def __init__(self, logger, name="PepperLifeScheduler"):
+        self.logger = logger
+        self._name = name
+        self._queue = []            # tas (échéance, seq, label, fn)
+        self._live = set()          # seq encore à exécuter (annulé = retiré, l'entrée du tas est ignorée à échéance)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._thread = None
+        self._jitter = deque(maxlen=200)
+        self._events_run = 0
+
+    def schedule(self, delay, label, fn):
+        """Planifie fn dans `delay` secondes. Retourne un identifiant annulable."""
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._queue, (time.monotonic() + max(0.0, delay), self._seq, label, fn))
+            self._live.add(self._seq)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self._name)
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+            return self._seq
+
+    def submit(self, label, fn):
+        return self.schedule(0.0, label, fn)
+
+    def cancel(self, event_id):
+        """Annule un événement en attente; sans effet s'il a déjà été exécuté ou n'existe pas."""
+        with self._cond:
+            self._live.discard(event_id)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                due, seq, label, fn = self._queue[0]
+                now = time.monotonic()
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+                heapq.heappop(self._queue)
+                if seq not in self._live:
+                    continue
+                self._live.discard(seq)
+                self._jitter.append(now - due)
+                self._events_run += 1
+            try:
+                fn()
+            except Exception as e:
+                self.logger.error(u"[SCHED] Événement '{}' en erreur: {}".format(label, e))
+
+    def stats(self):
+        with self._cond:
+            jitter = list(self._jitter)
+            pending = len(self._live)
+        return {
+            'threads': threading.active_count(),
+            'pending_events': pending,
+            'events_run': self._events_run,
+            'jitter_ms_avg': round(1000.0 * sum(jitter) / len(jitter), 2) if jitter else 0.0,
+            'jitter_ms_max': round(1000.0 * max(jitter), 2) if jitter else 0.0,
+        }
+
+
+class PhraseAudioCache(object):
+    """
+    Cache disque des phrases pré-rendues (ALTextToSpeech.sayToFile) rejouées par ALAudioPlayer.
+    - Clé = texte + réglages de voix (voix, langue, vitesse, hauteur): un changement de réglage invalide le cache.
+    - Phrases fixes rendues au démarrage, phrases du LLM rendues dès qu'elles reviennent PHRASE_MIN_REPEATS fois.
+    - Lu uniquement par _speak (parole de sayAnimated avec animation explicite); say() reste sur ALAnimatedSpeech.
+    - Budget disque LRU; le rendu (asynchrone, un à la fois) n'a lieu que quand le robot ne parle pas.
+    - Réglages TTS (RPC), rendu et écritures disque passent par `worker` (thread d'E/S), jamais par
+      le planificateur d'animations.
+    """
+    def __init__(self, logger, worker, is_busy=None):
+        self.logger = logger
+        self._worker = worker
+        self._is_busy = is_busy or (lambda: False)
+        self._tts = None
+        self._lock = threading.RLock()
+        self._index = OrderedDict()     # clé -> {text, file, size, duration, settings}, ordre LRU
+        self._repeats = OrderedDict()   # texte -> {count, live}
+        self._queue = deque()
+        self._queued = set()
+        self._rendering = None
+        self._settings = None
+        self._settings_ts = 0.0
+        self._dirty = 0
+        self._samples = {'cache': deque(maxlen=100), 'live': deque(maxlen=100)}
+        self._counters = {'hits': 0, 'misses': 0, 'renders': 0, 'render_errors': 0, 'evictions': 0, 'invalidations': 0}
+        self._load_index()
+
+    def bind(self, tts):
+        self._tts = tts
+
+    @staticmethod
+    def normalize(text):
+        return u" ".join((text or u"").split())
+
+    def _key(self, text, settings):
+        raw = u"{}|{}".format(u"|".join(str(s) for s in settings), text)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    # ---------- persistance ----------
+    def _load_index(self):
+        try:
+            with open(os.path.join(PHRASE_CACHE_DIR, 'index.json'), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for key, entry in data.get('entries', []):
+                if os.path.isfile(os.path.join(PHRASE_CACHE_DIR, entry['file'])):
+                    self._index[key] = entry
+        except Exception:
+            pass
+
+    def _save_index(self):
+        try:
+            if not os.path.isdir(PHRASE_CACHE_DIR):
+                os.makedirs(PHRASE_CACHE_DIR)
+            index_path = os.path.join(PHRASE_CACHE_DIR, 'index.json')
+            with self._lock:
+                payload = {'entries': list(self._index.items())}
+            with open(index_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+            os.replace(index_path + ".tmp", index_path)
+        except Exception as e:
+            self.logger.warning(u"[TTS-CACHE] Sauvegarde de l'index impossible: {}".format(e))
+
+    def _remove_entry(self, key):
+        entry = self._index.pop(key, None)
+        if entry:
+            try: os.remove(os.path.join(PHRASE_CACHE_DIR, entry['file']))
+            except OSError: pass
+        return entry
+
+    # ---------- réglages de voix ----------
+    def _current_settings(self, force=False):
+        """(voix, langue, vitesse, hauteur), relus au plus toutes les PHRASE_SETTINGS_CHECK secondes."""
+        now = time.time()
+        if self._tts is None or (not force and self._settings and now - self._settings_ts < PHRASE_SETTINGS_CHECK):
+            return self._settings
+        try:
+            settings = [self._tts.getVoice(), self._tts.getLanguage()]
+            for param in ("speed", "pitchShift"):
+                try: settings.append(round(float(self._tts.getParameter(param)), 3))
+                except Exception: settings.append(None)
+        except Exception as e:
+            self.logger.debug(u"[TTS-CACHE] Lecture des réglages TTS impossible: {}".format(e))
+            return self._settings
+        self._settings_ts = now
+        previous, self._settings = self._settings, settings
+        if settings != previous:
+            reason = u"réglages TTS {} -> {}".format(previous, settings) if previous else u"réglages TTS {}".format(settings)
+            self.invalidate(reason, only_stale=True)
+        return settings
+
+    def invalidate(self, reason=u"demande explicite", only_stale=False):
+        """Supprime les rendus (seulement ceux d'autres réglages de voix si only_stale)."""
+        with self._lock:
+            current = self._settings
+            stale = [k for k, e in self._index.items() if not only_stale or e.get('settings') != current]
+            for key in stale:
+                self._remove_entry(key)
+            self._counters['invalidations'] += len(stale)
+        if stale:
+            self.logger.info(u"[TTS-CACHE] {} phrase(s) invalidée(s): {}.".format(len(stale), reason))
+            self._save_index()
+        return len(stale)
+
+    # ---------- lecture ----------
+    def lookup(self, text):
+        """Chemin du rendu de `text` pour les réglages courants, ou None (et compte la répétition)."""
+        text = self.normalize(text)
+        if not text or u"^" in text:
+            return None
+        settings = self._current_settings()
+        if settings is None:
+            return None
+        key = self._key(text, settings)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None:
+                self._index.move_to_end(key)
+                self._counters['hits'] += 1
+                self._dirty += 1
+                if self._dirty >= 20:
+                    self._dirty = 0
+                    self._worker.submit(u"phrase-cache-save", self._save_index)
+                return os.path.join(PHRASE_CACHE_DIR, entry['file'])
+            self._counters['misses'] += 1
+            rep = self._repeats.pop(text, None) or {'count': 0, 'live': None}
+            rep['count'] += 1
+            self._repeats[text] = rep
+            while len(self._repeats) > PHRASE_REPEATS_TRACKED:
+                self._repeats.popitem(last=False)
+            frequent = rep['count'] >= PHRASE_MIN_REPEATS and len(text) <= PHRASE_MAX_CHARS
+        if frequent:
+            self.enqueue([text])
+        return None
+
+    def note_playback(self, text, source, seconds):
+        """Mesure une parole complète: surcoût = durée mesurée - durée audio du rendu."""
+        text = self.normalize(text)
+        with self._lock:
+            settings = self._settings
+            entry = self._index.get(self._key(text, settings)) if settings is not None else None
+            if entry is None or not entry.get('duration'):
+                if source == 'live' and text in self._repeats:
+                    self._repeats[text]['live'] = seconds
+                return
+            self._samples[source].append(seconds - entry['duration'])
+
+    # ---------- rendu ----------
+    def enqueue(self, phrases):
+        added = 0
+        with self._lock:
+            for text in phrases:
+                text = self.normalize(text)
+                if not text or text in self._queued:
+                    continue
+                self._queued.add(text)
+                self._queue.append(text)
+                added += 1
+        if added:
+            self._worker.submit(u"phrase-render", self._pump)
+        return added
+
+    def _pump(self):
+        """Lance le rendu suivant si le TTS est libre, sinon réessaie plus tard (jamais bloquant)."""
+        with self._lock:
+            if self._rendering is not None or not self._queue or self._tts is None:
+                return
+        if self._is_busy():
+            self._worker.schedule(1.0, u"phrase-render", self._pump)
+            return
+        with self._lock:
+            if self._rendering is not None or not self._queue:
+                return
+            text = self._queue.popleft()
+        settings = self._current_settings(force=True)
+        if settings is None:
+            with self._lock: self._queued.discard(text)
+            return
+        key = self._key(text, settings)
+        with self._lock:
+            if key in self._index:
+                self._queued.discard(text)
+                self._worker.submit(u"phrase-render", self._pump)
+                return
+            self._rendering = (key, text, settings, time.time())
+        try:
+            if not os.path.isdir(PHRASE_CACHE_DIR):
+                os.makedirs(PHRASE_CACHE_DIR)
+            fut = self._tts.sayToFile(text, os.path.join(PHRASE_CACHE_DIR, key + ".raw"), _async=True)
+            fut.addCallback(lambda f: self._worker.submit(u"phrase-rendered", lambda: self._on_rendered(f)))
+        except Exception as e:
+            self._on_rendered(None, e)
+
+    def _on_rendered(self, fut, error=None):
+        with self._lock:
+            key, text, settings, started = self._rendering
+            self._rendering = None
+            self._queued.discard(text)
+        raw_path = os.path.join(PHRASE_CACHE_DIR, key + ".raw")
+        try:
+            if error is None and (fut.isCanceled() or fut.hasError()):
+                error = fut.error() if fut.hasError() else u"annulé"
+            if error is not None:
+                raise RuntimeError(error)
+            size, duration = self._to_wav(raw_path, os.path.join(PHRASE_CACHE_DIR, key + ".wav"))
+            with self._lock:
+                self._index[key] = {'text': text, 'file': key + ".wav", 'size': size,
+                                    'duration': duration, 'settings': settings}
+                self._counters['renders'] += 1
+                live = (self._repeats.pop(text, None) or {}).get('live')
+                if live and duration:
+                    self._samples['live'].append(live - duration)
+                self._enforce_budget()
+            self.logger.info(u"[TTS-CACHE] Phrase rendue en {:.2f}s ({:.2f}s audio, {} Ko): '{}'".format(
+                time.time() - started, duration or 0.0, size // 1024, text))
+            self._save_index()
+        except Exception as e:
+            with self._lock: self._counters['render_errors'] += 1
+            self.logger.warning(u"[TTS-CACHE] Rendu impossible pour '{}': {}".format(text, e))
+        finally:
+            try: os.remove(raw_path)
+            except OSError: pass
+        self._pump()
+
+    @staticmethod
+    def _to_wav(raw_path, wav_path):
+        """sayToFile écrit du PCM brut (16 bits mono) ou un WAV selon la version: on normalise en WAV."""
+        with open(raw_path, 'rb') as f:
+            data = f.read()
+        if data[:4] == b'RIFF':
+            with open(wav_path + ".tmp", 'wb') as f:
+                f.write(data)
+        else:
+            out = wave.open(wav_path + ".tmp", 'wb')
+            try:
+                out.setnchannels(1)
+                out.setsampwidth(2)
+                out.setframerate(PHRASE_RAW_RATE)
+                out.writeframes(data)
+            finally:
+                out.close()
+        os.replace(wav_path + ".tmp", wav_path)
+        wav = wave.open(wav_path, 'rb')
+        try:
+            duration = float(wav.getnframes()) / float(wav.getframerate() or 1)
+        finally:
+            wav.close()
+        return os.path.getsize(wav_path), duration
+
+    def _enforce_budget(self):
+        budget = int(PHRASE_CACHE_BUDGET_MB * 1024 * 1024)
+        total = sum(e.get('size', 0) for e in self._index.values())
+        while total > budget and len(self._index) > 1:
+            key = next(iter(self._index))
+            entry = self._remove_entry(key)
+            total -= entry.get('size', 0)
+            self._counters['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                'entries': len(self._index),
+                'disk_bytes': sum(e.get('size', 0) for e in self._index.values()),
+                'budget_bytes': int(PHRASE_CACHE_BUDGET_MB * 1024 * 1024),
+                'pending_renders': len(self._queue) + (1 if self._rendering else 0),
+                'settings': list(self._settings or []),
+            })
+            for source in ('cache', 'live'):
+                samples = list(self._samples[source])
+                stats['{}_overhead_ms'.format(source)] = round(1000.0 * sum(samples) / len(samples), 1) if samples else None
+                stats['{}_samples'.format(source)] = len(samples)
+        return stats
+
+
 class PepperLifeService(object):
     RE_ANIMATION_TAG = re.compile(r'%%([^%]+)%%', re.IGNORECASE)
     RE_START_TAG = re.compile(r'\^start\(([^)]+)\)', re.IGNORECASE)
@@ -75,6 +477,7 @@ class PepperLifeService(object):
         self._posture = None # ALRobotPosture
         self._bm = None      # ALBehaviorManager (pour compat < 2.9)
         self._system = None  # ALSystem (pour la version)
+        self._player = None  # ALAudioPlayer (phrases pré-rendues)
 
         # Info version
         self.naoqi_version = "0.0.0.0"
@@ -85,10 +488,13 @@ class PepperLifeService(object):
         self._say_future = None
         self._anim_future = None
         self._think_future = None
-        self._anim_thread = None # Pour join() < 2.9
         self._running_anim_name = None
         self._running_think_name = None
+        self._security_event = None  # id (planificateur) de l'arrêt de sécurité de l'animation en cours
         self._lock = threading.RLock()
+        self._scheduler = AnimationScheduler(logger)
+        # Travail bloquant (RPC TTS, lecture/écriture de fichiers): hors du thread des animations
+        self._io_worker = AnimationScheduler(logger, name="PepperLifeIO")
         
         # Dictionnaire des apps et animations
         self.applications = []
@@ -98,6 +504,33 @@ class PepperLifeService(object):
         self.animations_durations = {}
         self.animations_body_language = set()
         self.last_resolved_animation = None
+        self.scan_stats = {}
+        self._families_sorted = []
+        self._tag_index = self._empty_tag_index()
+
+        # Préchargement (warm set LRU) et mesure du décalage geste/parole
+        self._warm_set = OrderedDict()
+        self._preload_futures = {}
+        self._preloading = set()       # préchargements en cours (entrent dans le warm set une fois réussis)
+        self._preload_warm = {}        # anim -> déjà chaude au moment de la résolution
+        self._family_usage = self._load_family_usage()
+        self._usage_dirty = 0
+        self._gesture_pending = None   # (anim, ts début parole, chaude)
+        self._gesture_offsets = deque(maxlen=100)  # (décalage, chaude, envoi seulement)
+        self._preload_count = 0
+        self._behavior_started_link = None
+
+        # Durée de parole estimée (calibrée sur les say mesurés) pour choisir la variante
+        self._tts_rates = self._load_tts_calibration()
+        self._tts_rate_dirty = 0
+        self._voice = None
+
+        # Phrases pré-rendues (fixes + fréquentes), rendues quand le robot ne parle pas
+        self._phrase_cache = PhraseAudioCache(logger, self._io_worker, is_busy=lambda: self._speaking)
+        self._phrase_cache_ready = False
+
+        # Début/fin des dernières paroles (horloge murale, pour les traces de tour côté client)
+        self._speech_timeline = deque(maxlen=50)
 
         # Signal (optionnel)
         self.onStateChanged = qi.Signal()
@@ -126,12 +559,28 @@ class PepperLifeService(object):
         if self._as is None: self._as = self.session.service("ALAnimatedSpeech")
         if self._tts is None: self._tts = self.session.service("ALTextToSpeech")
         if self._posture is None: self._posture = self.session.service("ALRobotPosture")
+        if not self._phrase_cache_ready:
+            self._phrase_cache_ready = True
+            try:
+                self._player = self.session.service("ALAudioPlayer")
+                self._phrase_cache.bind(self._tts)
+                self._phrase_cache.enqueue(FIXED_PHRASES)
+            except Exception as e:
+                self._player = None
+                self.logger.warning(u"[TTS-CACHE] ALAudioPlayer indisponible, cache de phrases désactivé: {}".format(e))
 
         # Connexion aux services spécifiques à la version
         if self.is_29:
             if self._ap is None: self._ap = self.session.service("ALAnimationPlayer")
         else:
-            if self._bm is None: self._bm = self.session.service("ALBehaviorManager")
+            if self._bm is None:
+                self._bm = self.session.service("ALBehaviorManager")
+                try:
+                    # Début réel du comportement (après chargement) pour mesurer le décalage geste/parole
+                    self._behavior_started_link = self._bm.behaviorStarted.connect(
+                        lambda name: self._note_gesture_start(name, time.time()))
+                except Exception:
+                    self._behavior_started_link = None
 
         # Lancer le scan des animations une seule fois
         if not self.animations and not self.applications:
@@ -159,6 +608,7 @@ class PepperLifeService(object):
                     self.logger.error(u"L'arrêt du comportement '{}' a échoué: {}".format(anim_name, e))
             
             if self._running_anim_name == anim_name:
+                self._cancel_security_timer()
                 self._anim_future = None
                 self._running_anim_name = None
             
@@ -208,6 +658,9 @@ class PepperLifeService(object):
                         break
                     except Exception: pass
         except Exception: pass
+        try:
+            if self._player is not None: self._player.stopAll()
+        except Exception: pass
         with self._lock:
             self._speaking = False
             self._emit()
@@ -227,11 +680,27 @@ class PepperLifeService(object):
     def say(self, text_with_tags):
         self._connect()
         with self._lock: self._speaking = True; self._emit()
-        try: self._as.say(text_with_tags)
+        try:
+            start = time.time()
+            # Toujours ALAnimatedSpeech (langage corporel contextuel, bodyLanguageMode): le cache de
+            # phrases ne sert qu'à _speak, où le geste est lancé à part par sayAnimated.
+            self._as.say(text_with_tags)
+            with self._lock: self._speech_timeline.append((start, time.time()))
         finally: 
             with self._lock: self._speaking = False; self._emit()
         return True
 
+    def _speak(self, clean_text):
+        """Lance la parole en asynchrone: rendu pré-enregistré si disponible, sinon TTS direct.
+        Retourne (future, 'cache' | 'live')."""
+        path = self._phrase_cache.lookup(clean_text) if self._player is not None else None
+        if path:
+            try:
+                return self._player.playFile(path, _async=True), 'cache'
+            except Exception as e:
+                self.logger.warning(u"[TTS-CACHE] Lecture de '{}' impossible, TTS direct: {}".format(path, e))
+        return self._tts.say(clean_text, _async=True), 'live'
+
     def sayAsync(self, text_with_tags, preempt):
         self._connect()
         if preempt: self.stopAll()
@@ -257,57 +726,33 @@ class PepperLifeService(object):
             if anim_match:
                 anim_name = anim_match.group(2)
                 clean_text = re.sub(r'\^(start|wait)\([^)]+\)', '', text_with_tags).strip()
-            loop_until_done = "^wait(" in text_with_tags
+            loop_until_done = "^wait(" in text_with_tags and self._needs_loop(anim_name, clean_text)
 
             if not anim_name and not clean_text: return True
             if not anim_name: return self.say(clean_text)
             if not clean_text: return self.playAnimation(anim_name, block, False)
 
             # 2. Lancer la parole et l'animation en parallèle
-            say_future = self._tts.say(clean_text, _async=True)
+            self._mark_speech_start(anim_name)
+            utterance = self._begin_utterance(anim_name, clean_text)
+            say_future, utterance['source'] = self._speak(clean_text)
             with self._lock:
                 self._speaking = True
                 self._say_future = say_future
                 self._emit()
             
-            def _on_say_done(_):
+            def _on_say_done(fut):
                 with self._lock:
                     self._speaking = False
                     self._say_future = None
                     self._emit()
+                self._end_utterance(utterance, fut)
             say_future.addCallback(_on_say_done)
 
             self.playAnimation(anim_name, False, False)
 
             if loop_until_done:
-                with self._lock:
-                    initial_future = self._anim_future
-
-                def _restart_if_needed(_fut):
-                    try:
-                        with self._lock:
-                            still_speaking = bool(
-                                self._speaking or (self._say_future and self._say_future.isRunning())
-                            )
-                    except Exception:
-                        still_speaking = False
-
-                    if still_speaking:
-                        self.logger.debug(u"[ANIM] Relance de l'animation de parole '{}' (wait actif).".format(anim_name))
-                        self.playAnimation(anim_name, False, False)
-                        with self._lock:
-                            next_future = self._anim_future
-                        if next_future:
-                            try:
-                                next_future.addCallback(_restart_if_needed)
-                            except Exception:
-                                pass
-
-                if initial_future:
-                    try:
-                        initial_future.addCallback(_restart_if_needed)
-                    except Exception:
-                        pass
+                self._replay_while_speaking(anim_name, utterance)
 
             if block:
                 try:
@@ -328,14 +773,16 @@ class PepperLifeService(object):
             if anim_match:
                 anim_name = anim_match.group(2)
                 clean_text = re.sub(r'\^(start|wait)\([^)]+\)', '', text_with_tags).strip()
-            loop_until_done = "^wait(" in text_with_tags
+            loop_until_done = "^wait(" in text_with_tags and self._needs_loop(anim_name, clean_text)
 
             if not anim_name and not clean_text: return True
             if not anim_name: return self.say(clean_text)
             if not clean_text: return self.playAnimation(anim_name, block, False)
 
             # 2. Lancer la parole et l'animation en parallèle
-            say_future = self._tts.say(clean_text, _async=True)
+            self._mark_speech_start(anim_name)
+            utterance = self._begin_utterance(anim_name, clean_text)
+            say_future, utterance['source'] = self._speak(clean_text)
             with self._lock:
                 self._speaking = True
                 self._say_future = say_future
@@ -347,6 +794,7 @@ class PepperLifeService(object):
                     self._speaking = False
                     self._say_future = None
                     self._emit()
+                self._end_utterance(utterance, fut)
                 
                 # Stop animation at the end of speech ONLY if it has no known duration
                 if anim_name:
@@ -369,29 +817,7 @@ class PepperLifeService(object):
             self.playAnimation(anim_name, False, False)
 
             if loop_until_done:
-                def _loop_anim_behaviors():
-                    while True:
-                        with self._lock:
-                            speaking_flag = bool(self._speaking or (self._say_future and hasattr(self._say_future, 'isRunning') and self._say_future.isRunning()))
-                        if not speaking_flag:
-                            break
-                        local_thread = None
-                        with self._lock:
-                            local_thread = self._anim_thread
-                        if local_thread:
-                            local_thread.join()
-                        else:
-                            time.sleep(0.05)
-                        with self._lock:
-                            speaking_flag = bool(self._speaking or (self._say_future and hasattr(self._say_future, 'isRunning') and self._say_future.isRunning()))
-                        if not speaking_flag:
-                            break
-                        self.logger.debug(u"[ANIM] Relance du comportement de parole '{}' (wait actif).".format(anim_name))
-                        self.playAnimation(anim_name, False, False)
-                        time.sleep(0.01)
-                loop_thread = threading.Thread(target=_loop_anim_behaviors)
-                loop_thread.daemon = True
-                loop_thread.start()
+                self._replay_while_speaking(anim_name, utterance)
 
             if block:
                 self.logger.debug(u"sayAnimated: Mode bloquant activé.")
@@ -400,16 +826,16 @@ class PepperLifeService(object):
                     say_future.wait()
                     self.logger.debug(u"sayAnimated: Parole terminée.")
                     
-                    with self._lock: anim_thread_copy = self._anim_thread
-                    if anim_thread_copy:
-                        self.logger.debug(u"sayAnimated: Attente de la fin de l'animation (thread join)...")
-                        anim_thread_copy.join(timeout=25.0) # Augmentation du timeout pour le debug
-                        if anim_thread_copy.is_alive():
-                            self.logger.warning(u"sayAnimated: Le thread d'animation est toujours en vie après le timeout du join.")
+                    with self._lock: anim_future_copy = self._anim_future
+                    if anim_future_copy:
+                        self.logger.debug(u"sayAnimated: Attente de la fin de l'animation...")
+                        anim_future_copy.wait(25000)
+                        if anim_future_copy.isRunning():
+                            self.logger.warning(u"sayAnimated: L'animation est toujours en cours après le timeout de l'attente.")
                         else:
-                            self.logger.debug(u"sayAnimated: Le thread d'animation s'est terminé.")
+                            self.logger.debug(u"sayAnimated: L'animation s'est terminée.")
                     else:
-                        self.logger.warning(u"sayAnimated: Impossible de trouver le thread d'animation à attendre.")
+                        self.logger.debug(u"sayAnimated: Aucune animation en cours à attendre.")
 
                 except Exception as e:
                     self.logger.warning(u"sayAnimated[<2.9]: Le wait() a échoué: {}".format(e))
@@ -417,6 +843,60 @@ class PepperLifeService(object):
             
         return True
 
+    def _replay_while_speaking(self, anim_name, utterance):
+        """^wait: à chaque fin de l'animation, le planificateur la relance tant que la parole continue."""
+        def _restart():
+            try:
+                with self._lock:
+                    still_speaking = bool(self._speaking or (self._say_future and self._say_future.isRunning()))
+            except Exception:
+                still_speaking = False
+            if not still_speaking:
+                return
+            self.logger.debug(u"[ANIM] Relance de l'animation de parole '{}' (wait actif).".format(anim_name))
+            self._note_replay(utterance)
+            self.playAnimation(anim_name, False, False)
+            _watch()
+
+        def _watch():
+            with self._lock:
+                fut = self._anim_future if self._running_anim_name == anim_name else None
+            if fut is None:
+                return
+            try:
+                fut.addCallback(lambda _f: self._scheduler.submit(u"replay:" + anim_name, _restart))
+            except Exception:
+                pass
+
+        _watch()
+
+    def preRenderPhrases(self, phrases):
+        """Ajoute des phrases à rendre (voix courante). Retourne le nombre de phrases mises en file."""
+        self._connect()
+        if self._player is None:
+            return 0
+        return self._phrase_cache.enqueue([p for p in (phrases or []) if p])
+
+    def getPhraseCacheStats(self):
+        """Entrées, budget disque, hits/misses et surcoût moyen cache vs TTS direct (ms)."""
+        self._connect()
+        return self._phrase_cache.stats()
+
+    def clearPhraseCache(self):
+        self._connect()
+        return self._phrase_cache.invalidate()
+
+    def getSpeechTimeline(self, since):
+        """[[début, fin], ...] des paroles terminées commencées après `since` (epoch s)."""
+        with self._lock:
+            return [[start, end] for start, end in self._speech_timeline if start >= since]
+
+    def getSchedulerStats(self):
+        """Threads du process et gigue du planificateur d'animations (monitoring), plus la file d'E/S."""
+        stats = self._scheduler.stats()
+        stats['io_pending_events'] = self._io_worker.stats()['pending_events']
+        return stats
+
     def sayAnimatedIsRunning(self):
         self._connect()
         with self._lock:
@@ -440,14 +920,29 @@ class PepperLifeService(object):
 
     def stopSayAnimated(self): self._stop_speaking(); return True
 
+    def _cancel_security_timer(self):
+        """Annule l'arrêt de sécurité en attente (animation terminée, arrêtée ou remplacée)."""
+        with self._lock:
+            event_id, self._security_event = self._security_event, None
+        if event_id is not None:
+            self._scheduler.cancel(event_id)
+
     def _start_security_timer(self, anim_name, future=None):
+        # Une seule animation suivie à la fois: le minuteur du lancement précédent ne doit pas
+        # arrêter (par nom, en <2.9) la relance suivante du même comportement.
+        self._cancel_security_timer()
         duration = self.animations_durations.get(anim_name)
         if not duration or duration <= 0:
             return
 
         self.logger.debug(u"[ANIM] Minuteur de sécurité activé pour {} ({}s)".format(anim_name, duration))
+        event = [None]
 
         def callback():
+            with self._lock:
+                if self._security_event != event[0]:
+                    return
+                self._security_event = None
             self.logger.debug(u"[ANIM] Minuteur de sécurité déclenché pour {}.".format(anim_name))
             
             def do_cancel_29():
@@ -469,9 +964,9 @@ class PepperLifeService(object):
             except Exception as e:
                 self.logger.error(u"[ANIM] Erreur dans le callback du minuteur pour {}: {}".format(anim_name, e))
 
-        timer = threading.Timer(duration + 1.0, callback)
-        timer.daemon = True
-        timer.start()
+        with self._lock:
+            event[0] = self._scheduler.schedule(duration + 1.0, u"security:" + anim_name, callback)
+            self._security_event = event[0]
 
     def playAnimation(self, anim_name, block, preempt):
         self._connect()
@@ -480,9 +975,12 @@ class PepperLifeService(object):
         if self.is_29:
             self.logger.info(u"playAnimation[2.9]: Lancement de l'animation {}...".format(anim_name))
             fut = self._ap.run(anim_name, _async=True)
+            # ALAnimationPlayer ne signale pas le début réel du geste: seul l'envoi est mesurable
+            self._note_gesture_start(anim_name, time.time(), dispatch=True)
             with self._lock: self._anim_future = fut; self._running_anim_name = anim_name; self._emit()
             def _on_done(_): 
                 with self._lock: 
+                    if self._anim_future is fut: self._cancel_security_timer()
                     if self._running_anim_name == anim_name: self._anim_future = None; self._running_anim_name = None; self._emit()
             try: fut.addCallback(_on_done)
             except Exception: pass
@@ -495,27 +993,27 @@ class PepperLifeService(object):
         else: # Logique pour < 2.9
             self.logger.info(u"playAnimation[<2.9]: Lancement du comportement {}...".format(anim_name))
 
-            def run_and_clear():
-                self.logger.debug(u"playAnimation thread started for '{}'.".format(anim_name))
-                try: 
-                    with self._lock: self._running_anim_name = anim_name
-                    self._bm.runBehavior(anim_name)
-                    self.logger.debug(u"playAnimation: runBehavior finished for '{}'.".format(anim_name))
-                except Exception as e:
-                    self.logger.error(u"playAnimation: runBehavior failed for '{}': {}".format(anim_name, e))
-                finally: 
-                    self.logger.debug(u"playAnimation thread finished for '{}'.".format(anim_name))
-                    with self._lock: 
-                        if self._running_anim_name == anim_name: self._running_anim_name = None
-            
-            if block: 
-                run_and_clear()
-            else: 
-                th = threading.Thread(target=run_and_clear)
-                th.daemon = True
-                with self._lock: self._anim_thread = th
-                th.start()
-                
+            # runBehavior en _async: pas de thread par appel, le Future suit la fin du comportement
+            with self._lock: self._running_anim_name = anim_name
+            fut = self._bm.runBehavior(anim_name, _async=True)
+            if self._behavior_started_link is None:
+                self._note_gesture_start(anim_name, time.time(), dispatch=True)
+            with self._lock: self._anim_future = fut; self._emit()
+            def _on_done(f):
+                try:
+                    if f.hasError() and "interrupted" not in str(f.error()).lower():
+                        self.logger.error(u"playAnimation: runBehavior failed for '{}': {}".format(anim_name, f.error()))
+                except Exception: pass
+                with self._lock:
+                    if self._anim_future is fut: self._cancel_security_timer()
+                    if self._running_anim_name == anim_name: self._running_anim_name = None; self._anim_future = None; self._emit()
+            try: fut.addCallback(_on_done)
+            except Exception: pass
+
+            if block:
+                try: fut.wait()
+                except Exception: pass
+            else:
                 self._start_security_timer(anim_name)
         return True
 
@@ -539,10 +1037,7 @@ class PepperLifeService(object):
         if self.thinkIsRunning():
             if block: 
                 try: 
-                    if self.is_29: 
-                        if self._think_future: self._think_future.wait()
-                    else: 
-                        if self._think_future: self._think_future.join()
+                    if self._think_future: self._think_future.wait()
                 except Exception: pass
             return True
 
@@ -560,23 +1055,22 @@ class PepperLifeService(object):
                 except Exception: pass
         else:
             self.logger.info(u"think[<2.9]: Lancement de {}...".format(anim_name))
-            def run_and_clear():
-                try: self._bm.runBehavior(anim_name)
-                finally: 
-                    with self._lock: 
-                        if self._running_think_name == anim_name: self._running_think_name = None; self._think_future = None; self._emit()
-            thread = threading.Thread(target=run_and_clear)
-            thread.daemon = True
-            with self._lock: self._think_future = thread; self._running_think_name = anim_name; self._emit()
-            thread.start()
-            if block: thread.join()
+            fut = self._bm.runBehavior(anim_name, _async=True)
+            with self._lock: self._think_future = fut; self._running_think_name = anim_name; self._emit()
+            def _on_done(_):
+                with self._lock: 
+                    if self._running_think_name == anim_name: self._running_think_name = None; self._think_future = None; self._emit()
+            try: fut.addCallback(_on_done)
+            except Exception: pass
+            if block:
+                try: fut.wait()
+                except Exception: pass
         return True
 
     def thinkIsRunning(self):
         self._connect()
         with self._lock:
-            if self.is_29: return bool(self._think_future and self._think_future.isRunning())
-            else: return bool(self._think_future and self._think_future.is_alive())
+            return bool(self._think_future and self._think_future.isRunning())
 
     def stopThink(self, name=""):
         self._stop_thinking(name)
@@ -585,19 +1079,15 @@ class PepperLifeService(object):
     def startRandomThinkingGesture(self):
         self._connect()
         try:
-            families = self.getAnimationFamilies()
-            thinking_families = [f for f in families if "Scratch" in f or "Think" in f]
-            if not thinking_families:
+            # Pool précalculé au scan: une famille au hasard puis une variante
+            thinking_pool = self._tag_index['pools']['thinking']
+            if not thinking_pool:
                 self.logger.warning("Aucune famille d'animation 'Think' ou 'Scratch' trouvée pour le geste de réflexion.")
                 return ""
-            chosen_family = random.choice(thinking_families)
-            tag = self._reconstruct_animation_tag(chosen_family)
-            match = re.search(r'\(([^)]+)\)', tag)
-            if match:
-                anim_to_run = match.group(1)
-                self.logger.info(u"Lancement du geste de réflexion aléatoire: {}".format(anim_to_run))
-                self.think(anim_to_run, False, True) # non-blocking, preemptive
-                return anim_to_run
+            anim_to_run = random.choice(random.choice(thinking_pool))
+            self.logger.info(u"Lancement du geste de réflexion aléatoire: {}".format(anim_to_run))
+            self.think(anim_to_run, False, True) # non-blocking, preemptive
+            return anim_to_run
         except Exception as e:
             self.logger.error(u"Erreur lors du lancement du geste de réflexion: {}".format(e))
         return "" 
@@ -629,6 +1119,7 @@ class PepperLifeService(object):
 
     def stopAll(self):
         self._connect()
+        self._cancel_security_timer()
         if self.is_29:
             self.logger.info("stopAll[2.9]: Arrêt des futurs d'animation et de la parole...")
             self._stop_thinking(); self._cancel_anim(); self._stop_speaking()
@@ -649,118 +1140,118 @@ class PepperLifeService(object):
 
     def getAnimationFamilies(self):
         self._connect()
-        return sorted([k.replace('animations/', '') for k in self.animations_families.keys()])
+        return list(self._families_sorted)
+
+    def getGesturePool(self, kind):
+        """Animations du pool précalculé ('thinking' ou 'listening')."""
+        self._connect()
+        pool = self._tag_index['pools'].get(kind) or []
+        return [name for variants in pool for name in variants]
 
     def getAnimationDurations(self):
         self._connect()
         return self.animations_durations
 
     def getAnimationStats(self):
-        """Retourne le nombre d'animations et de familles chargées."""
+        """Retourne le nombre d'animations et de familles chargées, plus le bilan du scan (cold/warm)."""
         self._connect() # Assure que le scan a été fait
-        return {
+        stats = {
             'animation_count': len(self.animations),
             'family_count': len(self.animations_families)
         }
+        stats.update(self.scan_stats)
+        with self._lock:
+            offsets = list(self._gesture_offsets)
+        stats.update({'warm_set_size': len(self._warm_set), 'preload_count': self._preload_count})
+        # gesture_*: début réel (ALBehaviorManager.behaviorStarted); gesture_dispatch_*: envoi de la
+        # commande seulement (2.9, ou signal indisponible), ne mesure pas le chargement du geste.
+        for prefix, dispatch in ((u'gesture', False), (u'gesture_dispatch', True)):
+            samples = [(o, w) for o, w, d in offsets if d == dispatch]
+            warm = [o for o, w in samples if w]
+            cold = [o for o, w in samples if not w]
+            stats.update({
+                prefix + '_offset_ms': round(1000.0 * sum(o for o, _ in samples) / len(samples), 1) if samples else 0.0,
+                prefix + '_offset_warm_ms': round(1000.0 * sum(warm) / len(warm), 1) if warm else 0.0,
+                prefix + '_offset_cold_ms': round(1000.0 * sum(cold) / len(cold), 1) if cold else 0.0,
+                prefix + '_samples': len(samples),
+            })
+        return stats
 
     def getNaoqiVersion(self):
         self._connect()
         return self.naoqi_version
 
-    def _load_qianim_root(self, qianim_file_path):
-        """Parse un .qianim même lorsque des octets parasites suivent le XML."""
-        try:
-            return ET.parse(qianim_file_path).getroot()
-        except ET.ParseError as parse_err:
-            message = str(parse_err).lower()
-            if "junk after document element" not in message:
-                raise
-            try:
-                raw_bytes = Path(qianim_file_path).read_bytes()
-            except Exception:
-                raise
-            data = None
-            for encoding in ("utf-8", "latin-1"):
-                try:
-                    data = raw_bytes.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            if not data:
-                raise
-            root_match = re.search(r'<([A-Za-z_:][^\s>/]*)[^>]*>', data)
-            if not root_match:
-                raise
-            root_tag = root_match.group(1)
-            closing_tag = f"</{root_tag}>"
-            closing_index = data.rfind(closing_tag)
-            if closing_index == -1:
-                raise
-            truncated = data[:closing_index + len(closing_tag)]
-            return ET.fromstring(truncated)
-
     def _get_qianim_duration(self, qianim_file_path):
-        """Calculates the duration of a .qianim animation."""
-        try:
-            root = self._load_qianim_root(qianim_file_path)
-            if root is None:
-                return 0.0
-
-            max_frame = 0
-            fps = 25 # Default fps
-
-            for actuator_curve in root.findall('ActuatorCurve'):
-                if 'fps' in actuator_curve.attrib:
-                    try:
-                        fps = int(actuator_curve.get('fps'))
-                    except (ValueError, TypeError):
-                        pass
-
-                for key in actuator_curve.findall('Key'):
-                    try:
-                        frame = int(key.get('frame'))
-                        if frame > max_frame:
-                            max_frame = frame
-                    except (ValueError, TypeError):
-                        continue
-            
-            if max_frame > 0 and fps > 0:
-                duration = float(max_frame) / float(fps)
-                self.logger.debug(u"[ANIM] Durée calculée pour {}: {:.2f}s".format(os.path.basename(qianim_file_path), duration))
-                return duration
-                
-            return 0.0
-        except Exception as e:
-            self.logger.error(u"[ANIM] Erreur lors du calcul de la durée pour {}: {}".format(qianim_file_path, e))
-            return 0.0
+        """Calcule la durée d'une animation .qianim (lecture en flux, cf. anim_durations)."""
+        _, duration, error = duration_for(qianim_file_path)
+        if error:
+            self.logger.error(u"[ANIM] Erreur lors du calcul de la durée pour {}: {}".format(qianim_file_path, error))
+        return duration
 
     def _get_xar_duration(self, xar_file_path):
         """Calcule la durée d'une animation .xar en se basant sur sa timeline."""
+        _, duration, error = duration_for(xar_file_path)
+        if error:
+            self.logger.error(u"[ANIM] Erreur lors du calcul de la durée pour {}: {}".format(xar_file_path, error))
+        return duration
+
+    def _compute_pending_durations(self, pending):
+        """Calcule en lot (pool de processus si la liste est longue) les durées des fichiers à rescanner.
+        pending: [(chemin, entrée de cache, clé d'animation ou None)]"""
+        if not pending:
+            return
+        t0 = time.time()
+        durations, errors = compute_durations([item[0] for item in pending], workers=ANIM_SCAN_WORKERS)
+        for file_path, error in errors.items():
+            self.logger.error(u"[ANIM] Erreur lors du calcul de la durée pour {}: {}".format(file_path, error))
+        for file_path, entry, anim_key in pending:
+            entry['duration'] = durations.get(file_path, 0.0)
+            if entry['duration'] > 0 and anim_key:
+                self.animations_durations[anim_key] = entry['duration']
+        self.logger.info(u"[ANIM] {} durées calculées en {:.3f}s.".format(len(pending), time.time() - t0))
+
+    # -------------------- cache d'index des animations --------------------
+    def _load_anim_cache(self):
+        """Charge l'index persistant s'il correspond à la version et au mode NAOqi courants."""
         try:
-            tree = ET.parse(xar_file_path)
-            root = tree.getroot()
-            timeline_element = None
-            # Itération robuste pour trouver la timeline, quel que soit le namespace
-            for elem in root.iter():
-                if elem.tag.endswith('Timeline'):
-                    timeline_element = elem
-                    break
-            
-            if timeline_element is not None:
-                fps = float(timeline_element.get('fps', 25))
-                size = float(timeline_element.get('size', 0))
-                if fps > 0 and size > 0:
-                    # La durée est le nombre de frames divisé par le framerate
-                    duration = size / fps
-                    self.logger.debug(u"[ANIM] Durée calculée pour {}: {:.2f}s".format(os.path.basename(xar_file_path), duration))
-                    return duration
-            return 0.0
+            if not os.path.isfile(ANIM_CACHE_PATH):
+                return None
+            with open(ANIM_CACHE_PATH, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if not isinstance(cache, dict) or cache.get('version') != ANIM_CACHE_VERSION:
+                self.logger.info("[scan] Cache d'index obsolète (version), reconstruction complète.")
+                return None
+            if bool(cache.get('is_29')) != bool(self.is_29):
+                self.logger.info("[scan] Cache d'index créé pour une autre version NAOqi, ignoré.")
+                return None
+            return cache
         except Exception as e:
-            self.logger.error(u"[ANIM] Erreur lors du calcul de la durée pour {}: {}".format(xar_file_path, e))
-            return 0.0
+            self.logger.warning("[scan] Lecture du cache d'index impossible: {}".format(e))
+            return None
+
+    def _save_anim_cache(self, cache):
+        try:
+            cache_dir = os.path.dirname(ANIM_CACHE_PATH)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            temp_path = ANIM_CACHE_PATH + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            os.replace(temp_path, ANIM_CACHE_PATH)
+        except Exception as e:
+            self.logger.warning("[scan] Écriture du cache d'index impossible: {}".format(e))
+
+    @staticmethod
+    def _cached_entry(entries, path, st):
+        """Retourne l'entrée en cache de `path` si mtime et taille n'ont pas bougé."""
+        entry = entries.get(path)
+        if entry and entry.get('mtime_ns') == st.st_mtime_ns and entry.get('size') == st.st_size:
+            return entry
+        return None
 
     def _scan_apps_and_animations(self):
         self.logger.info("Lancement du scan des applications et animations...")
+        t0 = time.time()
         self.applications = []
         self.animations = []
         self.animations_by_prefix = {}
@@ -768,30 +1259,60 @@ class PepperLifeService(object):
         self.animations_durations.clear() # On vide avant de remplir
         self.animations_body_language = set()
 
+        cache = self._load_anim_cache()
+        old_files = (cache or {}).get('files') or {}
+        new_cache = {'version': ANIM_CACHE_VERSION, 'is_29': bool(self.is_29), 'files': {}}
+        hits = 0
+        rescanned = 0
+
         if not self.is_29:
             self.logger.info("[scan] Utilisation de la logique < 2.9 (ALBehaviorManager)")
+            old_natures = (cache or {}).get('natures') or {}
+            new_cache['natures'] = {}
             try:
                 installed_behaviors = self._bm.getInstalledBehaviors()
+                changed_behaviors = set()
+                pending = []
                 # Scan des durées des animations .xar
                 try:
                     # Le chemin sur le robot est /home/nao/.local/share/PackageManager/apps/
                     xar_base_dir = os.path.expanduser('~nao/.local/share/PackageManager/apps/')
                     if os.path.isdir(xar_base_dir):
                         for xar_file_path in glob.glob(os.path.join(xar_base_dir, "**", "behavior.xar"), recursive=True):
-                            duration = self._get_xar_duration(xar_file_path)
-                            if duration > 0:
-                                # Construit la clé de comportement à partir du chemin du fichier
-                                # ex: /path/to/apps/animations/Stand/Gestures/Hey_1/behavior.xar -> animations/Stand/Gestures/Hey_1
-                                relative_path = os.path.relpath(os.path.dirname(xar_file_path), xar_base_dir)
-                                behavior_key = relative_path.replace(os.path.sep, '/')
-                                if behavior_key.startswith("animations/"):
-                                    self.animations_durations[behavior_key] = duration
+                            try:
+                                st = os.stat(xar_file_path)
+                            except OSError:
+                                continue
+                            # Construit la clé de comportement à partir du chemin du fichier
+                            # ex: /path/to/apps/animations/Stand/Gestures/Hey_1/behavior.xar -> animations/Stand/Gestures/Hey_1
+                            relative_path = os.path.relpath(os.path.dirname(xar_file_path), xar_base_dir)
+                            behavior_key = relative_path.replace(os.path.sep, '/')
+                            anim_key = behavior_key if behavior_key.startswith("animations/") else None
+                            entry = self._cached_entry(old_files, xar_file_path, st)
+                            if entry is None:
+                                entry = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'duration': 0.0}
+                                pending.append((xar_file_path, entry, anim_key))
+                                changed_behaviors.add(behavior_key)
+                                rescanned += 1
+                            else:
+                                hits += 1
+                                if entry['duration'] > 0 and anim_key:
+                                    self.animations_durations[anim_key] = entry['duration']
+                            new_cache['files'][xar_file_path] = entry
+                        self._compute_pending_durations(pending)
                 except Exception as e:
                     self.logger.error("Erreur lors du scan des durées des .xar: {}".format(e))
 
                 for behavior in installed_behaviors:
                     try:
-                        nature = self._bm.getBehaviorNature(behavior)
+                        # La nature n'est redemandée que si le behavior.xar a changé (ou est inconnu)
+                        nature = None if behavior in changed_behaviors else old_natures.get(behavior)
+                        if nature is None:
+                            nature = self._bm.getBehaviorNature(behavior)
+                            rescanned += 1
+                        else:
+                            hits += 1
+                        new_cache['natures'][behavior] = nature
                         b_info = {'name': behavior, 'nature': nature}
                         if nature in ['interactive', 'solitary']:
                             self.applications.append(b_info)
@@ -810,15 +1331,26 @@ class PepperLifeService(object):
             try:
                 db_path = '/home/nao/.local/share/PackageManager/pm.db'
                 if os.path.exists(db_path):
-                    import sqlite3
-                    conn = sqlite3.connect(db_path)
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT uuid FROM packages")
-                    for pkg in cursor.fetchall():
-                        if pkg[0]:
-                            # On suppose que les packages dans la DB sont des applications principales
-                            self.applications.append({'name': pkg[0], 'nature': 'interactive'})
-                    conn.close()
+                    st = os.stat(db_path)
+                    cached_db = self._cached_entry({db_path: (cache or {}).get('pm_db') or {}}, db_path, st)
+                    if cached_db is not None:
+                        app_names = cached_db.get('applications') or []
+                        hits += 1
+                    else:
+                        import sqlite3
+                        app_names = []
+                        conn = sqlite3.connect(db_path)
+                        cursor = conn.cursor()
+                        cursor.execute("SELECT uuid FROM packages")
+                        for pkg in cursor.fetchall():
+                            if pkg[0]:
+                                app_names.append(pkg[0])
+                        conn.close()
+                        rescanned += 1
+                    new_cache['pm_db'] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'applications': app_names}
+                    for name in app_names:
+                        # On suppose que les packages dans la DB sont des applications principales
+                        self.applications.append({'name': name, 'nature': 'interactive'})
                 else:
                     self.logger.warning("Fichier pm.db introuvable, la liste d'applications sera peut-être incomplète.")
             except Exception as e:
@@ -827,22 +1359,37 @@ class PepperLifeService(object):
             # 2. Récupérer les animations depuis le système de fichiers
             try:
                 base = Path.home() / ".local/share/PackageManager/apps/animations"
+                pending = []
                 if base.is_dir():
                     for p in base.rglob("*.qianim"):
+                        file_path = str(p)
+                        try:
+                            st = p.stat()
+                        except OSError:
+                            continue
                         # Le nom de l'animation est son chemin relatif depuis 'animations'
                         rel_path = p.relative_to(base).as_posix()
                         full_name = self._emit29(rel_path)
                         self.animations.append({'name': full_name, 'nature': 'animation'})
                         
-                        # Calculer et stocker la durée
-                        duration = self._get_qianim_duration(str(p))
-                        if duration > 0:
-                            self.animations_durations[full_name] = duration
+                        # Durée: reprise du cache si le fichier n'a pas changé, sinon recalcul
+                        entry = self._cached_entry(old_files, file_path, st)
+                        if entry is None:
+                            entry = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'duration': 0.0}
+                            pending.append((file_path, entry, full_name))
+                            rescanned += 1
+                        else:
+                            hits += 1
+                            if entry['duration'] > 0:
+                                self.animations_durations[full_name] = entry['duration']
+                        new_cache['files'][file_path] = entry
 
                         # Remplir les familles pour la résolution de tags
                         noext = rel_path[:-7] # retire .qianim
                         fam = self.RE_SUFFIX_NUM.sub("_", noext)
                         self.animations_by_prefix.setdefault(fam, []).append(rel_path)
+                    # Durées des fichiers nouveaux/modifiés, en lot (pool de processus si nécessaire)
+                    self._compute_pending_durations(pending)
             except Exception as e:
                 self.logger.error("Erreur lors du scan des fichiers .qianim: {}".format(e))
 
@@ -850,6 +1397,23 @@ class PepperLifeService(object):
         for fam_underscore, anims in self.animations_by_prefix.items():
             clean_fam = fam_underscore.rstrip('_')
             self.animations_families[clean_fam] = anims
+        self._build_tag_index()
+
+        # Bilan du scan: "warm" si au moins une entrée du cache a été réutilisée
+        elapsed = time.time() - t0
+        mode = 'warm' if hits else 'cold'
+        cold_seconds = elapsed if mode == 'cold' else float((cache or {}).get('cold_scan_seconds') or 0.0)
+        new_cache['cold_scan_seconds'] = cold_seconds
+        self.scan_stats = {
+            'scan_mode': mode,
+            'scan_seconds': round(elapsed, 4),
+            'cold_scan_seconds': round(cold_seconds, 4),
+            'warm_scan_seconds': round(elapsed, 4) if mode == 'warm' else 0.0,
+            'cache_hits': hits,
+            'rescanned': rescanned,
+        }
+        if new_cache != cache:
+            self._save_anim_cache(new_cache)
         
         # Log récapitulatif
         anim_count = len(self.animations)
@@ -858,49 +1422,349 @@ class PepperLifeService(object):
         self.logger.info(u"\033[93m{}\033[0m".format(log_msg)) # Message en jaune
 
         self.logger.info("Scan terminé: {} applications et {} animations trouvées.".format(len(self.applications), len(self.animations)))
+        self.logger.info("Scan {} en {:.3f}s ({} entrées du cache, {} recalculées).".format(mode, elapsed, hits, rescanned))
+
+        # Warm set initial en tâche de fond (pool de réflexion + familles les plus utilisées)
+        self._io_worker.submit(u"warm-up", self._warm_up_animations)
+
+    # -------------------- durée de parole estimée --------------------
+    def _load_tts_calibration(self):
+        try:
+            with open(TTS_CALIBRATION_PATH, 'r', encoding='utf-8') as f:
+                return {k: float(v) for k, v in json.load(f).items()}
+        except Exception:
+            return {}
+
+    def _save_tts_calibration(self):
+        try:
+            calib_dir = os.path.dirname(TTS_CALIBRATION_PATH)
+            if not os.path.isdir(calib_dir):
+                os.makedirs(calib_dir)
+            temp_path = TTS_CALIBRATION_PATH + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(dict(self._tts_rates), f)
+            os.replace(temp_path, TTS_CALIBRATION_PATH)
+        except Exception as e:
+            self.logger.warning("[TTS] Sauvegarde de la calibration impossible: {}".format(e))
+
+    def _current_voice(self):
+        try:
+            if self._tts is not None: self._voice = self._tts.getVoice()
+        except Exception:
+            pass
+        return self._voice or 'default'
+
+    def _estimate_speech_duration(self, text):
+        chars = len((text or "").strip())
+        if not chars:
+            return 0.0
+        return chars * self._tts_rates.get(self._voice or 'default', TTS_DEFAULT_RATE)
+
+    def _calibrate_tts(self, voice, chars, seconds):
+        """Met à jour le débit (s/caractère) de la voix à partir d'un say mesuré."""
+        if chars < 8 or seconds < 0.3:
+            return
+        sample = seconds / chars
+        previous = self._tts_rates.get(voice)
+        self._tts_rates[voice] = sample if previous is None else previous + TTS_RATE_ALPHA * (sample - previous)
+        self._tts_rate_dirty += 1
+        if self._tts_rate_dirty >= 5:
+            self._tts_rate_dirty = 0
+            self._save_tts_calibration()
+
+    def _needs_loop(self, anim_name, clean_text):
+        """^wait ne boucle que si l'animation est plus courte que la parole estimée (ou de durée inconnue)."""
+        duration = self.animations_durations.get(anim_name or "", 0.0)
+        if duration <= 0:
+            return True
+        estimate = self._estimate_speech_duration(clean_text)
+        if duration >= estimate:
+            self.logger.debug(u"[ANIM] '{}' ({:.2f}s) couvre la parole estimée ({:.2f}s), pas de boucle.".format(anim_name, duration, estimate))
+            return False
+        return True
+
+    def _begin_utterance(self, anim_name, clean_text):
+        now = time.time()
+        return {'anim': anim_name, 'voice': self._current_voice(), 'chars': len(clean_text.strip()), 'text': clean_text,
+                'source': 'live', 'estimate': self._estimate_speech_duration(clean_text), 'start': now, 'anim_start': now,
+                'replays': 0}
+
+    def _note_replay(self, utterance):
+        utterance['replays'] += 1
+        utterance['anim_start'] = time.time()
+
+    def _end_utterance(self, utterance, fut=None):
+        """Calibre l'estimateur et journalise relances et écart de fin geste/parole."""
+        now = time.time()
+        speech = now - utterance['start']
+        with self._lock: self._speech_timeline.append((utterance['start'], now))
+        completed = True
+        try:
+            completed = not (fut.isCanceled() or fut.hasError())
+        except Exception:
+            pass
+        if completed:
+            self._calibrate_tts(utterance['voice'], utterance['chars'], speech)
+            self._phrase_cache.note_playback(utterance['text'], utterance['source'], speech)
+        duration = self.animations_durations.get(utterance['anim'] or "", 0.0)
+        mismatch = u"{:+.2f}s".format(utterance['anim_start'] + duration - now) if duration > 0 else u"n/a"
+        self.logger.info(u"[ANIM] Fin de phrase: parole {:.2f}s (estimée {:.2f}s), {} relance(s) de '{}', écart fin geste/parole {}.".format(
+            speech, utterance['estimate'], utterance['replays'], utterance['anim'], mismatch))
+
+    # -------------------- préchargement (warm set) --------------------
+    def _load_family_usage(self):
+        """Scores d'usage des familles des sessions précédentes, atténués de moitié à chaque démarrage."""
+        try:
+            with open(ANIM_USAGE_PATH, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {k: float(v) * 0.5 for k, v in data.items() if float(v) * 0.5 >= 0.5}
+        except Exception:
+            return {}
+
+    def _save_family_usage(self):
+        try:
+            usage_dir = os.path.dirname(ANIM_USAGE_PATH)
+            if not os.path.isdir(usage_dir):
+                os.makedirs(usage_dir)
+            temp_path = ANIM_USAGE_PATH + ".tmp"
+            with self._lock:
+                usage = dict(self._family_usage)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(usage, f)
+            os.replace(temp_path, ANIM_USAGE_PATH)
+        except Exception as e:
+            self.logger.warning("[ANIM] Sauvegarde de l'usage des familles impossible: {}".format(e))
+
+    def _record_family_use(self, anim_name):
+        family = self.RE_SUFFIX_NUM.sub('', self._anim_alias(anim_name))
+        with self._lock:
+            self._family_usage[family] = self._family_usage.get(family, 0.0) + 1.0
+            self._usage_dirty += 1
+            save = self._usage_dirty >= 10
+            if save:
+                self._usage_dirty = 0
+        if save:
+            # Écriture disque hors du chemin de résolution des tags
+            self._io_worker.submit(u"family-usage-save", self._save_family_usage)
+
+    def _preload_animation(self, anim_name):
+        """Précharge une animation (asynchrone). Retourne True si elle était déjà chaude.
+        < 2.9: ALBehaviorManager.preloadBehavior. 2.9: ALAnimationPlayer n'a pas de préchargement,
+        on lit le .qianim (thread d'E/S) pour qu'il soit dans le cache disque au moment du run().
+        L'animation n'entre dans le warm set qu'une fois le préchargement réussi."""
+        with self._lock:
+            if anim_name in self._warm_set:
+                self._warm_set.move_to_end(anim_name)
+                return True
+            if anim_name in self._preloading:
+                return False
+            self._preloading.add(anim_name)
+            self._preload_count += 1
+        try:
+            if self.is_29:
+                self._io_worker.submit(u"preload:" + anim_name, lambda: self._read_qianim(anim_name))
+            else:
+                preload = getattr(self._bm, 'preloadBehavior', None) if self._bm else None
+                if not preload:
+                    raise RuntimeError(u"preloadBehavior indisponible")
+                fut = preload(anim_name, _async=True)
+                with self._lock: self._preload_futures[anim_name] = fut
+                fut.addCallback(lambda f: self._on_preload_future(anim_name, f))
+        except Exception as e:
+            self._preload_done(anim_name, e)
+        return False
+
+    def _read_qianim(self, anim_name):
+        try:
+            rel = anim_name.split("animations/", 1)[-1]
+            with open(str(Path.home() / ".local/share/PackageManager/apps/animations" / rel), 'rb') as f:
+                f.read()
+        except Exception as e:
+            self._preload_done(anim_name, e)
+            return
+        self._preload_done(anim_name)
+
+    def _on_preload_future(self, anim_name, fut):
+        try:
+            if fut.isCanceled() or fut.hasError():
+                raise RuntimeError(fut.error() if fut.hasError() else u"annulé")
+            if fut.value() is False:
+                raise RuntimeError(u"preloadBehavior a échoué")
+        except Exception as e:
+            self._preload_done(anim_name, e)
+            return
+        self._preload_done(anim_name)
+
+    def _preload_done(self, anim_name, error=None):
+        with self._lock:
+            self._preloading.discard(anim_name)
+            if error is not None:
+                self._preload_futures.pop(anim_name, None)
+            else:
+                self._warm_set[anim_name] = time.time()
+                self._warm_set.move_to_end(anim_name)
+                while len(self._warm_set) > WARM_SET_SIZE:
+                    evicted, _ = self._warm_set.popitem(last=False)
+                    self._preload_futures.pop(evicted, None)
+        if error is not None:
+            self.logger.debug(u"[ANIM] Préchargement impossible pour {}: {}".format(anim_name, error))
+
+    def _warm_up_animations(self):
+        try:
+            targets = [name for variants in self._tag_index['pools']['thinking'] for name in variants]
+            with self._lock:
+                usage = list(self._family_usage.items())
+            top = sorted(usage, key=lambda kv: kv[1], reverse=True)[:WARM_TOP_FAMILIES]
+            for family, _score in top:
+                targets.extend(self._tag_index['families'].get(family, ()))
+            targets = targets[:WARM_SET_SIZE]
+            for name in targets:
+                self._preload_animation(name)
+            self.logger.info(u"[ANIM] Warm set initial: {} préchargements lancés ({} familles favorites).".format(
+                len(targets), len(top)))
+        except Exception as e:
+            self.logger.warning(u"[ANIM] Préchauffage des animations impossible: {}".format(e))
+
+    def _mark_speech_start(self, anim_name):
+        """Attend brièvement un préchargement en cours puis horodate le début de la parole."""
+        with self._lock:
+            fut = self._preload_futures.pop(anim_name, None)
+            warm = self._preload_warm.pop(anim_name, anim_name in self._warm_set)
+        if fut is not None:
+            try:
+                if fut.isRunning(): fut.wait(int(PRELOAD_WAIT_MAX * 1000))
+            except Exception:
+                pass
+        with self._lock:
+            self._gesture_pending = (anim_name, time.time(), warm)
+
+    def _note_gesture_start(self, anim_name, ts, dispatch=False):
+        """dispatch=True: ts est l'envoi de la commande, pas le début observé du geste."""
+        with self._lock:
+            pending = self._gesture_pending
+            if not pending or pending[0] != anim_name:
+                return
+            self._gesture_pending = None
+            offset = ts - pending[1]
+            self._gesture_offsets.append((offset, pending[2], dispatch))
+        self.logger.info(u"[ANIM] Geste '{}' {} {:+.0f} ms après le début de la parole ({}).".format(
+            anim_name, u"envoyé (début réel non observable)" if dispatch else u"démarré", offset * 1000.0,
+            u"préchargé" if pending[2] else u"à froid"))
 
     def resolveAnimationTags(self, text):
+        self._connect()
         self.last_resolved_animation = None
+        self._current_voice()
+        speech_duration = self._estimate_speech_duration(self.RE_ANIMATION_TAG.sub('', text or ""))
         def replace_and_track(m):
-            return self._reconstruct_animation_tag(m.group(1))
+            return self._reconstruct_animation_tag(m.group(1), speech_duration)
         processed_text = self.RE_ANIMATION_TAG.sub(replace_and_track, text or "")
         if self.last_resolved_animation is None:
             match = self.RE_START_TAG.search(processed_text)
             if match: self.last_resolved_animation = match.group(1)
         return processed_text
 
-    def _reconstruct_animation_tag(self, animation_path):
-        chosen = None
+    # -------------------- index de résolution des tags --------------------
+    @staticmethod
+    def _empty_tag_index():
+        return {'names': {}, 'families': {}, 'family_keys': [], 'pools': {'thinking': [], 'listening': []}, 'fuzzy': {}}
+
+    @staticmethod
+    def _anim_alias(name):
+        """Clé normalisée d'une animation/famille: casse, préfixe animations/, suffixe .qianim."""
+        k = (name or "").strip().lower()
+        if k.startswith("./"): k = k[2:]
+        while k.startswith("animations/") or k.startswith("animation/"):
+            k = k.split("/", 1)[1]
+        if k.endswith(".qianim"): k = k[:-7]
+        return k.strip("/")
+
+    def _build_tag_index(self):
+        """Construit une fois par scan les tables de résolution O(1) des tags %%anim%%."""
+        index = self._empty_tag_index()
+        emit = self._emit29 if self.is_29 else (lambda n: n)
+        for anim in self.animations:
+            name = anim['name']
+            index['names'].setdefault(self._anim_alias(name), emit(name))
+        families_sorted = []
+        for fam, anims in self.animations_families.items():
+            variants = tuple(emit(a) for a in anims)
+            if not variants:
+                continue
+            index['families'][self._anim_alias(fam)] = variants
+            label = fam.replace('animations/', '')
+            families_sorted.append(label)
+            if "Scratch" in label or "Think" in label:
+                index['pools']['thinking'].append(variants)
+            if "Listen" in label:
+                index['pools']['listening'].append(variants)
+        index['family_keys'] = list(index['families'].keys())
+        self._tag_index = index
+        self._families_sorted = sorted(families_sorted)
+        self.logger.info("[ANIM] Index de résolution: {} alias, {} familles, pools think={} listen={}.".format(
+            len(index['names']), len(index['families']), len(index['pools']['thinking']), len(index['pools']['listening'])))
+
+    def _lookup_animation(self, raw, speech_duration=None):
+        """Retourne le nom d'animation à émettre pour un tag, ou None si rien d'approchant."""
+        index = self._tag_index
+        key = self._anim_alias(raw)
+        variants = index['families'].get(key)
+        if variants:
+            return self._pick_variant(variants, speech_duration)
+        name = index['names'].get(key)
+        if name:
+            return name
+        # Variante inexistante d'une famille connue (ex: Hey_9 alors que Hey_1..4)
+        variants = index['families'].get(self.RE_SUFFIX_NUM.sub('', key))
+        if variants:
+            return self._pick_variant(variants, speech_duration)
+        # Famille la plus proche (sortie du modèle légèrement fausse), mémorisée
+        fuzzy = index['fuzzy']
+        fam = fuzzy.get(key, '')
+        if fam == '':
+            if len(fuzzy) > 512:
+                fuzzy.clear()
+            match = difflib.get_close_matches(key, index['family_keys'], n=1, cutoff=ANIM_FUZZY_CUTOFF)
+            fam = fuzzy[key] = match[0] if match else None
+            if fam:
+                self.logger.info(u"[ANIM] Tag '{}' rattaché à la famille proche '{}'.".format(raw, fam))
+        if fam:
+            return self._pick_variant(index['families'][fam], speech_duration)
+        return None
+
+    def _pick_variant(self, variants, speech_duration):
+        """Variante dont la durée couvre au mieux la phrase; la plus longue si aucune ne suffit."""
+        if not speech_duration:
+            return random.choice(variants)
+        timed = [(self.animations_durations.get(v, 0.0), v) for v in variants]
+        timed = [(d, v) for d, v in timed if d > 0]
+        if not timed:
+            return random.choice(variants)
+        long_enough = [(d, v) for d, v in timed if d >= speech_duration]
+        if not long_enough:
+            return max(timed)[1]
+        best = min(d for d, _ in long_enough)
+        return random.choice([v for d, v in long_enough if d <= best * ANIM_FIT_TOLERANCE])
+
+    def _reconstruct_animation_tag(self, animation_path, speech_duration=None):
         raw = animation_path.strip()
+        chosen = self._lookup_animation(raw, speech_duration)
+        if chosen:
+            # Préchargement dès la résolution, avant que la parole ne démarre
+            target = self._emit29(chosen) if self.is_29 else chosen
+            self._record_family_use(target)
+            was_warm = self._preload_animation(target)
+            with self._lock:
+                if len(self._preload_warm) > 64: self._preload_warm.clear()
+                self._preload_warm[target] = was_warm
         if self.is_29:
-            key_rel = self._to_qianim_relative(raw)
-            family_anims = self.animations_families.get(key_rel)
-            if family_anims:
-                chosen = random.choice(family_anims)
-            else:
-                installed_anims = [a['name'] for a in self.animations]
-                full_candidate = self._emit29(key_rel)
-                if full_candidate in installed_anims:
-                    chosen = key_rel
-                elif key_rel in installed_anims:
-                    chosen = key_rel
-                elif f"{key_rel}.qianim" in installed_anims:
-                    chosen = f"{key_rel}.qianim"
-                elif full_candidate.endswith(".qianim") and full_candidate[:-7] in installed_anims:
-                    chosen = full_candidate
             if not chosen:
                 self.logger.warning(f"[ANIM] Animation ou famille inconnue (2.9): '{raw}'")
-                chosen = key_rel
+                chosen = self._to_qianim_relative(raw)
             emit = self._emit29(chosen)
             self.last_resolved_animation = emit
             return f"^start({emit})"
         else:
-            family_anims = self.animations_families.get('animations/' + raw)
-            if family_anims: chosen = random.choice(family_anims)
-            else:
-                key = 'animations/' + raw
-                installed_anims = [a['name'] for a in self.animations]
-                if key in installed_anims: chosen = key
             if not chosen: self.logger.warning(f"[ANIM] Animation ou famille inconnue (2.7): '{raw}'"); chosen = 'animations/' + raw
             self.last_resolved_animation = chosen
             return f"^start({chosen})"
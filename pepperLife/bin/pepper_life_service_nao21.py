@@ -14,6 +14,7 @@ import time
 import qi
 import re
 import random
+import difflib
 
 
 def setup_logging():
@@ -32,6 +33,9 @@ def setup_logging():
 class PepperLifeService(object):
     RE_ANIMATION_TAG = re.compile(r'%%([^%]+)%%', re.IGNORECASE)
     RE_START_TAG = re.compile(r'\^start\(([^)]+)\)', re.IGNORECASE)
+    RE_SUFFIX_NUM = re.compile(r'_(\d+)$')
+    FUZZY_CUTOFF = 0.75  # seuil difflib pour rattacher un tag inconnu à la famille la plus proche
+
     def __init__(self, session, logger):
         self.session = session
         self.logger = logger
@@ -51,6 +55,7 @@ class PepperLifeService(object):
         self.animations_durations = {}
         self.applications = []
         self.last_resolved_animation = None
+        self._tag_index = self._empty_tag_index()
         self.onStateChanged = qi.Signal()
         self.logger.info("PepperLifeService Py2 (NAOqi 2.1/2.5) initialisé.")
 
@@ -222,6 +227,79 @@ class PepperLifeService(object):
         # filtre animations en retirant les éventuels noms identiques aux apps
         if app_names and self.animations:
             self.animations = [a for a in self.animations if a not in app_names]
+        self._build_tag_index()
+
+    # ---------------- Index de résolution des tags ----------------
+    @staticmethod
+    def _empty_tag_index():
+        return {'names': {}, 'families': {}, 'stems': {}, 'family_keys': [],
+                'pools': {'thinking': [], 'listening': []}, 'fuzzy': {}}
+
+    @staticmethod
+    def _anim_alias(name):
+        """Clé normalisée d'une animation/famille: casse, préfixe animations/, suffixe .qianim."""
+        k = (name or "").strip().lower()
+        if k.startswith("./"):
+            k = k[2:]
+        while k.startswith("animations/") or k.startswith("animation/"):
+            k = k.split("/", 1)[1]
+        if k.endswith(".qianim"):
+            k = k[:-7]
+        return k.strip("/")
+
+    def _build_tag_index(self):
+        """Construit une fois par scan les tables de résolution O(1) des tags %%anim%%."""
+        index = self._empty_tag_index()
+        for name in self.animations:
+            if not isinstance(name, basestring):
+                continue
+            alias = self._anim_alias(name)
+            index['names'].setdefault(alias, name)
+            # Suffixes du chemin ("Gestures/Hey_1", "Hey_1"): le premier trouvé gagne
+            parts = alias.split('/')
+            for i in range(1, len(parts)):
+                index['names'].setdefault('/'.join(parts[i:]), name)
+            index['stems'].setdefault(self.RE_SUFFIX_NUM.sub('', alias), []).append(name)
+            if "Think" in name or "Scratch" in name:
+                index['pools']['thinking'].append(name)
+            if "Listen" in name:
+                index['pools']['listening'].append(name)
+        for fam, anims in self.animations_families.items():
+            if anims:
+                index['families'][self._anim_alias(fam)] = tuple(anims)
+        index['family_keys'] = list(index['families'].keys()) + list(index['stems'].keys())
+        self._tag_index = index
+        self.logger.info("[ANIM] Index de résolution: %d alias, %d familles, pools think=%d listen=%d.",
+                         len(index['names']), len(index['families']),
+                         len(index['pools']['thinking']), len(index['pools']['listening']))
+
+    def _lookup_animation(self, raw):
+        """Retourne le comportement à lancer pour un tag, ou None si rien d'approchant."""
+        index = self._tag_index
+        key = self._anim_alias(raw)
+        variants = index['families'].get(key)
+        if variants:
+            return random.choice(variants)
+        name = index['names'].get(key)
+        if name:
+            return name
+        # Famille de variantes numérotées (ex: Hey -> Hey_1..4, ou Hey_9 inexistant)
+        variants = index['stems'].get(self.RE_SUFFIX_NUM.sub('', key))
+        if variants:
+            return random.choice(variants)
+        # Famille la plus proche (sortie du modèle légèrement fausse), mémorisée
+        fuzzy = index['fuzzy']
+        fam = fuzzy.get(key, '')
+        if fam == '':
+            if len(fuzzy) > 512:
+                fuzzy.clear()
+            match = difflib.get_close_matches(key, index['family_keys'], n=1, cutoff=self.FUZZY_CUTOFF)
+            fam = fuzzy[key] = match[0] if match else None
+            if fam:
+                self.logger.info(u"[ANIM] Tag '%s' rattaché à la famille proche '%s'.", raw, fam)
+        if fam:
+            return random.choice(index['families'].get(fam) or index['stems'][fam])
+        return None
 
     # ---------------- Speech ----------------
     def say(self, text):
@@ -400,28 +478,10 @@ class PepperLifeService(object):
         raw = animation_path.strip()
         if raw.startswith("animations/animations/"):
             raw = raw.replace("animations/animations/", "animations/", 1)
-        chosen = None
-        family_anims = self.animations_families.get('animations/' + raw)
-        if family_anims:
-            chosen = random.choice(family_anims)
-        else:
-            # Nettoyage pour éviter les doublons "animations/animations/"
-            key = raw
-            if key.startswith("animations/animations/"):
-                key = key.replace("animations/animations/", "animations/", 1)
-            elif not key.startswith("animations/"):
-                key = "animations/" + key
-            if key in self.animations:
-                chosen = key
-            else:
-                # fallback: tenter suffixe
-                for name in self.animations:
-                    if name.endswith("/" + raw) or name.endswith("/" + key):
-                        chosen = name
-                        break
+        chosen = self._lookup_animation(raw)
         if not chosen:
             self.logger.warning("[ANIM] Animation ou famille inconnue (2.1/2.5): '{}'".format(raw))
-            chosen = 'animations/' + raw
+            chosen = raw if raw.startswith("animations/") else 'animations/' + raw
         self.last_resolved_animation = chosen
         return "^start({})".format(chosen)
 
@@ -551,6 +611,12 @@ class PepperLifeService(object):
             self._scan_apps_and_animations()
         return list(self.animations_families.keys())
 
+    def getGesturePool(self, kind):
+        """Animations du pool précalculé ('thinking' ou 'listening')."""
+        if not self.animations:
+            self._scan_apps_and_animations()
+        return list(self._tag_index['pools'].get(kind) or [])
+
     def getAnimationDurations(self):
         if not self.animations_durations:
             self._scan_apps_and_animations()
@@ -632,8 +698,10 @@ class PepperLifeService(object):
     def startRandomThinkingGesture(self):
         self._connect()
         try:
-            # Choisir directement dans la liste des animations contenant Think/Scratch
-            thinking_anims = [a for a in self.animations if isinstance(a, basestring) and ("Think" in a or "Scratch" in a)]
+            # Pool précalculé au scan (animations contenant Think/Scratch)
+            if not self.animations:
+                self._scan_apps_and_animations()
+            thinking_anims = self._tag_index['pools']['thinking']
             if not thinking_anims:
                 self.logger.warning("Aucune animation 'Think' ou 'Scratch' trouvée pour le geste de réflexion.")
                 return ""
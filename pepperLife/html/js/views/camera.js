@@ -49,7 +49,8 @@ export function render(root, api){
   let timer = null;
   let isStreaming = false;
   let errorCount = 0;
-  const MAX_ERRORS = 8; // Allow for up to 2 seconds of errors (8 * 250ms)
+  const MAX_ERRORS = 5; // Reconnexions successives (1 s d'intervalle) avant d'abandonner
+  const STREAM_URL = '/api/camera/mjpeg?fps=5';
 
   function updateToggleButton(streaming, loading = false) {
     isStreaming = streaming;
@@ -73,14 +74,16 @@ export function render(root, api){
       if (timer) clearTimeout(timer);
       timer = null;
       isStreaming = false; // Explicitly set streaming to false
+      img.removeAttribute('src'); // Ferme la connexion MJPEG
       updateToggleButton(false);
   }
 
   function step() {
     if (!isStreaming || !el.isConnected) {
-      return; // Stop the loop if not streaming or element is gone
+      return; // Stop if not streaming or element is gone
     }
-    img.src = '/cam.png?t=' + Date.now();
+    // Une seule requête: le serveur pousse les images (multipart/x-mixed-replace)
+    img.src = STREAM_URL + '&t=' + Date.now();
   }
 
   img.onload = () => {
@@ -88,14 +91,10 @@ export function render(root, api){
     img.style.display = 'block';
     altText.style.display = 'none';
     errorSpan.style.display = 'none';
-
-    // Schedule the next frame request
-    if (isStreaming) {
-        timer = setTimeout(step, 100); // 10fps
-    }
   };
 
   img.onerror = () => {
+    if (!isStreaming) return;
     errorCount++;
     if (errorCount > MAX_ERRORS) {
         img.style.display = 'none';
@@ -104,10 +103,8 @@ export function render(root, api){
         errorSpan.textContent = 'Erreur de chargement du flux. Le service caméra est-il démarré ?';
         stopPolling();
     } else {
-        // Retry after a short delay
-        if (isStreaming) {
-            timer = setTimeout(step, 250);
-        }
+        // Flux coupé (changement de caméra, arrêt auto): reconnexion
+        timer = setTimeout(step, 1000);
     }
   };
 
@@ -128,7 +125,7 @@ export function render(root, api){
             isStreaming = true;
             errorCount = 0;
             updateToggleButton(true);
-            step(); // Start the chained polling
+            step(); // Ouvre le flux MJPEG
         }).catch(err => {
             errorSpan.textContent = `Erreur : ${err.message}`;
             errorSpan.style.display = 'inline';
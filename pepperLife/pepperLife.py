@@ -7,6 +7,7 @@ import sys, time, os, atexit, json, threading
 
 from services.classSystem import bcolors, build_system_prompt_in_memory, load_config, handle_exception
 from services.classLEDs import PepperLEDs, led_management_thread
+from services.classLog import LOG
 
 # Forcer l'I/O Python en UTF-8 (évite les erreurs d'encodage sur NAOqi 2.5)
 os.environ.setdefault("PYTHONIOENCODING", "utf-8")
@@ -23,20 +24,9 @@ def _get_env_naoqi_version():
         return version, is_29
     return None, False
 
-def log(msg, level='info', color=None):
-    verbosity_map = {'error': 0, 'warning': 1, 'info': 2, 'debug': 3}
-    level_num = verbosity_map.get(level, 2)
-    if CONFIG['log']['verbosity'] >= level_num:
-        if color:
-            print(color + msg + bcolors.ENDC)
-        else:
-            print(msg)
-
-def _logger(msg, **kwargs):
-    try:
-        log(msg, **kwargs)
-    except Exception:
-        print(msg)
+# Journal paresseux + écriture asynchrone (services/classLog.py): log("x=%s", obj, level='debug')
+log = LOG
+_logger = LOG
 
 def install_requirements(packages_to_install):
     import subprocess
@@ -241,6 +231,7 @@ threading.excepthook = handle_exception
 def main():
     global CONFIG
     CONFIG = load_config(_logger)
+    LOG.configure(CONFIG)
     check_requirements()
 
     from services.chatBots.chatGPT import chatGPT
@@ -283,6 +274,14 @@ def main():
             fam_count = stats.get('family_count', 'N/A')
             log_msg = u"Statistiques animations : {} animations chargées, {} familles.".format(anim_count, fam_count)
             log(log_msg, color=bcolors.WARNING) # WARNING est jaune
+            if stats.get('scan_mode'):
+                log(u"Index animations : scan {} en {:.3f}s (cold {:.3f}s, {} en cache, {} recalculées).".format(
+                    stats.get('scan_mode'), stats.get('scan_seconds', 0.0), stats.get('cold_scan_seconds', 0.0),
+                    stats.get('cache_hits', 0), stats.get('rescanned', 0)), level='debug')
+            extra_phrases = CONFIG.get('audio', {}).get('cached_phrases') or []
+            if extra_phrases:
+                queued = pls.preRenderPhrases(extra_phrases)
+                log(u"Cache de phrases : {} phrase(s) de la config mises en file de rendu.".format(queued), level='debug')
         except Exception as e:
             log("Impossible de récupérer les stats d'animation: {}".format(e), level='warning')
 
@@ -335,7 +334,7 @@ def main():
                             mem_flag = al_memory.getData("Dialog/IsStarted")
                             is_dialog_active = _mem_flag_as_bool(mem_flag)
                             status_checked = True
-                            log("Watchdog: ALMemory Dialog/IsStarted (brut) -> {} | interprété -> {}".format(mem_flag, is_dialog_active), level='debug')
+                            log("Watchdog: ALMemory Dialog/IsStarted (brut) -> %s | interprété -> %s", mem_flag, is_dialog_active, level='debug')
                     except Exception as e:
                         log("Watchdog: Impossible de vérifier l'état de ALDialog via ALMemory: {}".format(e), level='debug')
 
@@ -344,7 +343,7 @@ def main():
                             status_info = None
                             if hasattr(al_dialog, 'getStatus'):
                                 status_info = al_dialog.getStatus()
-                                log("Watchdog: ALDialog.getStatus() -> {}".format(status_info), level='debug')
+                                log("Watchdog: ALDialog.getStatus() -> %s", status_info, level='debug')
                             state_label = None
                             if isinstance(status_info, dict):
                                 state_label = status_info.get('state') or status_info.get('status')
@@ -359,7 +358,7 @@ def main():
                             if not is_dialog_active and hasattr(al_dialog, 'getAllLoadedTopics'):
                                 try:
                                     topics = al_dialog.getAllLoadedTopics()
-                                    log("Watchdog: ALDialog.getAllLoadedTopics() -> {}".format(topics), level='debug')
+                                    log("Watchdog: ALDialog.getAllLoadedTopics() -> %s", topics, level='debug')
                                 except Exception:
                                     pass
                             if not is_dialog_active and hasattr(al_dialog, 'isDialogRunning'):
@@ -388,7 +387,7 @@ def main():
                                     last_dialog_stop = now
                             else:
                                 remaining = max(0.0, 15.0 - (now - last_dialog_stop))
-                                log("Watchdog: ALDialog encore détecté actif, nouvel essai dans {:.1f}s.".format(remaining), level='debug')
+                                log("Watchdog: ALDialog encore détecté actif, nouvel essai dans %.1fs.", remaining, level='debug')
                     else:
                         if not is_29_version:
                             if not is_dialog_active:
@@ -467,6 +466,7 @@ def main():
         try:
             updated_config = load_config(_logger)
             CONFIG = updated_config
+            LOG.configure(CONFIG)
             msg = "Configuration rechargée."
             if reason:
                 msg = f"{msg} ({reason})"
@@ -546,7 +546,7 @@ def main():
         except Exception as e: log("Réveil échoué: {}".format(e), level='error')
 
     auto_chat_mode = (CONFIG.get('boot', {}).get('auto_chat_mode') or '').strip().lower()
-    if auto_chat_mode in ('gpt', 'ollama'):
+    if auto_chat_mode in ('gpt', 'ollama', 'gateway'):
         start_chat(auto_chat_mode)
     elif CONFIG.get('boot', {}).get('start_chatbot_on_boot', False):
         start_chat('gpt')
@@ -11,6 +11,9 @@ from typing import List, Tuple, Dict, Any, Optional, Callable
 from openai import OpenAI
 import os
 import json
+from collections import deque
+
+from ..classTurnTrace import TURN_TRACER
 
 # -----------------------------------------------------------------------------
 # Config par défaut (surchargée par config.json et/ou arguments du ctor)
@@ -87,6 +90,11 @@ class chatGPT(object):
 
         self._client: Optional[OpenAI] = None
         self.system_prompt = system_prompt or "Ton nom est pepper"
+        # Flux: compteurs par type d'événement; stream_raw_sample = nb d'événements gardés (debug)
+        try:
+            self.stream_raw_sample = max(0, int(self.config.get("openai", {}).get("stream_raw_sample") or 0))
+        except (TypeError, ValueError):
+            self.stream_raw_sample = 0
 
     @staticmethod
     def get_base_prompt(config=None, logger=None):
@@ -152,35 +160,40 @@ class chatGPT(object):
             pass
         self.log(f"USAGE: input={input_tokens} cached={cached} output={output_tokens}", level='info')
 
-    def _chat_stream(self, req: Dict[str, Any], on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None):
+    def _chat_stream(self, req: Dict[str, Any], on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None, cancel=None):
         text_parts: List[str] = []
-        events: List[Dict[str, Any]] = []
+        event_counts: Dict[str, int] = {}
+        sample = deque(maxlen=self.stream_raw_sample) if self.stream_raw_sample else None
         final_response = None
         stream_error: Optional[str] = None
 
         try:
             with self.client().responses.stream(**req) as stream:
+                if cancel is not None:
+                    # Annulation depuis un autre thread (requête doublée perdante): ferme le flux HTTP
+                    cancel.on_cancel(stream.close)
                 for event in stream:
+                    if cancel is not None and cancel.is_set():
+                        raise RuntimeError("Flux annulé")
                     event_type = getattr(event, "type", "")
+                    event_counts[event_type] = event_counts.get(event_type, 0) + 1
+                    if sample is not None:
+                        sample.append(event)
                     if event_type == "response.output_text.delta":
                         delta = getattr(event, "delta", "") or ""
                         if delta:
+                            if not text_parts:
+                                TURN_TRACER.mark('llm_first_token')
                             text_parts.append(delta)
-                            event_payload = {'type': event_type, 'delta': delta}
-                            events.append(event_payload)
                             self._notify_stream(on_chunk, {'type': 'chunk', 'delta': delta})
                     elif event_type == "response.error":
                         error_obj = getattr(event, "error", None)
                         err_msg = getattr(error_obj, "message", None) or str(error_obj or event)
-                        events.append({'type': event_type, 'error': err_msg})
                         self._notify_stream(on_chunk, {'type': 'error', 'error': err_msg})
                         stream_error = err_msg
                         raise RuntimeError(err_msg)
                     elif event_type == "response.completed":
                         final_response = getattr(event, "response", None)
-                        events.append({'type': event_type})
-                    else:
-                        events.append({'type': event_type})
                 if final_response is None:
                     final_response = stream.get_final_response()
         except Exception as e:
@@ -201,7 +214,9 @@ class chatGPT(object):
         usage = getattr(final_response, "usage", None)
         self._log_usage(usage)
 
-        raw_payload = {'response': final_response, 'events': events}
+        raw_payload = {'response': final_response, 'event_counts': event_counts}
+        if sample is not None:
+            raw_payload['events'] = list(sample)
         return text, raw_payload
 
     # ---------- Construction des messages ----------
@@ -226,7 +241,8 @@ class chatGPT(object):
         temperature: Optional[float] = None,
         max_output_tokens: Optional[int] = None,
         on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None,
-        stream: Optional[bool] = None
+        stream: Optional[bool] = None,
+        cancel=None
     ) -> Tuple[str, Any]:
         """
         Renvoie une réponse courte et l'objet réponse brut de l'API.
@@ -235,6 +251,7 @@ class chatGPT(object):
         - 'temperature' seulement si supporté
         - Retry auto si l'API refuse 'temperature'
         - Logs usage + cache + texte
+        - `cancel` (objet avec is_set()/on_cancel(fn), cf. classLLMHedge.CancelToken): coupe le flux en cours
         """
         oai = self.config["openai"]
 
@@ -271,8 +288,11 @@ class chatGPT(object):
 
         if stream_mode:
             try:
-                text, raw_payload = self._chat_stream(req, on_chunk=on_chunk)
+                text, raw_payload = self._chat_stream(req, on_chunk=on_chunk, cancel=cancel)
             except Exception as e:
+                if cancel is not None and cancel.is_set():
+                    self.log("Flux Responses API annulé.", level='debug')
+                    return "", {"error": "cancelled", "cancelled": True}
                 self.log("Responses API streaming error: %s" % e, level='error')
                 return "Désolé, une erreur est survenue avec le service de chat.", {"error": str(e)}
 
@@ -294,7 +314,8 @@ class chatGPT(object):
                 self.log("Responses API error: %s" % e, level='error')
                 return "Désolé, une erreur est survenue avec le service de chat.", {"error": str(e)}
 
-        # Texte retourné
+        # Texte retourné (non-stream: le premier token arrive avec la réponse complète)
+        TURN_TRACER.mark('llm_first_token')
         text = (getattr(resp, "output_text", "") or "").strip()
         self.log(f"CHAT TEXT: {text}", level='debug')
         self._log_usage(getattr(resp, "usage", None))
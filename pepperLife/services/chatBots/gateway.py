@@ -0,0 +1,110 @@
+#! -*- coding: utf-8 -*-
+"""
+Client de la passerelle LLM partagée (gatewayServer.py), backend du mode de chat 'gateway'.
+
+Le robot n'envoie que son prompt système, son historique et la phrase de l'utilisateur:
+clés OpenAI, serveurs Ollama et options du modèle sont gérés par la passerelle.
+La signature `chat(user_text, hist)` reste compatible avec les autres backends de PepperLife.
+"""
+from __future__ import annotations
+
+import socket
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..classTurnTrace import TURN_TRACER
+from .ollama import normalize_base_url, stream_ollama_api
+
+DEFAULT_TIMEOUT = 60
+
+
+class ChatGateway(object):
+    """
+    Config "gateway": url, robot_id (vide = nom d'hôte), backend ('ollama' | 'gpt'), model (vide = défaut
+    de la passerelle), priority (0 = la plus haute), timeout.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, system_prompt: Optional[str] = None, logger=None):
+        self.config = config or {}
+        self.log = logger or (lambda msg, **kwargs: None)
+        self.gateway_cfg: Dict[str, Any] = dict(self.config.get('gateway', {}) or {})
+        self.base_url = normalize_base_url(self.gateway_cfg.get('url') or "")
+        self.robot_id = self.gateway_cfg.get('robot_id') or socket.gethostname()
+        self.backend = self.gateway_cfg.get('backend') or 'ollama'
+        self.model = self.gateway_cfg.get('model') or None
+        try:
+            self.priority = int(self.gateway_cfg.get('priority', 1))
+        except (TypeError, ValueError):
+            self.priority = 1
+        try:
+            self.timeout = float(self.gateway_cfg.get('timeout') or DEFAULT_TIMEOUT)
+        except (TypeError, ValueError):
+            self.timeout = DEFAULT_TIMEOUT
+        self.system_prompt = system_prompt or ""
+
+    def chat(
+        self,
+        user_text: str,
+        hist: Optional[List[Tuple[str, str]]] = None,
+        *,
+        model: Optional[str] = None,
+        on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel=None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Envoie le tour à la passerelle et renvoie (réponse, dernier événement du flux).
+        Les fragments arrivent dans on_chunk au fil de l'eau; `cancel` ferme la connexion,
+        ce qui désabonne le robot (et annule l'appel backend si personne d'autre ne l'attend).
+        """
+        if not self.base_url:
+            raise RuntimeError("Passerelle LLM non configurée (gateway.url).")
+        payload: Dict[str, Any] = {
+            'robot_id': self.robot_id,
+            'backend': self.backend,
+            'priority': self.priority,
+            'system_prompt': self.system_prompt,
+            'history': [[role, content] for role, content in (hist or [])],
+            'user_text': user_text,
+        }
+        if model or self.model:
+            payload['model'] = model or self.model
+
+        parts: List[str] = []
+        final: Dict[str, Any] = {}
+        index = 0
+        for event in stream_ollama_api(self.base_url, "/v1/chat", payload, timeout=self.timeout, cancel=cancel):
+            kind = event.get('type') if isinstance(event, dict) else None
+            if kind == 'chunk':
+                delta = event.get('delta') or ""
+                if delta and not parts:
+                    TURN_TRACER.mark('llm_first_token')
+                parts.append(delta)
+                if on_chunk:
+                    try:
+                        on_chunk({'type': 'chunk', 'index': index, 'delta': delta, 'done': False, 'raw': event})
+                    except Exception:
+                        pass
+                index += 1
+            elif kind == 'error':
+                raise RuntimeError("Passerelle LLM: {}".format(event.get('error')))
+            elif kind == 'done':
+                final = event
+                break
+        if cancel is not None and cancel.is_set():
+            return "", {'cancelled': True}
+        if not final:
+            raise RuntimeError("Flux interrompu par la passerelle LLM.")
+
+        text = final.get('text') or "".join(parts)
+        if not parts:
+            # Réponse servie par le cache de la passerelle: un seul fragment pour le lecteur en flux
+            TURN_TRACER.mark('llm_first_token')
+            if on_chunk and text:
+                try:
+                    on_chunk({'type': 'chunk', 'index': 0, 'delta': text, 'done': True, 'raw': final})
+                except Exception:
+                    pass
+        TURN_TRACER.annotate(gateway={'cached': bool(final.get('cached')), 'coalesced': bool(final.get('coalesced')),
+                                      'queue_ms': final.get('queue_ms')})
+        self.log("[GATEWAY] Réponse ({} ms en file, cache={}, partagée={})".format(
+            final.get('queue_ms'), final.get('cached'), final.get('coalesced')), level='debug')
+        return text, final
@@ -0,0 +1,446 @@
+#! -*- coding: utf-8 -*-
+"""
+Passerelle LLM partagée pour une flotte de robots PepperLife (processus séparé, sur une machine du LAN).
+
+Construite sur les clients existants (ChatOllama, chatGPT): clés, serveurs Ollama et options
+vivent dans la config de la passerelle, pas sur les robots (mode de chat 'gateway', cf. gateway.py).
+
+POST /v1/chat   -> flux NDJSON (même transport que /api/chat d'Ollama)
+  {robot_id, backend: 'ollama'|'gpt', model?, priority?, system_prompt, history: [[role, content]], user_text}
+  <- {"type": "chunk", "delta": "..."} ... puis {"type": "done", "text": "...", "cached": b, "coalesced": b, "queue_ms": x}
+     ou {"type": "error", "error": "..."}
+GET  /v1/stats  -> files, cache, compteurs par robot
+GET  /metrics   -> métriques au format Prometheus (classMetrics.REGISTRY)
+
+- Files équitables: une file FIFO par robot et par priorité (0 = la plus haute), robots servis à tour de rôle.
+- Limitation: rate_per_minute requêtes par robot vers les backends (seau à jetons) -> HTTP 429.
+- Coalescence: une requête identique (backend, modèle, prompt système, historique, texte) déjà en file ou
+  en cours reçoit le même flux (fragments déjà reçus rejoués) au lieu d'un second appel.
+- Cache partagé: réponses complètes gardées cache_ttl_s secondes (LRU de cache_size entrées).
+- Un client déconnecté se désabonne (vérifié toutes les CLIENT_CHECK_S secondes pendant l'attente);
+  un travail sans abonné est retiré de la file ou annulé.
+
+Lancement: python3 bin/llm_gateway.py --config gateway.json [--host 0.0.0.0] [--port 11500]
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import queue
+import select
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..classLLMHedge import CancelToken
+from ..classMetrics import REGISTRY, GATEWAY_QUEUE_SECONDS, GATEWAY_REQUESTS
+from .ollama import ChatOllama
+
+DEFAULT_PORT = 11500
+DEFAULT_WORKERS = {'ollama': 2, 'gpt': 8}
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_CACHE_TTL = 600.0
+DEFAULT_RATE_PER_MINUTE = 30
+MAX_SERVICES = 32
+# Attente max d'un événement avant de vérifier que le client est toujours connecté
+CLIENT_CHECK_S = 1.0
+
+
+class GatewayBusy(Exception):
+    """Robot au-delà de sa limite de débit (HTTP 429)."""
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Empreinte d'une requête: deux requêtes de même empreinte ont la même réponse."""
+    material = [request.get('backend'), request.get('model'), request.get('system_prompt'),
+                request.get('history'), request.get('user_text')]
+    return hashlib.sha1(json.dumps(material, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class _Job(object):
+    """Un appel backend partagé par un ou plusieurs abonnés (file par client HTTP)."""
+
+    def __init__(self, key: str, request: Dict[str, Any]):
+        self.key = key
+        self.request = request
+        self.robot = request.get('robot_id') or 'inconnu'
+        self.priority = int(request.get('priority', 1) or 0)
+        self.backend = request.get('backend') or 'ollama'
+        self.cancel = CancelToken()
+        self.enqueued = time.time()
+        self.started: Optional[float] = None
+        self.finished = False
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+        self._subscribers: List[queue.Queue] = []
+
+    def subscribe(self) -> queue.Queue:
+        sink: queue.Queue = queue.Queue()
+        with self._lock:
+            for event in self._events:
+                sink.put(event)
+            if not self.finished:
+                self._subscribers.append(sink)
+        return sink
+
+    def unsubscribe(self, sink: queue.Queue) -> int:
+        with self._lock:
+            if sink in self._subscribers:
+                self._subscribers.remove(sink)
+            return len(self._subscribers)
+
+    def publish(self, event: Dict[str, Any], final: bool = False):
+        with self._lock:
+            if self.finished:
+                return
+            self._events.append(event)
+            subscribers = list(self._subscribers)
+            if final:
+                self.finished = True
+                self._subscribers = []
+        for sink in subscribers:
+            sink.put(event)
+
+
+class FairQueue(object):
+    """Files par priorité puis par robot; get() sert les robots d'une même priorité à tour de rôle."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._levels: Dict[int, "OrderedDict[str, deque]"] = {}
+        self._size = 0
+
+    def put(self, job: _Job):
+        with self._cond:
+            robots = self._levels.setdefault(job.priority, OrderedDict())
+            robots.setdefault(job.robot, deque()).append(job)
+            self._size += 1
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[_Job]:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size > 0, timeout):
+                return None
+            level = min(p for p, robots in self._levels.items() if robots)
+            robots = self._levels[level]
+            robot, jobs = next(iter(robots.items()))
+            job = jobs.popleft()
+            # Le robot servi passe en fin de tour
+            del robots[robot]
+            if jobs:
+                robots[robot] = jobs
+            self._size -= 1
+            return job
+
+    def remove(self, job: _Job) -> bool:
+        with self._cond:
+            jobs = self._levels.get(job.priority, {}).get(job.robot)
+            if not jobs or job not in jobs:
+                return False
+            jobs.remove(job)
+            if not jobs:
+                del self._levels[job.priority][job.robot]
+            self._size -= 1
+            return True
+
+    def depth(self) -> int:
+        with self._cond:
+            return self._size
+
+
+class _TokenBucket(object):
+    def __init__(self, per_minute: float):
+        self.capacity = max(1.0, float(per_minute))
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.stamp = time.time()
+
+    def take(self) -> bool:
+        now = time.time()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class LLMGateway(object):
+    """
+    Config "gateway_server": workers {ollama, gpt}, cache_size, cache_ttl_s, rate_per_minute.
+    Les sections "ollama" et "openai" de la même config servent aux backends.
+    service_factory(backend, system_prompt) -> objet avec chat(); par défaut ChatOllama / chatGPT.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, logger=None,
+                 service_factory: Optional[Callable[[str, str], Any]] = None):
+        self.config = config or {}
+        self.log = logger or (lambda msg, **kwargs: print(msg))
+        cfg = self.config.get('gateway_server', {}) or {}
+        self.workers = dict(DEFAULT_WORKERS)
+        self.workers.update(cfg.get('workers') or {})
+        self.cache_size = int(cfg.get('cache_size') or DEFAULT_CACHE_SIZE)
+        self.cache_ttl = float(cfg.get('cache_ttl_s') or DEFAULT_CACHE_TTL)
+        self.rate_per_minute = float(cfg.get('rate_per_minute') or DEFAULT_RATE_PER_MINUTE)
+        self._factory = service_factory or self._default_service
+        self._lock = threading.Lock()
+        self._queues = dict((backend, FairQueue()) for backend in self.workers)
+        self._inflight: Dict[str, _Job] = {}
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._services: "OrderedDict[Tuple[str, str, str], Any]" = OrderedDict()
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._robots: Dict[str, Dict[str, int]] = {}
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    # ---------- backends ----------
+    def _default_service(self, backend: str, system_prompt: str):
+        if backend == 'gpt':
+            from .chatGPT import chatGPT  # dépendance openai seulement si le backend est utilisé
+            return chatGPT(self.config, system_prompt=system_prompt, logger=self.log)
+        return ChatOllama(self.config, system_prompt=system_prompt, logger=self.log)
+
+    def _service(self, job: _Job):
+        # Une instance par robot: ChatOllama garde une fenêtre d'historique propre à la conversation
+        prompt = job.request.get('system_prompt') or ""
+        key = (job.backend, job.robot, hashlib.sha1(prompt.encode('utf-8')).hexdigest())
+        with self._lock:
+            service = self._services.get(key)
+            if service is not None:
+                self._services.move_to_end(key)
+                return service
+        service = self._factory(job.backend, prompt)
+        with self._lock:
+            self._services[key] = service
+            while len(self._services) > MAX_SERVICES:
+                self._services.popitem(last=False)
+        return service
+
+    # ---------- cycle de vie ----------
+    def start(self):
+        for backend, count in self.workers.items():
+            for i in range(int(count)):
+                worker = threading.Thread(target=self._work, args=(backend,), name="Gateway-{}-{}".format(backend, i))
+                worker.daemon = True
+                worker.start()
+                self._threads.append(worker)
+
+    def stop(self):
+        self._stop.set()
+
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    # ---------- requêtes ----------
+    def _count(self, robot: str, outcome: str):
+        with self._lock:
+            counters = self._robots.setdefault(robot, {})
+            counters[outcome] = counters.get(outcome, 0) + 1
+        GATEWAY_REQUESTS.inc(outcome)
+
+    def submit(self, request: Dict[str, Any]) -> Tuple[_Job, queue.Queue, str]:
+        """Rattache la requête à un travail (cache, en cours ou nouveau). Retourne (travail, file d'événements, issue)."""
+        backend = request.get('backend') or 'ollama'
+        if backend not in self._queues:
+            raise ValueError("Backend inconnu: {}".format(backend))
+        request['backend'] = backend
+        request['history'] = [[role, content] for role, content in (request.get('history') or [])]
+        key = request_key(request)
+        robot = request.get('robot_id') or 'inconnu'
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and now - cached[0] > self.cache_ttl:
+                del self._cache[key]
+                cached = None
+            job = self._inflight.get(key) if cached is None else None
+            if cached is None and job is None:
+                bucket = self._buckets.setdefault(robot, _TokenBucket(self.rate_per_minute))
+                if not bucket.take():
+                    job = None
+                    busy = True
+                else:
+                    busy = False
+                    job = _Job(key, request)
+                    self._inflight[key] = job
+                    outcome = 'queued'
+            elif cached is not None:
+                busy = False
+                self._cache.move_to_end(key)
+                outcome = 'cached'
+            else:
+                busy = False
+                outcome = 'coalesced'
+        if busy:
+            self._count(robot, 'rejected')
+            raise GatewayBusy("Limite de {} requêtes/min atteinte pour {}".format(int(self.rate_per_minute), robot))
+        self._count(robot, outcome)
+        if outcome == 'cached':
+            done = _Job(key, request)
+            done.publish({'type': 'done', 'text': cached[1], 'cached': True, 'coalesced': False, 'queue_ms': 0.0},
+                         final=True)
+            return done, done.subscribe(), outcome
+        sink = job.subscribe()
+        if outcome == 'queued':
+            self._queues[backend].put(job)
+        return job, sink, outcome
+
+    def release(self, job: _Job, sink: queue.Queue):
+        """Client parti: le travail sans abonné est retiré de la file, ou annulé s'il a démarré."""
+        if job.unsubscribe(sink) or job.finished:
+            return
+        if self._queues[job.backend].remove(job):
+            self._drop(job)
+            self.log("[GATEWAY] Requête de {} abandonnée avant traitement.".format(job.robot), level='debug')
+        else:
+            job.cancel.cancel()
+
+    def _drop(self, job: _Job):
+        with self._lock:
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+
+    def _work(self, backend: str):
+        fifo = self._queues[backend]
+        while not self._stop.is_set():
+            job = fifo.get(timeout=0.5)
+            if job is None:
+                continue
+            job.started = time.time()
+            queue_s = job.started - job.enqueued
+            GATEWAY_QUEUE_SECONDS.observe(queue_s, backend)
+            request = job.request
+
+            def sink(event, job=job):
+                delta = event.get('delta') if isinstance(event, dict) else None
+                if delta:
+                    job.publish({'type': 'chunk', 'delta': delta})
+
+            kwargs: Dict[str, Any] = {'on_chunk': sink, 'cancel': job.cancel}
+            if request.get('model'):
+                kwargs['model'] = request['model']
+            if backend == 'gpt':
+                kwargs['stream'] = True
+            try:
+                service = self._service(job)
+                history = [(role, content) for role, content in request['history']]
+                text, raw = service.chat(request.get('user_text') or "", history, **kwargs)
+                if isinstance(raw, dict) and (raw.get('error') or raw.get('cancelled')):
+                    raise RuntimeError(raw.get('error') or "annulé")
+                with self._lock:
+                    self._cache[job.key] = (time.time(), text)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+                job.publish({'type': 'done', 'text': text, 'cached': False,
+                             'queue_ms': round(1000.0 * queue_s, 1)}, final=True)
+            except Exception as e:
+                if not job.cancel.is_set():
+                    self.log("[GATEWAY] Erreur {} pour {}: {}".format(backend, job.robot, e), level='warning')
+                job.publish({'type': 'error', 'error': str(e)}, final=True)
+            finally:
+                self._drop(job)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            robots = dict((robot, dict(counters)) for robot, counters in self._robots.items())
+            data = {'inflight': len(self._inflight), 'cache_entries': len(self._cache), 'robots': robots}
+        data['queues'] = dict((backend, fifo.depth()) for backend, fifo in self._queues.items())
+        data['workers'] = dict(self.workers)
+        return data
+
+
+def make_handler(gateway: LLMGateway):
+    class GatewayHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            gateway.log("[GATEWAY] " + (format % args), level='debug')
+
+        def _json(self, code, payload):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/v1/stats':
+                self._json(200, gateway.stats()); return
+            if self.path == '/metrics':
+                body = REGISTRY.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self._json(404, {'error': 'route inconnue'})
+
+        def _client_gone(self) -> bool:
+            # Le client n'envoie plus rien après la requête: socket lisible = connexion fermée (ou en erreur)
+            try:
+                readable, _, _ = select.select([self.connection], [], [], 0)
+                return bool(readable) and self.connection.recv(1, socket.MSG_PEEK) == b''
+            except Exception:
+                return True
+
+        def do_POST(self):
+            if self.path != '/v1/chat':
+                self._json(404, {'error': 'route inconnue'}); return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                request = json.loads(self.rfile.read(length).decode('utf-8') or "{}")
+                job, sink, outcome = gateway.submit(request)
+            except GatewayBusy as e:
+                self._json(429, {'error': str(e)}); return
+            except Exception as e:
+                self._json(400, {'error': str(e)}); return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.end_headers()
+            try:
+                while True:
+                    try:
+                        event = sink.get(timeout=CLIENT_CHECK_S)
+                    except queue.Empty:
+                        if self._client_gone():
+                            self.log_message("client de %s parti pendant l'attente", job.robot)
+                            gateway.release(job, sink)
+                            return
+                        if gateway.stopped():
+                            gateway.release(job, sink)
+                            event = {'type': 'error', 'error': 'passerelle arrêtée'}
+                        else:
+                            continue
+                    if event.get('type') == 'done':
+                        event = dict(event, coalesced=event.get('coalesced', False) or outcome == 'coalesced')
+                    self.wfile.write(json.dumps(event, ensure_ascii=False).encode('utf-8') + b"\n")
+                    self.wfile.flush()
+                    if event.get('type') in ('done', 'error'):
+                        break
+            except Exception:
+                # Client déconnecté (socket fermée)
+                gateway.release(job, sink)
+
+    return GatewayHandler
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def serve(config: Dict[str, Any], host: str = '0.0.0.0', port: int = DEFAULT_PORT, logger=None,
+          service_factory=None) -> Tuple[LLMGateway, HTTPServer]:
+    """Démarre les workers et le serveur HTTP (thread). Retourne (passerelle, serveur)."""
+    gateway = LLMGateway(config, logger=logger, service_factory=service_factory)
+    gateway.start()
+    httpd = _ThreadingHTTPServer((host, port), make_handler(gateway))
+    thread = threading.Thread(target=httpd.serve_forever, name="GatewayHTTP")
+    thread.daemon = True
+    thread.start()
+    return gateway, httpd
@@ -7,7 +7,10 @@ chat runtime when Ollama mode is enabled.
 from __future__ import annotations
 
 import json
+import socket
 import ssl
+import time
+from collections import deque
 from typing import Any, Callable, Dict, List, Optional, Tuple
 import re
 import os
@@ -15,7 +18,13 @@ from urllib.parse import urlparse
 from urllib.request import Request, urlopen
 from urllib.error import URLError, HTTPError
 
+from ..classLog import log_enabled
+from ..classMetrics import OLLAMA_DECODE_TPS, OLLAMA_PREFILL_SECONDS, OLLAMA_TOKENS
+from ..classTurnTrace import TURN_TRACER
+
 DEFAULT_TIMEOUT = 6
+# Chargement d'un modèle à froid (lecture disque + GPU): bien plus long qu'un tour de chat
+WARMUP_TIMEOUT = 120
 
 
 def _build_request(url: str, data: Any = None) -> Request:
@@ -67,10 +76,20 @@ def _prepare_request(base_url: str, path: str, data: Any = None):
     return url, req
 
 
-def call_ollama_api(base_url: str, path: str, data: Any = None, timeout: int = DEFAULT_TIMEOUT) -> Dict[str, Any]:
+def _abort_response(resp):
+    """Coupe une réponse HTTP depuis un autre thread: la lecture en cours se termine aussitôt."""
+    try:
+        resp.fp.raw._sock.shutdown(socket.SHUT_RDWR)
+    except Exception:
+        pass
+
+
+def call_ollama_api(base_url: str, path: str, data: Any = None, timeout: int = DEFAULT_TIMEOUT, cancel=None) -> Dict[str, Any]:
     """
     Effectue un appel JSON (GET si data est None, sinon POST) vers le serveur Ollama.
     Lève RuntimeError si l'appel échoue.
+    cancel: objet avec is_set()/on_cancel(fn) (cf. classLLMHedge.CancelToken); effectif une fois
+    les en-têtes reçus.
     """
     url, req = _prepare_request(base_url, path, data)
     kwargs = {'timeout': timeout}
@@ -78,6 +97,8 @@ def call_ollama_api(base_url: str, path: str, data: Any = None, timeout: int = D
         kwargs['context'] = ssl.create_default_context()
     try:
         with urlopen(req, **kwargs) as resp:
+            if cancel is not None:
+                cancel.on_cancel(lambda: _abort_response(resp))
             raw = resp.read().decode('utf-8') or "{}"
             return json.loads(raw)
     except HTTPError as e:
@@ -88,9 +109,10 @@ def call_ollama_api(base_url: str, path: str, data: Any = None, timeout: int = D
         raise RuntimeError("Réponse JSON invalide depuis {}: {}".format(url, e)) from e
 
 
-def stream_ollama_api(base_url: str, path: str, data: Any = None, timeout: int = DEFAULT_TIMEOUT):
+def stream_ollama_api(base_url: str, path: str, data: Any = None, timeout: int = DEFAULT_TIMEOUT, cancel=None):
     """
     Générateur qui renvoie chaque objet JSON dans un flux NDJSON d'Ollama.
+    Le flux s'arrête (sans erreur) dès que `cancel` est déclenché.
     """
     url, req = _prepare_request(base_url, path, data)
     headers = dict(req.headers)
@@ -101,7 +123,11 @@ def stream_ollama_api(base_url: str, path: str, data: Any = None, timeout: int =
         kwargs['context'] = ssl.create_default_context()
     try:
         with urlopen(req, **kwargs) as resp:
+            if cancel is not None:
+                cancel.on_cancel(lambda: _abort_response(resp))
             for raw_line in resp:
+                if cancel is not None and cancel.is_set():
+                    return
                 if not raw_line:
                     continue
                 try:
@@ -182,6 +208,58 @@ def build_chat_messages(
     return messages
 
 
+def select_history_window(
+    previous: List[Tuple[str, str]],
+    history: List[Tuple[str, str]],
+    keep: int,
+    compact_at: int
+) -> List[Tuple[str, str]]:
+    """
+    Fenêtre d'historique en ajout seul. Tant que la fenêtre précédente se retrouve telle quelle dans
+    `history`, suivie des nouveaux messages, et ne dépasse pas compact_at messages, on ne fait
+    qu'ajouter: le début du prompt (système + catalogue + anciens échanges) ne change pas et
+    Ollama réutilise son cache KV. Sinon (dépassement, historique tronqué ou nouvelle
+    conversation), compaction d'un coup aux `keep` derniers messages.
+    """
+    history = [(role, content) for role, content in (history or []) if role in ("user", "assistant")]
+    size = len(previous or [])
+    if size:
+        for start in range(len(history) - size, -1, -1):
+            if history[start:start + size] == previous:
+                window = list(previous) + history[start + size:]
+                if len(window) <= compact_at:
+                    return window
+                break
+    return history[-keep:] if keep > 0 else []
+
+
+def eval_stats(final: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Télémétrie d'Ollama (dernier chunk ou réponse non streamée, durées en ns):
+    tokens de prompt réellement évalués (hors cache), durée de préremplissage, débit de génération.
+    """
+    stats: Dict[str, Any] = {}
+    if not isinstance(final, dict):
+        return stats
+    prompt_count = final.get('prompt_eval_count')
+    prompt_ns = final.get('prompt_eval_duration')
+    eval_count = final.get('eval_count')
+    eval_ns = final.get('eval_duration')
+    if isinstance(prompt_count, int):
+        stats['prompt_tokens'] = prompt_count
+    if isinstance(prompt_ns, (int, float)):
+        stats['prefill_ms'] = round(prompt_ns / 1e6, 1)
+        if prompt_ns > 0 and isinstance(prompt_count, int):
+            stats['prefill_tps'] = round(prompt_count / (prompt_ns / 1e9), 1)
+    if isinstance(eval_count, int):
+        stats['eval_tokens'] = eval_count
+    if isinstance(eval_ns, (int, float)) and eval_ns > 0 and isinstance(eval_count, int):
+        stats['eval_tps'] = round(eval_count / (eval_ns / 1e9), 1)
+    if isinstance(final.get('load_duration'), (int, float)):
+        stats['load_ms'] = round(final['load_duration'] / 1e6, 1)
+    return stats
+
+
 def _collect_text_chunks(payload) -> List[str]:
     """
     Parcourt récursivement les structures de réponse Ollama pour extraire du texte.
@@ -236,6 +314,11 @@ class ChatOllama(object):
         self.history_length = int(self.ollama_cfg.get('history_length', 4) or 4)
         if self.history_length < 1:
             self.history_length = 1
+        # Fenêtre d'historique en ajout seul, compactée à history_length au-delà de history_compact_at
+        self.history_compact_at = self._safe_int(self.ollama_cfg.get('history_compact_at')) or 2 * self.history_length
+        if self.history_compact_at < self.history_length:
+            self.history_compact_at = self.history_length
+        self._history_window: List[Tuple[str, str]] = []
         self.temperature = self._safe_float(self.ollama_cfg.get('temperature'), default=0.4)
         self.top_p = self._safe_float(self.ollama_cfg.get('top_p'), default=0.9)
         self.top_k = self._safe_int(self.ollama_cfg.get('top_k'), default=35)
@@ -254,6 +337,10 @@ class ChatOllama(object):
         if not self.timeout or self.timeout <= 0:
             self.timeout = 15
         self.stream_mode = self._safe_bool(self.ollama_cfg.get('stream'), default=True)
+        # Flux: seuls compteurs + dernier chunk sont gardés; stream_raw_sample = nb de chunks bruts conservés (debug)
+        self.stream_raw_sample = max(0, self._safe_int(self.ollama_cfg.get('stream_raw_sample'), default=0) or 0)
+        # Pool de serveurs (chatBots.ollamaPool.OLLAMA_POOL), branché par ChatManager; None = base_url seul
+        self.pool = None
 
         custom_prompt = (self.ollama_cfg.get('custom_prompt') or "").strip()
         base_prompt = (system_prompt or "Tu es Pepper.").strip()
@@ -386,18 +473,23 @@ class ChatOllama(object):
     def _fallback_message(self) -> str:
         return "%%Stand/BodyTalk/Listening/Listening%% Je suis prêt, mais je n'ai pas compris. Peux-tu reformuler ?"
 
-    def _chat_stream(self, payload, on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None):
-        raw_chunks: List[Dict[str, Any]] = []
+    def _chat_stream(self, payload, on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None, cancel=None, base_url=None):
+        sample = deque(maxlen=self.stream_raw_sample) if self.stream_raw_sample else None
+        debug = log_enabled(self.log, 'debug')
         text_parts: List[str] = []
         final_chunk: Dict[str, Any] = {}
+        last_chunk: Any = None
         done_seen = False
         chunk_index = 0
-        for chunk in stream_ollama_api(self.base_url, "/api/chat", payload, timeout=self.timeout):
-            raw_chunks.append(chunk)
-            try:
-                self.log("[OLLAMA_RAW] {}".format(chunk), level='debug')
-            except Exception:
-                pass
+        for chunk in stream_ollama_api(base_url or self.base_url, "/api/chat", payload, timeout=self.timeout, cancel=cancel):
+            last_chunk = chunk
+            if sample is not None:
+                sample.append(chunk)
+            if debug:
+                try:
+                    self.log("[OLLAMA_RAW] {}".format(chunk), level='debug')
+                except Exception:
+                    pass
             content = ""
             if isinstance(chunk, dict):
                 message = chunk.get('message')
@@ -408,20 +500,23 @@ class ChatOllama(object):
                 if not content:
                     content = chunk.get('response', '') or chunk.get('text', '')
             if content:
+                if not text_parts:
+                    TURN_TRACER.mark('llm_first_token')
                 text_parts.append(content)
-            try:
-                preview = content[:16] if isinstance(content, str) else ""
-                self.log(
-                    "[OLLAMA_STREAM_CHUNK] idx={} done={} len={} preview='{}'".format(
-                        chunk_index,
-                        chunk.get('done') if isinstance(chunk, dict) else None,
-                        len(content) if isinstance(content, str) else None,
-                        preview
-                    ),
-                    level='debug'
-                )
-            except Exception:
-                pass
+            if debug:
+                try:
+                    preview = content[:16] if isinstance(content, str) else ""
+                    self.log(
+                        "[OLLAMA_STREAM_CHUNK] idx={} done={} len={} preview='{}'".format(
+                            chunk_index,
+                            chunk.get('done') if isinstance(chunk, dict) else None,
+                            len(content) if isinstance(content, str) else None,
+                            preview
+                        ),
+                        level='debug'
+                    )
+                except Exception:
+                    pass
             if on_chunk:
                 try:
                     on_chunk({
@@ -438,12 +533,13 @@ class ChatOllama(object):
                 done_seen = True
                 break
             chunk_index += 1
-        if raw_chunks and not done_seen:
+        chunk_count = chunk_index + 1 if done_seen else chunk_index
+        if chunk_count and not done_seen:
             try:
-                self.log("[OLLAMA_WARN] Flux terminé sans chunk 'done'. Dernier chunk: {}".format(raw_chunks[-1]), level='warning')
+                self.log("[OLLAMA_WARN] Flux terminé sans chunk 'done'. Dernier chunk: {}".format(last_chunk), level='warning')
             except Exception:
                 pass
-        aggregated_source: Dict[str, Any] = final_chunk or (raw_chunks[-1] if raw_chunks else {})
+        aggregated_source: Dict[str, Any] = final_chunk or (last_chunk if chunk_count else {})
         aggregated: Dict[str, Any] = {}
         if isinstance(aggregated_source, dict):
             aggregated = dict(aggregated_source)
@@ -456,12 +552,14 @@ class ChatOllama(object):
                 aggregated['message'] = {'role': 'assistant', 'content': combined_text or aggregated['message']}
         else:
             aggregated['message'] = {'role': 'assistant', 'content': combined_text}
-        aggregated['chunks'] = raw_chunks
-        try:
-            if raw_chunks:
+        aggregated['chunk_count'] = chunk_count
+        if sample is not None:
+            aggregated['chunks'] = list(sample)
+        if debug and chunk_count:
+            try:
                 self.log("[OLLAMA_FULL] {}".format(aggregated), level='debug')
-        except Exception:
-            pass
+            except Exception:
+                pass
         text = combined_text.strip()
         if text.startswith('```') and text.endswith('```'):
             text = text.strip('`').strip()
@@ -553,18 +651,118 @@ class ChatOllama(object):
             normalized = "%%Stand/BodyTalk/Listening/Listening%% {}".format(normalized or "").strip()
         return normalized.replace("\n", " ").replace("\r", " ").strip()
 
-    def _chat_single(self, payload):
-        aggregated = call_ollama_api(self.base_url, "/api/chat", payload, timeout=self.timeout)
-        try:
-            self.log("[OLLAMA_RAW] {}".format(aggregated), level='debug')
-        except Exception:
-            pass
+    def _build_options(self) -> Dict[str, Any]:
+        """Options de génération communes à chat() et warm_up() (mêmes options = pas de rechargement du modèle)."""
+        options: Dict[str, Any] = {}
+        if self.temperature is not None:
+            options['temperature'] = self.temperature
+        if self.max_tokens:
+            options['num_predict'] = self.max_tokens
+        if self.top_p is not None:
+            options['top_p'] = self.top_p
+        if self.top_k is not None:
+            options['top_k'] = self.top_k
+        if self.min_p is not None:
+            options['min_p'] = self.min_p
+        if self.repeat_penalty is not None:
+            options['repeat_penalty'] = self.repeat_penalty
+        if self.repeat_last_n is not None:
+            options['repeat_last_n'] = self.repeat_last_n
+        if self.mirostat is not None:
+            options['mirostat'] = self.mirostat
+        if self.mirostat_tau is not None:
+            options['mirostat_tau'] = self.mirostat_tau
+        if self.mirostat_eta is not None:
+            options['mirostat_eta'] = self.mirostat_eta
+        if self.num_ctx is not None:
+            options['num_ctx'] = self.num_ctx
+        if self.seed is not None:
+            options['seed'] = self.seed
+        if self.stop_sequences:
+            options['stop'] = self.stop_sequences
+        return options
+
+    def _active_pool(self):
+        return self.pool if self.pool is not None and self.pool.active() else None
+
+    def _servers_for(self, model_name: Optional[str]) -> List[str]:
+        pool = self._active_pool()
+        return (pool.candidates(model_name) if pool else []) or [self.base_url]
+
+    def warm_up(self, model: Optional[str] = None, prefill: bool = True) -> Dict[str, Any]:
+        """
+        Prépare le premier tour: charge le modèle (/api/generate sans prompt, avec keep_alive), puis,
+        si prefill, évalue le prompt système avec les options de chat() et num_predict=1 pour que le
+        cache KV du préfixe soit chaud. Retourne les durées mesurées (ms).
+        """
+        model_name = model or self.ollama_cfg.get('chat_model')
+        if not model_name:
+            raise RuntimeError("Aucun modèle Ollama configuré.")
+        server = self._servers_for(model_name)[0]
+        report: Dict[str, Any] = {'server': server, 'model': model_name}
+        load_payload: Dict[str, Any] = {"model": model_name}
+        if self.keep_alive:
+            load_payload['keep_alive'] = self.keep_alive
+        t0 = time.time()
+        loaded = call_ollama_api(server, "/api/generate", load_payload, timeout=max(self.timeout, WARMUP_TIMEOUT))
+        report['load_ms'] = round(1000.0 * (time.time() - t0), 1)
+        if isinstance(loaded.get('load_duration'), (int, float)):
+            report['server_load_ms'] = round(loaded['load_duration'] / 1e6, 1)
+        if not prefill:
+            return report
+
+        options = self._build_options()
+        options['num_predict'] = 1
+        prefill_payload: Dict[str, Any] = {
+            "model": model_name,
+            "messages": build_chat_messages("Bonjour", [], self.system_prompt, self.history_length),
+            "stream": False,
+            "options": options,
+        }
+        if self.keep_alive:
+            prefill_payload['keep_alive'] = self.keep_alive
+        t0 = time.time()
+        answer = call_ollama_api(server, "/api/chat", prefill_payload, timeout=max(self.timeout, WARMUP_TIMEOUT))
+        report['prefill_ms'] = round(1000.0 * (time.time() - t0), 1)
+        report['prompt_eval_count'] = answer.get('prompt_eval_count')
+        return report
+
+    def keep_warm(self, model: Optional[str] = None) -> float:
+        """Ping sans génération qui repousse le déchargement du modèle (keep_alive). Retourne la durée en s."""
+        model_name = model or self.ollama_cfg.get('chat_model')
+        payload: Dict[str, Any] = {"model": model_name}
+        if self.keep_alive:
+            payload['keep_alive'] = self.keep_alive
+        t0 = time.time()
+        call_ollama_api(self._servers_for(model_name)[0], "/api/generate", payload, timeout=max(self.timeout, WARMUP_TIMEOUT))
+        return time.time() - t0
+
+    def _record_eval_stats(self, aggregated: Dict[str, Any]):
+        stats = eval_stats(aggregated)
+        if not stats:
+            return
+        aggregated['eval_stats'] = stats
+        if 'prompt_tokens' in stats:
+            OLLAMA_TOKENS.inc('prompt', amount=stats['prompt_tokens'])
+        if 'eval_tokens' in stats:
+            OLLAMA_TOKENS.inc('eval', amount=stats['eval_tokens'])
+        if 'prefill_ms' in stats:
+            OLLAMA_PREFILL_SECONDS.observe(stats['prefill_ms'] / 1000.0)
+        if 'eval_tps' in stats:
+            OLLAMA_DECODE_TPS.observe(stats['eval_tps'])
+        TURN_TRACER.annotate(ollama=stats)
+        self.log("[OLLAMA] Prompt: {} tokens évalués en {} ms | génération: {} tokens à {} tokens/s".format(
+            stats.get('prompt_tokens'), stats.get('prefill_ms'), stats.get('eval_tokens'), stats.get('eval_tps')), level='debug')
+
+    def _chat_single(self, payload, cancel=None, base_url=None):
+        aggregated = call_ollama_api(base_url or self.base_url, "/api/chat", payload, timeout=self.timeout, cancel=cancel)
+        TURN_TRACER.mark('llm_first_token')
+        if log_enabled(self.log, 'debug'):
+            try:
+                self.log("[OLLAMA_RAW] {}".format(aggregated), level='debug')
+            except Exception:
+                pass
         text = self._parse_text(aggregated)
-        try:
-            if isinstance(aggregated, dict):
-                self.log("[OLLAMA_FULL] {}".format(aggregated), level='debug')
-        except Exception:
-            pass
         return text, aggregated
 
     def chat(
@@ -573,10 +771,12 @@ class ChatOllama(object):
         hist: Optional[List[Tuple[str, str]]] = None,
         *,
         model: Optional[str] = None,
-        on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None
+        on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel=None
     ) -> Tuple[str, Dict[str, Any]]:
         """
         Envoie une requête chat à Ollama et renvoie (réponse, payload_brut).
+        `cancel` (cf. classLLMHedge.CancelToken) coupe la requête en cours: renvoie ("", {'cancelled': True}).
         """
         if not self.base_url:
             raise RuntimeError("Serveur Ollama non configuré. Vérifie la section chat.")
@@ -584,11 +784,15 @@ class ChatOllama(object):
         if not model_name:
             raise RuntimeError("Aucun modèle Ollama configuré.")
 
+        window = select_history_window(self._history_window, hist or [], self.history_length, self.history_compact_at)
+        if self._history_window and window[:len(self._history_window)] != self._history_window:
+            self.log("[OLLAMA_DEBUG] Historique compacté: {} -> {} messages".format(len(self._history_window), len(window)), level='debug')
+        self._history_window = window
         messages = build_chat_messages(
             user_text=user_text,
-            history=hist or [],
+            history=window,
             system_prompt=self.system_prompt,
-            history_length=self.history_length
+            history_length=len(window)
         )
 
         payload: Dict[str, Any] = {
@@ -597,44 +801,50 @@ class ChatOllama(object):
             "stream": self.stream_mode
         }
 
-        options: Dict[str, Any] = {}
-        if self.temperature is not None:
-            options['temperature'] = self.temperature
-        if self.max_tokens:
-            options['num_predict'] = self.max_tokens
-        if self.top_p is not None:
-            options['top_p'] = self.top_p
-        if self.top_k is not None:
-            options['top_k'] = self.top_k
-        if self.min_p is not None:
-            options['min_p'] = self.min_p
-        if self.repeat_penalty is not None:
-            options['repeat_penalty'] = self.repeat_penalty
-        if self.repeat_last_n is not None:
-            options['repeat_last_n'] = self.repeat_last_n
-        if self.mirostat is not None:
-            options['mirostat'] = self.mirostat
-        if self.mirostat_tau is not None:
-            options['mirostat_tau'] = self.mirostat_tau
-        if self.mirostat_eta is not None:
-            options['mirostat_eta'] = self.mirostat_eta
-        if self.num_ctx is not None:
-            options['num_ctx'] = self.num_ctx
-        if self.seed is not None:
-            options['seed'] = self.seed
-        if self.stop_sequences:
-            options['stop'] = self.stop_sequences
+        options = self._build_options()
         if options:
             payload['options'] = options
         if self.keep_alive:
             payload['keep_alive'] = self.keep_alive
 
-        self.log("[OLLAMA_DEBUG] Payload initial: {}".format(payload), level='debug')
+        if log_enabled(self.log, 'debug'):
+            self.log("[OLLAMA_DEBUG] Payload initial: {}".format(payload), level='debug')
 
-        if self.stream_mode:
-            text, aggregated = self._chat_stream(payload, on_chunk=on_chunk)
-        else:
-            text, aggregated = self._chat_single(payload)
+        pool = self._active_pool()
+        servers = self._servers_for(model_name)
+        for attempt, server in enumerate(servers):
+            first_delta = []
+
+            def _tap(event):
+                if not first_delta and event.get('delta'):
+                    first_delta.append(time.time())
+                if on_chunk:
+                    on_chunk(event)
+
+            t0 = time.time()
+            try:
+                if self.stream_mode:
+                    text, aggregated = self._chat_stream(payload, on_chunk=_tap, cancel=cancel, base_url=server)
+                else:
+                    text, aggregated = self._chat_single(payload, cancel=cancel, base_url=server)
+            except Exception as e:
+                if cancel is not None and cancel.is_set():
+                    return "", {'cancelled': True}
+                if pool is None:
+                    raise
+                pool.observe(server, ok=False, failover=attempt > 0)
+                # Bascule sur le serveur suivant tant que rien n'a été transmis au lecteur
+                if first_delta or attempt == len(servers) - 1:
+                    raise
+                self.log("[OLLAMA_POOL] Échec sur {} ({}), bascule sur {}".format(server, e, servers[attempt + 1]), level='warning')
+                continue
+            if pool is not None and not (cancel is not None and cancel.is_set()):
+                ttft = (first_delta[0] if first_delta else time.time()) - t0
+                pool.observe(server, ttft=ttft, failover=attempt > 0)
+            break
+        if cancel is not None and cancel.is_set():
+            self.log("[OLLAMA_DEBUG] Requête annulée.", level='debug')
+            return "", {'cancelled': True}
 
         text = self._normalize_response_text(text)
         clean_text = self._strip_animation(text)
@@ -650,10 +860,10 @@ class ChatOllama(object):
                 aggregated['message'] = normalized
             else:
                 aggregated['message'] = {'role': 'assistant', 'content': normalized}
-            if isinstance(aggregated.get('chunks'), list):
-                chunks_count = len(aggregated['chunks'])
+            chunks_count = aggregated.get('chunk_count') or 0
             done_flag = bool(aggregated.get('done'))
             aggregated['clean_text'] = clean_text
+            self._record_eval_stats(aggregated)
 
         if self._is_low_quality_text(clean_text):
             unique_chars = "".join(sorted(set(clean_text.strip())))
@@ -672,12 +882,12 @@ class ChatOllama(object):
                     'done_flag': done_flag
                 }
 
-        self.log("[OLLAMA_DEBUG] done={} chunks={} text='{}'".format(done_flag, chunks_count, clean_text), level='debug')
-
-        try:
-            self.log("[OLLAMA_PARSED] {}".format(text), level='debug')
-        except Exception:
-            pass
+        if log_enabled(self.log, 'debug'):
+            self.log("[OLLAMA_DEBUG] done={} chunks={} text='{}'".format(done_flag, chunks_count, clean_text), level='debug')
+            try:
+                self.log("[OLLAMA_PARSED] {}".format(text), level='debug')
+            except Exception:
+                pass
         if isinstance(aggregated, dict) and aggregated.get('error'):
             raise RuntimeError(aggregated.get('error'))
 
@@ -0,0 +1,225 @@
+#! -*- coding: utf-8 -*-
+"""
+Pool de serveurs Ollama: sondage en tâche de fond et routage par latence.
+
+Chaque serveur configuré est sondé toutes les probe_interval_s secondes via /api/version
+(santé, aller-retour) et /api/ps (modèles chargés en mémoire). ChatOllama demande à chaque
+tour la liste ordonnée des serveurs (candidates()): d'abord les serveurs sains qui ont déjà
+le modèle chargé, puis par TTFT moyen (EWMA) croissant. Une requête en échec marque le
+serveur hors service jusqu'au prochain sondage réussi et le tour repart sur le suivant.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .ollama import call_ollama_api, normalize_base_url
+
+DEFAULT_PROBE_INTERVAL = 10.0
+DEFAULT_PROBE_TIMEOUT = 2.0
+DEFAULT_EWMA_ALPHA = 0.3
+
+
+def _model_matches(loaded_name: str, model: str) -> bool:
+    if not loaded_name or not model:
+        return False
+    if loaded_name == model:
+        return True
+    # "llama3" dans la config, "llama3:latest" côté serveur
+    return ':' not in model and loaded_name == model + ':latest'
+
+
+class _Server(object):
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy: Optional[bool] = None
+        self.version: Optional[str] = None
+        self.probe_ms: Optional[float] = None
+        self.loaded: List[str] = []
+        self.ttft_ewma: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+        self.failovers = 0
+        self.last_probe: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'version': self.version,
+            'probe_ms': round(self.probe_ms, 1) if self.probe_ms is not None else None,
+            'loaded_models': list(self.loaded),
+            'ttft_ewma_ms': round(1000.0 * self.ttft_ewma, 1) if self.ttft_ewma is not None else None,
+            'requests': self.requests,
+            'errors': self.errors,
+            'failovers': self.failovers,
+            'last_probe': self.last_probe,
+            'last_error': self.last_error,
+        }
+
+
+class OllamaPool(object):
+    """
+    Config "ollama_pool": enabled, servers (vide = ollama.active_server + ollama.preferred_servers),
+    probe_interval_s, probe_timeout_s, ewma_alpha.
+    """
+
+    def __init__(self, logger=None):
+        self.log = logger or (lambda msg, **kwargs: None)
+        self._lock = threading.Lock()
+        self._servers: Dict[str, _Server] = {}
+        self._order: List[str] = []
+        self.enabled = False
+        self.probe_interval = DEFAULT_PROBE_INTERVAL
+        self.probe_timeout = DEFAULT_PROBE_TIMEOUT
+        self.alpha = DEFAULT_EWMA_ALPHA
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- configuration ----------
+    @staticmethod
+    def _configured_urls(config: Dict[str, Any]) -> List[str]:
+        pool_cfg = config.get('ollama_pool', {}) or {}
+        ollama_cfg = config.get('ollama', {}) or {}
+        raw = pool_cfg.get('servers') or []
+        if not raw:
+            raw = [ollama_cfg.get('active_server'), ollama_cfg.get('server'), ollama_cfg.get('server_url')]
+            preferred = ollama_cfg.get('preferred_servers') or []
+            raw.extend(preferred if isinstance(preferred, list) else [])
+        urls: List[str] = []
+        for candidate in raw:
+            normalized = normalize_base_url(candidate or "") if isinstance(candidate, str) else ""
+            if normalized and normalized not in urls:
+                urls.append(normalized)
+        return urls
+
+    def configure(self, config: Optional[Dict[str, Any]] = None, logger=None):
+        config = config or {}
+        if logger:
+            self.log = logger
+        pool_cfg = config.get('ollama_pool', {}) or {}
+        self.probe_interval = float(pool_cfg.get('probe_interval_s') or DEFAULT_PROBE_INTERVAL)
+        self.probe_timeout = float(pool_cfg.get('probe_timeout_s') or DEFAULT_PROBE_TIMEOUT)
+        self.alpha = float(pool_cfg.get('ewma_alpha') or DEFAULT_EWMA_ALPHA)
+        urls = self._configured_urls(config)
+        with self._lock:
+            # Les statistiques des serveurs conservés survivent à la reconfiguration
+            self._servers = dict((url, self._servers.get(url) or _Server(url)) for url in urls)
+            self._order = urls
+        self.enabled = bool(pool_cfg.get('enabled', False))
+        if self.enabled and urls:
+            self.start()
+            self._wake.set()
+        else:
+            self.stop()
+
+    def active(self) -> bool:
+        return self.enabled and bool(self._order)
+
+    # ---------- sondage ----------
+    def start(self):
+        self._stop.clear()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._probe_loop, name="OllamaPoolProbe")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _probe_loop(self):
+        while not self._stop.is_set():
+            self.probe_all()
+            self._wake.wait(self.probe_interval)
+            self._wake.clear()
+
+    def probe_all(self):
+        with self._lock:
+            urls = list(self._order)
+        for url in urls:
+            if self._stop.is_set():
+                return
+            self.probe(url)
+
+    def probe(self, url: str):
+        t0 = time.time()
+        version = None
+        loaded: List[str] = []
+        error = None
+        try:
+            version = call_ollama_api(url, "/api/version", timeout=self.probe_timeout).get('version')
+            rtt = time.time() - t0
+            for entry in call_ollama_api(url, "/api/ps", timeout=self.probe_timeout).get('models') or []:
+                for key in ('name', 'model'):
+                    name = entry.get(key) if isinstance(entry, dict) else None
+                    if name and name not in loaded:
+                        loaded.append(name)
+        except Exception as e:
+            error = str(e)
+        with self._lock:
+            server = self._servers.get(url)
+            if server is None:
+                return
+            was_healthy = server.healthy
+            server.last_probe = time.time()
+            if error is None:
+                server.healthy = True
+                server.version = version
+                server.probe_ms = 1000.0 * rtt
+                server.loaded = loaded
+            else:
+                server.healthy = False
+                server.loaded = []
+                server.last_error = error
+        if was_healthy is not None and was_healthy != (error is None):
+            if error is None:
+                self.log("[OLLAMA_POOL] {} de nouveau disponible.".format(url), level='info')
+            else:
+                self.log("[OLLAMA_POOL] {} indisponible: {}".format(url, error), level='warning')
+
+    # ---------- routage ----------
+    def candidates(self, model: Optional[str] = None) -> List[str]:
+        """Serveurs dans l'ordre d'essai pour ce modèle (les serveurs hors service en dernier recours)."""
+        with self._lock:
+            servers = [self._servers[url] for url in self._order]
+
+        def key(item):
+            index, server = item
+            loaded = any(_model_matches(name, model) for name in server.loaded)
+            # TTFT inconnu: le serveur est essayé pour l'apprendre
+            ttft = server.ttft_ewma if server.ttft_ewma is not None else 0.0
+            return (server.healthy is False, not loaded, ttft, index)
+
+        return [server.url for _i, server in sorted(enumerate(servers), key=key)]
+
+    def observe(self, url: str, ttft: Optional[float] = None, ok: bool = True, failover: bool = False):
+        """Résultat d'une requête chat: TTFT (EWMA) si ok, sinon serveur marqué hors service."""
+        with self._lock:
+            server = self._servers.get(url)
+            if server is None:
+                return
+            server.requests += 1
+            if failover:
+                server.failovers += 1
+            if ok:
+                if ttft is not None:
+                    server.ttft_ewma = ttft if server.ttft_ewma is None else (
+                        self.alpha * ttft + (1.0 - self.alpha) * server.ttft_ewma)
+                return
+            server.errors += 1
+            server.healthy = False
+        # Sondage anticipé pour détecter le retour du serveur
+        self._wake.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            servers = [self._servers[url].as_dict() for url in self._order]
+        return {'enabled': self.enabled, 'probe_interval_s': self.probe_interval, 'servers': servers}
+
+
+OLLAMA_POOL = OllamaPool()
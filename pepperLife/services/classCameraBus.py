@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# classCameraBus.py — acquisition caméra unique, partagée par tous les consommateurs
+#
+# Un seul thread par caméra active appelle getImageRemote/releaseImage à la cadence de la caméra et
+# publie chaque image (numéro de séquence, horodatage) dans un emplacement "dernière image": simple
+# affectation de référence, lue sans verrou. Les consommateurs (flux web, vision_chat, photo) lisent
+# la plus récente ou attendent la suivante; seule l'attente passe par une Condition.
+# Les variantes encodées (PNG/JPEG, taille, profil) sont mises en cache sur l'image elle-même: plusieurs
+# clients du même flux n'encodent qu'une fois, et le cache disparaît avec l'image.
+# Les utilisateurs de la caméra prennent un bail nommé ('chat', 'stream', ...) au lieu d'un compteur:
+# rendre deux fois le même bail est sans effet, la souscription suit la plus haute résolution demandée
+# et s'arrête au dernier bail rendu.
+
+import threading
+import time
+
+from .classMetrics import CAMERA_ENCODES, CAMERA_FRAMES
+
+
+class CameraFrame(object):
+    """Image caméra RGB brute (immuable) et ses variantes encodées."""
+    __slots__ = ('seq', 'ts', 'camera_index', 'width', 'height', 'rgb', '_variants', '_lock')
+
+    def __init__(self, seq, ts, camera_index, width, height, rgb):
+        self.seq = seq
+        self.ts = ts
+        self.camera_index = camera_index
+        self.width = width
+        self.height = height
+        self.rgb = rgb
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def as_tuple(self):
+        return self.width, self.height, self.rgb
+
+    def encoded(self, key, encoder):
+        """Variante `key` de cette image: encoder() n'est appelé qu'une fois, même par des threads concurrents."""
+        value = self._variants.get(key)
+        if value is None:
+            with self._lock:
+                value = self._variants.get(key)
+                if value is None:
+                    value = self._variants[key] = encoder()
+                    CAMERA_ENCODES.inc('encoded')
+                    return value
+        CAMERA_ENCODES.inc('cached')
+        return value
+
+
+class CameraBus(object):
+    def __init__(self, session, logger, fps=5, color=11):
+        self.sess = session
+        self.log = logger
+        self.fps = fps
+        self.color = color
+        self.camera_index = 0
+        self._leases = {}  # nom du bail -> résolution demandée
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._latest = None
+        self._seq = 0
+        self._thread = None
+        self._stop = None
+
+    # ---------- baux ----------
+    def acquire(self, owner, resolution):
+        """Prend (ou met à jour) le bail `owner`. Le premier bail souscrit la caméra et lance l'acquisition."""
+        with self._lock:
+            self._leases[owner] = int(resolution)
+            self.log("[Cam] Bail '%s' (résolution %d). Baux actifs: %s" % (owner, int(resolution), sorted(self._leases)))
+            if self._thread is not None:
+                return True
+            cam, sub = self._subscribe(self.camera_index, int(resolution))
+            if sub is None:
+                self._leases.pop(owner, None)
+                return False
+            stop = threading.Event()
+            self._stop = stop
+            self._thread = threading.Thread(target=self._run, args=(stop, cam, sub, self.camera_index, int(resolution)),
+                                            name="CameraBus")
+            self._thread.daemon = True
+            self._thread.start()
+        return True
+
+    def release(self, owner=None):
+        """Rend le bail `owner` (tous si None). Au dernier bail, arrête l'acquisition et désabonne la caméra."""
+        with self._lock:
+            if owner is None:
+                self._leases.clear()
+            else:
+                self._leases.pop(owner, None)
+            self.log("[Cam] Bail '%s' rendu. Baux actifs: %s" % (owner or '*', sorted(self._leases)))
+            if self._leases or self._thread is None:
+                return True
+            thread, stop = self._thread, self._stop
+            self._thread = self._stop = None
+            with self._cond:
+                stop.set()
+                self._latest = None
+                self._cond.notify_all()
+        if thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+        return True
+
+    @property
+    def active(self):
+        return self._thread is not None
+
+    def switch_camera(self, camera_index, timeout=3.0):
+        """Change de caméra; si l'acquisition tourne, attend la première image de la nouvelle caméra."""
+        self.camera_index = camera_index
+        if not self.active:
+            return True
+        deadline = time.time() + timeout
+        frame = self._latest
+        while time.time() < deadline:
+            frame = self.wait_next(frame.seq if frame else 0, timeout=deadline - time.time())
+            if frame is None:
+                return False
+            if frame.camera_index == camera_index:
+                return True
+        return False
+
+    # ---------- lecture ----------
+    def latest(self):
+        return self._latest
+
+    def wait_next(self, after_seq=0, timeout=1.0):
+        """Image plus récente que after_seq (sans attendre si elle existe déjà), ou None après timeout / arrêt."""
+        frame = self._latest
+        if frame is not None and frame.seq > after_seq:
+            return frame
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                frame = self._latest
+                if frame is not None and frame.seq > after_seq:
+                    return frame
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self.active:
+                    return None
+                self._cond.wait(remaining)
+
+    # ---------- acquisition ----------
+    def _wanted(self):
+        with self._lock:
+            resolution = max(self._leases.values()) if self._leases else None
+        return self.camera_index, resolution
+
+    def _subscribe(self, camera_index, resolution):
+        try:
+            cam = self.sess.service("ALVideoDevice")
+            name = "PepperLifeCam_%d" % int(time.time())
+            sub = cam.subscribeCamera(name, camera_index, resolution, self.color, self.fps)
+            self.log("[Cam] ALVideoDevice subscribed: %s (caméra %d, résolution %d)" % (sub, camera_index, resolution))
+            return cam, sub
+        except Exception as e:
+            self.log(u"[Cam] Échec de la souscription à la caméra {}: {}".format(camera_index, e), level='error')
+            return None, None
+
+    def _unsubscribe(self, cam, sub):
+        try:
+            cam.unsubscribe(sub)
+            self.log("[Cam] Unsubscribed %s" % sub)
+        except Exception as e:
+            self.log(f"[Cam] Error during unsubscribe: {e}", level='warning')
+
+    def _grab(self, cam, sub):
+        acquired = False
+        try:
+            f = cam.getImageRemote(sub)
+            acquired = f is not None
+            if not acquired or f[6] is None:
+                return None
+            return int(f[0]), int(f[1]), bytes(f[6])
+        except Exception as e:
+            # Fréquent pendant un changement de caméra: niveau debug
+            self.log("[Cam] getImageRemote error: %s" % e, level='debug')
+            return None
+        finally:
+            if acquired:
+                try:
+                    cam.releaseImage(sub)
+                except Exception as release_err:
+                    self.log("[Cam] releaseImage error: %s" % release_err, level='debug')
+
+    def _run(self, stop, cam, sub, camera_index, resolution):
+        period = 1.0 / self.fps
+        try:
+            while not stop.is_set():
+                t0 = time.time()
+                want_index, want_res = self._wanted()
+                if want_res is not None and (want_index, want_res) != (camera_index, resolution):
+                    # Changement de caméra ou de résolution appliqué ici: aucune lecture en cours sur l'ancienne souscription
+                    self._unsubscribe(cam, sub)
+                    cam, sub = self._subscribe(want_index, want_res)
+                    camera_index, resolution = want_index, want_res
+                    if sub is None:
+                        stop.wait(1.0)
+                        continue
+                if sub is None:
+                    cam, sub = self._subscribe(camera_index, resolution)
+                    if sub is None:
+                        stop.wait(1.0)
+                        continue
+                grabbed = self._grab(cam, sub)
+                if grabbed is not None:
+                    with self._cond:
+                        if stop.is_set():
+                            break
+                        self._seq += 1
+                        self._latest = CameraFrame(self._seq, time.time(), camera_index, *grabbed)
+                        self._cond.notify_all()
+                    CAMERA_FRAMES.inc()
+                stop.wait(max(0.0, period - (time.time() - t0)))
+        except Exception as e:
+            self.log("[Cam] Erreur du thread d'acquisition: %s" % e, level='error')
+        finally:
+            if sub is not None:
+                self._unsubscribe(cam, sub)
+            self.log("[Cam] Acquisition arrêtée (caméra %d)." % camera_index)
@@ -11,12 +11,22 @@ import time
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from .classASRFilters import is_noise_utterance, is_recent_duplicate
+from .classIntentRouter import IntentRouter
+from .classLog import log_enabled
+from .classLLMHedge import HedgedChat
+from .classSpeculation import SpeculativeDispatcher
+from .classSpeechGate import SpeechGate
+from .classWakeWord import WakeWordSpotter
 from .classAudioUtils import avgabs
 import re
 from .classSTT import STT
 from .classSystem import bcolors, build_system_prompt_in_memory
+from .classMetrics import LLM_ERRORS, LLM_FIRST_TURN, LLM_REQUESTS, LLM_SECONDS, OLLAMA_WARMUP_SECONDS, VISION_TURN_SECONDS
+from .classTurnTrace import TURN_TRACER
 from .chatBots.chatGPT import chatGPT
+from .chatBots.gateway import ChatGateway
 from .chatBots.ollama import ChatOllama
+from .chatBots.ollamaPool import OLLAMA_POOL
 
 
 class ChatManager(object):
@@ -67,6 +77,12 @@ class ChatManager(object):
         self.system_prompt_gpt = "Ton nom est Pepper."
         self.system_prompt_ollama = "Ton nom est Pepper."
 
+        self.intent_router = IntentRouter(config, session=session, logger=log_fn,
+                                          listener=listener, vision_service=vision_service)
+        self.speech_gate = SpeechGate(config, logger=log_fn)
+        self.wake_word = WakeWordSpotter(config, logger=log_fn, on_wake=self._on_wake_word)
+        self.speculator = SpeculativeDispatcher(config, logger=log_fn)
+        self.hedger = HedgedChat(config, logger=log_fn)
         self.update_config(config)
 
     # ------------------------------------------------------------------ Prompts & UI
@@ -76,6 +92,7 @@ class ChatManager(object):
 
     def attach_tablet(self, tablet_ui):
         self.tablet_ui = tablet_ui
+        self.intent_router.attach_tablet(tablet_ui)
 
     def update_config(self, config: Optional[Dict[str, Any]] = None):
         self.config = config or {}
@@ -84,6 +101,13 @@ class ChatManager(object):
             vad_level, self._VAD_PROFILES[3]
         )
         self.blacklist_strict = set(self.config.get('asr_filters', {}).get('blacklist_strict', []))
+        TURN_TRACER.configure(self.config, logger=self.log)
+        self.intent_router.configure(self.config)
+        self.speech_gate.configure(self.config)
+        self.wake_word.configure(self.config)
+        self.speculator.configure(self.config)
+        self.hedger.configure(self.config)
+        OLLAMA_POOL.configure(self.config, logger=self.log)
 
     # ------------------------------------------------------------------ Statut utilitaires
     def is_running(self) -> bool:
@@ -95,7 +119,13 @@ class ChatManager(object):
         return {'mode': mode, 'is_running': running}
 
     def get_detailed_status(self) -> Dict[str, Any]:
-        return dict(self.chat_state)
+        status = dict(self.chat_state)
+        status['intents'] = self.intent_router.stats()
+        status['speech_gate'] = self.speech_gate.stats()
+        status['wakeword'] = self.wake_word.stats()
+        status['speculation'] = self.speculator.stats()
+        status['llm_hedging'] = self.hedger.stats()
+        return status
 
     # ------------------------------------------------------------------ Gestion du chat
     def start(self, mode: str = 'gpt'):
@@ -103,7 +133,7 @@ class ChatManager(object):
             self.log("Un chat est déjà en cours, arrêt avant redémarrage.", level='warning')
             self.stop()
 
-        if mode in ('gpt', 'ollama'):
+        if mode in ('gpt', 'ollama', 'gateway'):
             try:
                 self.log("Arrêt de ALDialog pour le mode {}.".format(mode.upper()), level='info')
                 self.al_dialog.stopDialog()
@@ -349,7 +379,7 @@ class ChatManager(object):
         self.chat_state['mode'] = mode
 
         try:
-            backend_tag = "GPT" if mode == 'gpt' else "OLLAMA"
+            backend_tag = mode.upper()
             self.log("Démarrage du thread du chatbot {}...".format(backend_tag), level='info')
 
             stt_service = STT(self.config, self.logger)
@@ -361,7 +391,7 @@ class ChatManager(object):
                 model = getattr(stt_service, '_openai_model', 'gpt-4o-transcribe')
                 self.log("[STT] Moteur actif : openai ({}).".format(model), level='info')
 
-            engine_cfg = self.config.get('ollama', {}) if mode == 'ollama' else self.config.get('openai', {})
+            engine_cfg = self.config.get(mode if mode in ('ollama', 'gateway') else 'openai', {}) or {}
             animations_cfg = self.config.get('animations', {}) or {}
             enable_startup_animation = animations_cfg.get('enable_startup_animation', True)
             enable_thinking_gesture = animations_cfg.get('enable_thinking_gesture', True)
@@ -379,6 +409,7 @@ class ChatManager(object):
 
             if mode == 'ollama':
                 chat_service = ChatOllama(self.config, system_prompt=self.system_prompt_ollama, logger=self.logger)
+                chat_service.pool = OLLAMA_POOL
                 server_url = chat_service.base_url
                 model_used = chat_service.ollama_cfg.get('chat_model') or ""
                 if not server_url:
@@ -390,7 +421,20 @@ class ChatManager(object):
                     self._report_fatal(err)
                     return
                 self.log("[Chat] Serveur Ollama : {}".format(server_url), level='info', color=bcolors.OKCYAN)
+                if OLLAMA_POOL.active():
+                    self.log("[Chat] Pool Ollama actif ({} serveurs), routage par latence.".format(
+                        len(OLLAMA_POOL.stats()['servers'])), level='info', color=bcolors.OKCYAN)
                 self.log("[Chat] Modèle Ollama : {}".format(model_used), level='info', color=bcolors.OKCYAN)
+            elif mode == 'gateway':
+                gateway_backend = engine_cfg.get('backend') or 'ollama'
+                prompt = self.system_prompt_gpt if gateway_backend == 'gpt' else self.system_prompt_ollama
+                chat_service = ChatGateway(self.config, system_prompt=prompt, logger=self.logger)
+                if not chat_service.base_url:
+                    self._report_fatal("Passerelle LLM non configurée.")
+                    return
+                model_used = "{}:{}".format(gateway_backend, chat_service.model or "défaut")
+                self.log("[Chat] Passerelle LLM : {} (robot {}, backend {})".format(
+                    chat_service.base_url, chat_service.robot_id, model_used), level='info', color=bcolors.OKCYAN)
             else:
                 chat_service = chatGPT(self.config, system_prompt=self.system_prompt_gpt, logger=self.logger)
                 model_used = self.config.get('openai', {}).get('chat_model', 'gpt-4o-mini (default)')
@@ -404,8 +448,31 @@ class ChatManager(object):
                     return
 
             self.listener.start()
-            self.vision_service.start_camera()
+            self.vision_service.start_camera(purpose='chat')
             self.listener.warmup(min_chunks=8, timeout=2.0)
+            if self.wake_word.active():
+                self.wake_word.close_window()
+                self.wake_word.start()
+                self.listener.kws = self.wake_word
+                self.log("[WAKE] Écoute filtrée: dites '{}' pour ouvrir une fenêtre de {:.0f}s.".format(
+                    self.wake_word.phrase, self.wake_word.window), level='info')
+            try:
+                self.session.service("PepperLifeService").preRenderPhrases(self.intent_router.canned_replies())
+            except Exception as e:
+                self.log("[INTENT] Pré-rendu des réponses locales impossible: {}".format(e), level='debug')
+
+            # Préchauffage Ollama en parallèle de la calibration du bruit, puis maintien en mémoire
+            warmup_state: Dict[str, Any] = {}
+            if mode == 'ollama':
+                self.chat_state['warmup'] = warmup_state
+                if engine_cfg.get('warmup', True):
+                    threading.Thread(target=self._ollama_warm_up, args=(chat_service, warmup_state),
+                                     name="OllamaWarmup", daemon=True).start()
+                keep_warm_interval = float(engine_cfg.get('keep_warm_interval_s') or 0)
+                if keep_warm_interval > 0:
+                    threading.Thread(target=self._ollama_keep_warm, args=(chat_service, stop_event, keep_warm_interval),
+                                     name="OllamaKeepWarm", daemon=True).start()
+            first_turn_pending = True
 
             history: List[Tuple[str, str]] = []
             vision_history: List[Tuple[str, str]] = []
@@ -587,6 +654,36 @@ class ChatManager(object):
                 self.log("Impossible de se connecter à PepperLifeService. Les états ne seront pas vérifiés. Erreur: {}".format(e), level='error')
                 pls = None
 
+            chat_streaming = False
+            if mode == 'ollama':
+                try:
+                    chat_streaming = bool(chat_service.ollama_cfg.get('stream', True))
+                except Exception:
+                    chat_streaming = False
+            elif mode == 'gateway':
+                # La passerelle répond toujours en flux NDJSON
+                chat_streaming = True
+            else:
+                chat_streaming = bool(self.config.get('openai', {}).get('stream', False))
+
+            def _speculative_chat(text, on_chunk, cancel):
+                # Requête LLM anticipée sur transcription partielle (thread de SpeculativeReply)
+                kwargs = {'cancel': cancel}
+                if chat_streaming:
+                    kwargs['on_chunk'] = on_chunk
+                    if mode == 'gpt':
+                        kwargs['stream'] = True
+                LLM_REQUESTS.inc(mode)
+                try:
+                    with LLM_SECONDS.time(mode):
+                        result = self.hedger.chat(chat_service, mode, text, list(history), **kwargs)
+                except Exception:
+                    LLM_ERRORS.inc(mode)
+                    raise
+                if isinstance(result[1], dict) and result[1].get('error'):
+                    LLM_ERRORS.inc(mode)
+                return result
+
             while not stop_event.is_set():
                 asr_duration = gpt_duration = tts_duration = 0.0
 
@@ -611,13 +708,20 @@ class ChatManager(object):
                 if avgabs(audio_chunk) < start_threshold:
                     time.sleep(0.05)
                     continue
+                if not self.wake_word.is_open():
+                    # Mode écoute filtrée: rien ne part au STT avant le mot d'éveil
+                    time.sleep(0.05)
+                    continue
 
                 thinking_anim_name = ""
                 reply_text = None
                 stream_spoken = False
                 stream_tts_duration = 0.0
+                TURN_TRACER.begin(mode=mode)
+                turn_outcome = 'no_audio'
                 try:
                     self.listener.start_recording()
+                    self.speculator.begin_turn(lambda clip: stt_service.stt(clip, partial=True), _speculative_chat)
                     t0 = time.time()
                     last = t0
                     while time.time() - t0 < 5.0:
@@ -630,19 +734,33 @@ class ChatManager(object):
                             last = time.time()
                         if time.time() - last > self.silhold:
                             break
+                        self.speculator.poll(self.listener.peek_recording_wav, silence=time.time() - last)
                         time.sleep(0.02)
                     wav = self.listener.stop_recording(stop_threshold)
+                    if wav and not self.speech_gate.accept(wav):
+                        turn_outcome = 'rejected'
+                        wav = None
 
                     if wav:
                         t_before_stt = time.time()
                         txt = stt_service.stt(wav)
                         t_after_stt = time.time()
                         asr_duration = t_after_stt - t_before_stt
+                        self.speech_gate.note_stt(asr_duration)
                         self.log("[ASR] {}".format(txt), level='info')
+                        turn_outcome = 'ignored'
+
+                        # Commandes locales testées avant le filtre anti-bruit ("stop", "chut" sont courts)
+                        intent = self.intent_router.match(txt)
+                        intent_reply = self.intent_router.handle(intent, txt) if intent else None
+                        if intent_reply is None:
+                            intent = None
 
-                        if txt and not is_noise_utterance(txt, self.blacklist_strict) and not is_recent_duplicate(txt):
+                        if intent or (txt and not is_noise_utterance(txt, self.blacklist_strict) and not is_recent_duplicate(txt)):
+                            turn_outcome = 'ok'
+                            TURN_TRACER.annotate(transcript_chars=len(txt))
                             thinking_anim_name = ""
-                            if enable_thinking_gesture:
+                            if enable_thinking_gesture and not intent:
                                 try:
                                     pls = self.session.service("PepperLifeService")
                                     thinking_anim_name = pls.startRandomThinkingGesture()
@@ -652,8 +770,14 @@ class ChatManager(object):
                                     self.log("[ANIM] Échec du démarrage de l'action de réflexion via le service: {}".format(e), level='warning')
 
                             t_before_chat = time.time()
-                            if self.vision_service._utterance_triggers_vision(txt.lower()):
-                                png_bytes = self.vision_service.get_png()
+                            if intent:
+                                reply_text = intent_reply
+                                TURN_TRACER.annotate(intent=intent)
+                                self.chat_state['llm_calls_saved'] = self.intent_router.saved_llm_calls
+                            elif self.vision_service._utterance_triggers_vision(txt.lower()):
+                                t_capture = time.time()
+                                frame = self.vision_service.get_frame()
+                                png_bytes = self.vision_service.get_png(frame)
                                 if png_bytes:
                                     if self.tablet_ui:
                                         try:
@@ -661,21 +785,19 @@ class ChatManager(object):
                                             self.tablet_ui.show_last_capture_on_tablet()
                                         except Exception as e:
                                             self.log("[Tablet] Impossible de mettre à jour la capture: {}".format(e), level='warning')
-                                    reply_text = self.vision_service.vision_chat(txt, png_bytes, vision_history)
+                                    LLM_REQUESTS.inc('vision')
+                                    with LLM_SECONDS.time('vision'):
+                                        reply_text = self.vision_service.vision_chat(txt, png_bytes, vision_history, frame=frame)
+                                    TURN_TRACER.mark('llm_first_token')
+                                    VISION_TURN_SECONDS.observe(time.time() - t_capture, self.vision_service.request_profile()[0])
                                     vision_history.extend([("user", txt), ("assistant", reply_text)])
                                     vision_history = vision_history[-6:]
                                 else:
                                     reply_text = "Je n'ai pas réussi à prendre de photo."
                             else:
+                                speculation = self.speculator.take(txt)
                                 history.append(("user", txt))
-                                streaming_enabled = False
-                                if mode == 'ollama':
-                                    try:
-                                        streaming_enabled = bool(chat_service.ollama_cfg.get('stream', True))
-                                    except Exception:
-                                        streaming_enabled = False
-                                else:
-                                    streaming_enabled = bool(self.config.get('openai', {}).get('stream', False))
+                                streaming_enabled = chat_streaming
 
                                 stream_responder = None
                                 chat_kwargs = {}
@@ -710,7 +832,19 @@ class ChatManager(object):
                                     else:
                                         chat_kwargs['on_chunk'] = _on_stream_chunk
 
-                                reply_text, raw_reply = chat_service.chat(txt, history[:-1], **chat_kwargs)
+                                if speculation is not None:
+                                    TURN_TRACER.annotate(speculative=True)
+                                    reply_text, raw_reply = self.speculator.collect(speculation, chat_kwargs.get('on_chunk'))
+                                else:
+                                    LLM_REQUESTS.inc(mode)
+                                    try:
+                                        with LLM_SECONDS.time(mode):
+                                            reply_text, raw_reply = self.hedger.chat(chat_service, mode, txt, history[:-1], **chat_kwargs)
+                                    except Exception:
+                                        LLM_ERRORS.inc(mode)
+                                        raise
+                                    if isinstance(raw_reply, dict) and raw_reply.get('error'):
+                                        LLM_ERRORS.inc(mode)
 
                                 if stream_responder:
                                     reply_text = stream_responder.finish(reply_text)
@@ -718,15 +852,23 @@ class ChatManager(object):
                                     stream_tts_duration = stream_responder.total_duration
 
                                 self.log("[GPT] {}".format(reply_text), level='info', color=bcolors.OKGREEN)
-                                self.log("[GPT_FULL] {}".format(repr(raw_reply)), level='debug')
+                                if log_enabled(self.log, 'debug'):
+                                    # repr() de la réponse brute: coûteux, seulement si le debug est affiché
+                                    self.log("[GPT_FULL] {}".format(repr(raw_reply)), level='debug')
                                 history.append(("assistant", reply_text))
-                                history = history[-8:]
+                                # Troncature large: la fenêtre envoyée au LLM est gérée par le backend
+                                # (compaction par paliers côté Ollama pour garder le cache de prompt)
+                                history = history[-16:]
+                                if first_turn_pending:
+                                    first_turn_pending = False
+                                    self._record_first_turn(mode, time.time() - t_before_chat, warmup_state)
                             t_after_chat = time.time()
                             gpt_duration = t_after_chat - t_before_chat
                 except Exception as exc:
                     self.log("[ERR] {}".format(exc), level='error', color=bcolors.FAIL)
                     reply_text = "Petit pépin réseau, on réessaie."
                     self.chat_state['last_error'] = str(exc)
+                    turn_outcome = 'error'
                 finally:
                     if thinking_anim_name:
                         try:
@@ -770,6 +912,10 @@ class ChatManager(object):
                         level='info',
                         color=bcolors.OKCYAN
                     )
+                if turn_outcome == 'ok':
+                    self.wake_word.keep_open()
+                self.speculator.end_turn()
+                self._finish_turn_trace(turn_outcome)
         finally:
             audio_cfg['add_wait_tag'] = original_wait_tag
             self.log("Arrêt du thread du chatbot.", level='info')
@@ -780,11 +926,73 @@ class ChatManager(object):
             except Exception:
                 pass
             try:
-                self.vision_service.stop_camera()
+                self.vision_service.stop_camera('chat')
             except Exception:
                 pass
+            self.listener.kws = None
+            self.wake_word.stop()
 
     # ------------------------------------------------------------------ Helpers
+    def _ollama_warm_up(self, chat_service, state: Dict[str, Any]):
+        """Charge le modèle et remplit le cache KV du prompt système avant le premier tour."""
+        state.update({'status': 'running', 'started': time.time()})
+        try:
+            report = chat_service.warm_up()
+            state.update(report)
+            state['status'] = 'done'
+            OLLAMA_WARMUP_SECONDS.observe(report['load_ms'] / 1000.0, 'load')
+            if 'prefill_ms' in report:
+                OLLAMA_WARMUP_SECONDS.observe(report['prefill_ms'] / 1000.0, 'prefill')
+            self.log("[OLLAMA] Modèle {} préchauffé: chargement {:.0f} ms, préremplissage {} ms ({} tokens de prompt)".format(
+                report.get('model'), report['load_ms'], report.get('prefill_ms'), report.get('prompt_eval_count')), level='info')
+        except Exception as e:
+            state.update({'status': 'error', 'error': str(e)})
+            self.log("[OLLAMA] Préchauffage impossible: {}".format(e), level='warning')
+        finally:
+            state['finished'] = time.time()
+
+    def _ollama_keep_warm(self, chat_service, stop_event: threading.Event, interval: float):
+        """Ping périodique tant que la boucle de chat tourne: le modèle reste chargé entre deux conversations."""
+        while not stop_event.wait(interval):
+            try:
+                elapsed = chat_service.keep_warm()
+                self.log("[OLLAMA] Maintien en mémoire ({:.0f} ms)".format(1000 * elapsed), level='debug')
+            except Exception as e:
+                self.log("[OLLAMA] Ping de maintien en mémoire échoué: {}".format(e), level='debug')
+
+    def _record_first_turn(self, mode: str, seconds: float, warmup_state: Dict[str, Any]):
+        """Premier tour de la session: chaud si le préchauffage s'est terminé avant, froid sinon."""
+        state = 'warm' if warmup_state.get('status') == 'done' else 'cold'
+        LLM_FIRST_TURN.observe(seconds, mode, state)
+        self.chat_state['first_turn'] = {'llm_ms': round(1000 * seconds, 1), 'state': state}
+        self.log("[Chat] Premier tour LLM ({}): {:.0f} ms".format(state, 1000 * seconds), level='info')
+
+    def _on_wake_word(self):
+        """Mot d'éveil détecté (thread du détecteur): accusé de réception visuel."""
+        try:
+            self.leds.listening_recording()
+        except Exception as e:
+            self.log("[WAKE] LEDs d'écoute indisponibles: {}".format(e), level='debug')
+
+    def _finish_turn_trace(self, outcome: str):
+        """Complète la trace du tour avec les horodatages de parole du service, puis la clôt."""
+        queued = TURN_TRACER.stage_time('first_sentence_queued')
+        if queued is not None:
+            timeline = []
+            try:
+                timeline = self.session.service("PepperLifeService").getSpeechTimeline(queued)
+            except Exception as e:
+                self.log("[TRACE] Horodatages de parole indisponibles: {}".format(e), level='debug')
+            if timeline:
+                TURN_TRACER.mark('tts_started', min(start for start, _ in timeline))
+                TURN_TRACER.mark('tts_done', max(end for _, end in timeline), overwrite=True)
+            else:
+                TURN_TRACER.mark('tts_done')
+        summary = TURN_TRACER.finish(outcome)
+        if summary and outcome == 'ok' and log_enabled(self.log, 'debug'):
+            self.log("[TRACE] Tour {}: {}".format(
+                summary['id'], ", ".join("{} {:.0f}ms".format(k, v) for k, v in summary['stages_ms'].items())), level='debug')
+
     def _report_fatal(self, message: str, speak: bool = False):
         self.log(message, level='error', color=bcolors.FAIL)
         if speak:
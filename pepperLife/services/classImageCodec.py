@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# classImageCodec.py — encodage rapide des images caméra (buffer RGB brut de ALVideoDevice)
+#
+# PNG: écrivain minimal sur zlib. Chaque ligne (memoryview, sans copie) est précédée de son octet
+# de filtre et poussée directement dans le compresseur, sans liste de lignes comme avec PyPNG.
+# Filtre 'up' (ligne - ligne précédente) calculé sur l'image entière en une soustraction octet par
+# octet sur grands entiers (SWAR): pas de boucle Python par pixel, et deflate compresse bien mieux
+# (et plus vite) les différences que les pixels bruts du capteur. Filtre 'none' = pixels bruts.
+# JPEG: Pillow s'il est installé (encodeur C), sinon repli PNG.
+
+import io
+import struct
+import zlib
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    Image = None
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+DEFAULT_PNG_LEVEL = 1
+DEFAULT_PNG_FILTER = 'up'
+DEFAULT_JPEG_QUALITY = 80
+PNG_FILTERS = {'none': 0, 'up': 2}
+_SWAR_MASKS = {}
+
+
+def jpeg_available():
+    return Image is not None
+
+
+def _chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)) & 0xffffffff)
+
+
+def _up_filter(data, row_len):
+    """Filtre PNG 'up' de toute l'image: (octet - octet de la ligne au-dessus) mod 256, première ligne inchangée."""
+    size = len(data)
+    masks = _SWAR_MASKS.get(size)
+    if masks is None:
+        masks = _SWAR_MASKS[size] = (int.from_bytes(b'\x80' * size, 'big'), int.from_bytes(b'\x7f' * size, 'big'))
+    high, low = masks
+    cur = int.from_bytes(data, 'big')
+    above = cur >> (8 * row_len)
+    # Soustraction par octet sans retenue entre octets (bit 7 forcé puis corrigé)
+    diff = ((cur | high) - (above & low)) ^ (((cur ^ above) & high) ^ high)
+    return diff.to_bytes(size, 'big')
+
+
+def encode_png(width, height, rgb, level=DEFAULT_PNG_LEVEL, png_filter=DEFAULT_PNG_FILTER):
+    """PNG 8 bits RGB depuis un buffer plat (bytes, bytearray ou memoryview) de width*height*3 octets."""
+    row_len = width * 3
+    size = row_len * height
+    view = memoryview(rgb)
+    if len(view) < size:
+        raise ValueError("Buffer RGB trop court: {} octets pour {}x{}".format(len(view), width, height))
+    filter_type = PNG_FILTERS.get(png_filter, 0)
+    if filter_type == 2:
+        view = memoryview(_up_filter(view[:size], row_len))
+    compressor = zlib.compressobj(level)
+    parts = []
+    filter_byte = bytes((filter_type,))
+    for offset in range(0, size, row_len):
+        parts.append(compressor.compress(filter_byte))
+        parts.append(compressor.compress(view[offset:offset + row_len]))
+    parts.append(compressor.flush())
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b''.join((PNG_SIGNATURE, _chunk(b'IHDR', header), _chunk(b'IDAT', b''.join(parts)), _chunk(b'IEND', b'')))
+
+
+def encode_jpeg(width, height, rgb, quality=DEFAULT_JPEG_QUALITY):
+    """JPEG via Pillow; None si Pillow est absent."""
+    if Image is None:
+        return None
+    img = Image.frombuffer('RGB', (width, height), rgb, 'raw', 'RGB', 0, 1)
+    out = io.BytesIO()
+    img.save(out, 'JPEG', quality=int(quality))
+    return out.getvalue()
+
+
+def encode_image(width, height, rgb, fmt='png', png_level=DEFAULT_PNG_LEVEL, jpeg_quality=DEFAULT_JPEG_QUALITY,
+                 png_filter=DEFAULT_PNG_FILTER):
+    """Retourne (octets, type MIME). fmt: 'png', 'jpeg' (repli PNG sans Pillow)."""
+    if fmt in ('jpeg', 'jpg'):
+        data = encode_jpeg(width, height, rgb, jpeg_quality)
+        if data is not None:
+            return data, 'image/jpeg'
+    return encode_png(width, height, rgb, png_level, png_filter), 'image/png'
+
+
+def crop_rgb(width, height, rgb, box):
+    """Découpe (x0, y0, x1, y1) d'un buffer RGB plat. Retourne (largeur, hauteur, octets)."""
+    x0, y0, x1, y1 = [int(v) for v in box]
+    x0, x1 = max(0, min(x0, width)), max(0, min(x1, width))
+    y0, y1 = max(0, min(y0, height)), max(0, min(y1, height))
+    if x1 <= x0 or y1 <= y0:
+        return width, height, rgb
+    view = memoryview(rgb)
+    row_len = width * 3
+    start, stop = x0 * 3, x1 * 3
+    out = b''.join(view[y * row_len + start:y * row_len + stop] for y in range(y0, y1))
+    return x1 - x0, y1 - y0, out
+
+
+def downscale_rgb(width, height, rgb, max_width):
+    """
+    Réduit l'image à max_width pixels de large au plus. Pillow: taille exacte (filtre bilinéaire);
+    sinon facteur entier au plus proche voisin (un pixel sur n, découpage par tranches en C).
+    """
+    if not max_width or width <= max_width:
+        return width, height, rgb
+    if Image is not None:
+        new_w = int(max_width)
+        new_h = max(1, int(round(height * new_w / float(width))))
+        img = Image.frombuffer('RGB', (width, height), rgb, 'raw', 'RGB', 0, 1).resize((new_w, new_h), Image.BILINEAR)
+        return new_w, new_h, img.tobytes()
+    factor = -(-width // int(max_width))
+    new_w, new_h = width // factor, height // factor
+    row_len = width * 3
+    step = 3 * factor
+    out = bytearray(new_w * new_h * 3)
+    out_row = new_w * 3
+    for j in range(new_h):
+        row = rgb[j * factor * row_len:j * factor * row_len + row_len]
+        base = j * out_row
+        for channel in range(3):
+            out[base + channel:base + out_row:3] = row[channel::step][:new_w]
+    return new_w, new_h, bytes(out)
+
+
+def image_mime(data):
+    """Type MIME d'après la signature (data URL de vision_chat, réponses HTTP)."""
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    return 'image/png'
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# classIntentRouter.py — commandes locales (stop, volume, posture, micro, photo) sans aller-retour LLM
+
+import os
+import re
+import threading
+
+from .classASRFilters import _norm_text
+from .classMetrics import INTENTS
+
+DEFAULT_VOLUME_STEP = 10
+NO_PHOTO_REPLY = "Je n'ai pas réussi à prendre de photo."
+
+
+class IntentRouter(object):
+    """
+    Reconnaît les commandes courtes dans la transcription, avant chat(), et les exécute
+    directement via le WebServer (volume, posture, micro), le module vision (photo) et
+    PepperLifeService.stopAll (stop). Retourne une réponse courte prédéfinie.
+    - Motifs: lang/map/intents.txt (ou intents.patterns_path), compilés en UNE regex à groupes
+      nommés, appliquée à l'énoncé entier normalisé (les phrases plus longues vont au LLM).
+    - Une action impossible (service absent) n'est pas interceptée: le tour part au LLM.
+    - saved_llm_calls: nombre de tours traités localement (aussi exposé sur /metrics).
+    """
+
+    def __init__(self, config=None, session=None, logger=None, listener=None, vision_service=None):
+        self.session = session
+        self.log = logger or (lambda msg, **kwargs: None)
+        self.listener = listener
+        self.vision_service = vision_service
+        self.tablet_ui = None
+        self.enabled = True
+        self.volume_step = DEFAULT_VOLUME_STEP
+        self.path = None
+        self.replies = {}
+        self._regex = None
+        self._filler_regex = None
+        self._lock = threading.Lock()
+        self.saved_llm_calls = 0
+        self.by_intent = {}
+        self.configure(config)
+
+    def configure(self, config=None):
+        intents_cfg = (config or {}).get('intents', {}) or {}
+        self.enabled = bool(intents_cfg.get('enabled', True))
+        self.volume_step = int(intents_cfg.get('volume_step') or DEFAULT_VOLUME_STEP)
+        path = intents_cfg.get('patterns_path')
+        if path:
+            self.path = os.path.abspath(path)
+        else:
+            self.path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lang', 'map', 'intents.txt'))
+        self._load()
+
+    def attach_tablet(self, tablet_ui):
+        self.tablet_ui = tablet_ui
+
+    # ---------- chargement ----------
+    def _load(self):
+        patterns = {}
+        fillers = []
+        replies = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith('#') or '=' not in line:
+                        continue
+                    key, value = line.split('=', 1)
+                    key, value = key.strip(), value.strip()
+                    if key == 'filler':
+                        fillers.append(value)
+                    elif key.startswith('reply.'):
+                        replies[key[len('reply.'):]] = value
+                    elif value:
+                        patterns.setdefault(key, []).append(value)
+        except Exception as e:
+            self.log("[INTENT] Lecture de {} impossible: {}".format(self.path, e), level='warning')
+
+        regex = None
+        groups = []
+        for intent, alternatives in patterns.items():
+            if not hasattr(self, '_do_' + intent):
+                self.log("[INTENT] Intention inconnue ignorée: {}".format(intent), level='warning')
+                continue
+            try:
+                re.compile('|'.join(alternatives))
+            except re.error as e:
+                self.log("[INTENT] Motif invalide pour {}: {}".format(intent, e), level='warning')
+                continue
+            groups.append('(?P<{}>{})'.format(intent, '|'.join('(?:{})'.format(a) for a in alternatives)))
+        if groups:
+            regex = re.compile('(?:' + '|'.join(groups) + ')')
+
+        filler_regex = None
+        if fillers:
+            try:
+                filler_regex = re.compile(r'\b(?:' + '|'.join('(?:{})'.format(f) for f in fillers) + r')\b')
+            except re.error as e:
+                self.log("[INTENT] Formules ignorées invalides: {}".format(e), level='warning')
+
+        with self._lock:
+            self._regex = regex
+            self._filler_regex = filler_regex
+            self.replies = replies
+        self.log("[INTENT] {} intention(s) locale(s) chargée(s) depuis {}".format(len(groups), self.path), level='debug')
+
+    # ---------- reconnaissance ----------
+    def normalize(self, text):
+        norm = _norm_text(text).replace("'", " ")
+        filler_regex = self._filler_regex
+        if filler_regex is not None:
+            norm = filler_regex.sub(' ', norm)
+        return ' '.join(norm.split())
+
+    def match(self, text):
+        """Nom de l'intention reconnue (énoncé entier), ou None."""
+        regex = self._regex
+        if not self.enabled or regex is None or not text:
+            return None
+        m = regex.fullmatch(self.normalize(text))
+        return m.lastgroup if m else None
+
+    def handle(self, intent, text=""):
+        """Exécute l'intention. Retourne la réponse à prononcer ("" = silence), ou None si non traitée."""
+        try:
+            reply = getattr(self, '_do_' + intent)()
+        except Exception as e:
+            self.log("[INTENT] Action {} impossible ({}), envoi au LLM.".format(intent, e), level='warning')
+            return None
+        if reply is None:
+            reply = self.replies.get(intent, "")
+        with self._lock:
+            self.saved_llm_calls += 1
+            self.by_intent[intent] = self.by_intent.get(intent, 0) + 1
+            saved = self.saved_llm_calls
+        INTENTS.inc(intent)
+        self.log("[INTENT] '{}' -> {} ({} appel(s) LLM évité(s))".format(text, intent, saved), level='info')
+        return reply
+
+    def stats(self):
+        with self._lock:
+            return {'saved_llm_calls': self.saved_llm_calls, 'by_intent': dict(self.by_intent)}
+
+    def canned_replies(self):
+        """Réponses fixes (pour pré-rendu dans le cache de phrases du service)."""
+        return [r for r in self.replies.values() if r] + [NO_PHOTO_REPLY]
+
+    # ---------- actions ----------
+    def _web_server(self):
+        web_server = getattr(self.tablet_ui, 'web_server', None)
+        if web_server is None:
+            raise RuntimeError("WebServer indisponible")
+        return web_server
+
+    def _do_stop(self):
+        self.session.service("PepperLifeService").stopAll()
+
+    def _change_volume(self, delta):
+        web_server = self._web_server()
+        return web_server.set_volume(web_server.get_volume() + delta)
+
+    def _do_volume_up(self):
+        self._change_volume(self.volume_step)
+
+    def _do_volume_down(self):
+        self._change_volume(-self.volume_step)
+
+    def _do_rest(self):
+        self._web_server().set_posture('rest')
+
+    def _do_wake_up(self):
+        self._web_server().set_posture('wakeUp')
+
+    def _do_mic_off(self):
+        web_server = self._web_server()
+        if self.listener is not None and not self.listener.is_micro_enabled():
+            return None
+        if web_server.mic_toggle_callback:
+            web_server.mic_toggle_callback()
+        else:
+            self.listener.toggle_micro()
+
+    def _do_take_photo(self):
+        png_bytes = self.vision_service.get_png() if self.vision_service else None
+        if not png_bytes:
+            return NO_PHOTO_REPLY
+        if self.tablet_ui:
+            self.tablet_ui.set_last_capture(png_bytes)
+            self.tablet_ui.show_last_capture_on_tablet()
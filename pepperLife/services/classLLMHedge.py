@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+# classLLMHedge.py — requête LLM doublée quand le premier fragment tarde (délai TTFT)
+#
+# Quand OpenAI ou le serveur Ollama est saturé, chat() attend jusqu'au timeout client et le robot
+# reste figé. HedgedChat lance la requête normale puis, si aucun fragment n'est arrivé après
+# ttft_deadline_ms (ou si elle a déjà échoué), une seconde requête: même backend, ou repli
+# configuré (autre modèle, autre serveur Ollama). Le premier fragment désigne la gagnante:
+# seuls ses fragments sont transmis à on_chunk, le flux de la perdante est fermé.
+
+import copy
+import time
+import threading
+from collections import deque
+
+from .classMetrics import LLM_HEDGES, LLM_TTFT
+from .classTurnTrace import TURN_TRACER, _percentile
+from .chatBots.ollama import normalize_base_url
+
+DEFAULT_DEADLINES_MS = {'gpt': 2500, 'ollama': 4000}
+# La passerelle partagée fusionne les requêtes identiques en cours: une requête doublée y rejoindrait
+# le travail de la première au lieu d'en lancer une seconde (et ajouterait de la charge à la flotte).
+NO_HEDGE_MODES = ('gateway',)
+WINDOW = 200
+
+
+class CancelToken(object):
+    """Annulation d'une requête depuis un autre thread: is_set() lu par la boucle de flux, on_cancel(fn) ferme la connexion."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._closers = []
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def on_cancel(self, closer):
+        with self._lock:
+            if not self._event.is_set():
+                self._closers.append(closer)
+                return
+        self._call(closer)
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            closers, self._closers = self._closers, []
+        for closer in closers:
+            self._call(closer)
+
+    @staticmethod
+    def _call(closer):
+        try:
+            closer()
+        except Exception:
+            pass
+
+
+def _is_error(result):
+    """chatGPT renvoie ses erreurs sous forme (texte d'excuse, {'error': ...}) au lieu de lever."""
+    try:
+        raw = result[1]
+    except Exception:
+        return result is None
+    return isinstance(raw, dict) and bool(raw.get('error') or raw.get('cancelled'))
+
+
+class _Attempt(object):
+    def __init__(self, label, service, kwargs):
+        self.label = label
+        self.service = service
+        self.kwargs = kwargs
+        self.cancel = CancelToken()
+        self.started = time.time()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def failed(self):
+        return self.error is not None or _is_error(self.result)
+
+
+class HedgedChat(object):
+    """
+    chat(service, mode, user_text, hist, **kwargs) -> même contrat que service.chat().
+    Config "llm_hedging": enabled, ttft_deadline_ms {gpt, ollama},
+    fallback {gpt: {model}, ollama: {model, server}} (vide = même backend, même modèle).
+    Jamais de requête doublée en mode gateway (NO_HEDGE_MODES).
+    cancel (CancelToken) annule la requête et son éventuel doublon (requête spéculative abandonnée).
+    En mode gpt la requête passe toujours en streaming pour observer le premier fragment;
+    Ollama sans streaming: le premier fragment est la réponse complète.
+    """
+
+    def __init__(self, config=None, logger=None):
+        self.log = logger or (lambda msg, **kwargs: None)
+        self._lock = threading.Lock()
+        self.enabled = False
+        self.deadlines = dict(DEFAULT_DEADLINES_MS)
+        self.fallback = {}
+        self._ttft = {}
+        self.stats_data = {'requests': 0, 'hedged': 0, 'wins': {'primary': 0, 'hedge': 0}, 'failed': 0}
+        self.configure(config)
+
+    def configure(self, config=None):
+        cfg = (config or {}).get('llm_hedging', {}) or {}
+        self.enabled = bool(cfg.get('enabled', False))
+        deadlines = dict(DEFAULT_DEADLINES_MS)
+        for mode, value in (cfg.get('ttft_deadline_ms') or {}).items():
+            if mode in NO_HEDGE_MODES:
+                self.log("[HEDGE] Délai TTFT ignoré pour le mode {} (pas de requête doublée).".format(mode), level='warning')
+                continue
+            try:
+                deadlines[mode] = float(value) if value else 0.0
+            except (TypeError, ValueError):
+                self.log("[HEDGE] Délai TTFT invalide pour {}: {}".format(mode, value), level='warning')
+        self.deadlines = deadlines
+        self.fallback = dict(cfg.get('fallback') or {})
+
+    # ---------- requête ----------
+    def _fallback_target(self, service, mode, kwargs):
+        fb = self.fallback.get(mode) or {}
+        target = service
+        server = normalize_base_url(fb.get('server') or "") if mode == 'ollama' else ""
+        if server and server != getattr(service, 'base_url', None):
+            target = copy.copy(service)
+            target.base_url = server
+            target.pool = None
+        hedge_kwargs = dict(kwargs)
+        if fb.get('model'):
+            hedge_kwargs['model'] = fb['model']
+        return target, hedge_kwargs
+
+    def chat(self, service, mode, user_text, hist=None, on_chunk=None, cancel=None, **kwargs):
+        deadline = 0.0 if mode in NO_HEDGE_MODES else (self.deadlines.get(mode) or 0.0)
+        if not self.enabled or deadline <= 0:
+            if cancel is not None:
+                kwargs['cancel'] = cancel
+            return service.chat(user_text, hist, on_chunk=on_chunk, **kwargs)
+        if mode == 'gpt':
+            kwargs['stream'] = True
+
+        cond = threading.Condition()
+        state = {'winner': None, 'ttft': None}
+        attempts = []
+        t0 = time.time()
+        # Les tentatives tournent dans leurs propres threads: même règle de traçage que l'appelant
+        muted = TURN_TRACER.is_muted()
+
+        def elect(attempt):
+            # Appelé sous cond: la première tentative qui produit un fragment (ou finit sans erreur) gagne
+            state['winner'] = attempt
+            state['ttft'] = time.time() - t0
+            for other in attempts:
+                if other is not attempt:
+                    other.cancel.cancel()
+            cond.notify_all()
+
+        def make_sink(attempt):
+            def _sink(event):
+                delta = event.get('delta') if isinstance(event, dict) else None
+                with cond:
+                    if state['winner'] is None and delta and not attempt.cancel.is_set():
+                        elect(attempt)
+                    forward = state['winner'] is attempt
+                if forward and on_chunk:
+                    on_chunk(event)
+            return _sink
+
+        def run(attempt):
+            try:
+                with TURN_TRACER.muted(muted):
+                    attempt.result = attempt.service.chat(user_text, hist, on_chunk=make_sink(attempt),
+                                                          cancel=attempt.cancel, **attempt.kwargs)
+            except Exception as e:
+                attempt.error = e
+            finally:
+                with cond:
+                    if state['winner'] is None and not attempt.failed() and not attempt.cancel.is_set():
+                        elect(attempt)
+                    attempt.done.set()
+                    cond.notify_all()
+
+        def start(label, target, attempt_kwargs):
+            attempt = _Attempt(label, target, attempt_kwargs)
+            with cond:
+                attempts.append(attempt)
+            if cancel is not None:
+                cancel.on_cancel(attempt.cancel.cancel)
+            worker = threading.Thread(target=run, args=(attempt,), name="LLMHedge-" + label)
+            worker.daemon = True
+            worker.start()
+            return attempt
+
+        primary = start('primary', service, dict(kwargs))
+        with cond:
+            cond.wait_for(lambda: state['winner'] is not None or primary.done.is_set(), deadline / 1000.0)
+            need_hedge = state['winner'] is None and not (cancel is not None and cancel.is_set())
+        if need_hedge:
+            target, hedge_kwargs = self._fallback_target(service, mode, kwargs)
+            reason = "échec" if primary.done.is_set() else "aucun fragment après {:.0f} ms".format(deadline)
+            route = ""
+            if target is not service:
+                route += " -> serveur {}".format(target.base_url)
+            if hedge_kwargs.get('model') != kwargs.get('model'):
+                route += " -> modèle {}".format(hedge_kwargs.get('model'))
+            self.log("[HEDGE] Requête {} doublée ({}){}".format(mode, reason, route), level='info')
+            start('hedge', target, hedge_kwargs)
+        with cond:
+            cond.wait_for(lambda: state['winner'] is not None or all(a.done.is_set() for a in attempts))
+            winner = state['winner']
+
+        if cancel is None or not cancel.is_set():
+            self._record(mode, need_hedge, winner, state['ttft'])
+        if winner is None:
+            # Toutes les tentatives ont échoué: résultat (ou erreur) de la requête normale
+            if primary.error is not None:
+                raise primary.error
+            return primary.result
+        winner.done.wait()
+        if winner.error is not None:
+            raise winner.error
+        return winner.result
+
+    # ---------- statistiques ----------
+    def _record(self, mode, hedged, winner, ttft):
+        with self._lock:
+            self.stats_data['requests'] += 1
+            if hedged:
+                self.stats_data['hedged'] += 1
+            if winner is None:
+                self.stats_data['failed'] += 1
+            else:
+                self.stats_data['wins'][winner.label] += 1
+                self._ttft.setdefault(mode, deque(maxlen=WINDOW)).append(ttft)
+        if hedged:
+            LLM_HEDGES.inc(mode, winner.label if winner is not None else 'none')
+        if ttft is not None:
+            LLM_TTFT.observe(ttft, mode)
+
+    def stats(self):
+        with self._lock:
+            data = {
+                'enabled': self.enabled,
+                'requests': self.stats_data['requests'],
+                'hedged': self.stats_data['hedged'],
+                'wins': dict(self.stats_data['wins']),
+                'failed': self.stats_data['failed'],
+                'deadline_ms': dict(self.deadlines),
+            }
+            windows = dict((mode, sorted(values)) for mode, values in self._ttft.items())
+        data['hedge_rate'] = round(data['hedged'] / float(data['requests']), 3) if data['requests'] else None
+        data['ttft_ms'] = {}
+        for mode, values in windows.items():
+            data['ttft_ms'][mode] = dict(
+                ('p{}'.format(p), round(1000.0 * _percentile(values, p), 1)) for p in (50, 90, 99))
+        return data
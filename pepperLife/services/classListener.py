@@ -4,6 +4,8 @@
 import time, io, wave, random, threading
 from collections import deque
 from .classAudioUtils import agc, trim_tail_silence
+from .classMetrics import AUDIO_CHUNKS, AUDIO_DROPPED
+from .classTurnTrace import TURN_TRACER
 
 def _list_audio_clients(ad):
     try:
@@ -62,6 +64,7 @@ class Listener(object):
         self.pre = deque(maxlen=self.maxpre)
         self.rec = []
         self.on = False # This is for recording state
+        self.kws = None # WakeWordSpotter optionnel (mode écoute filtrée), alimenté bloc par bloc
         self.log("[AUDIO] Listener initialized: %s" % self.name, level='info')
 
     def start(self):
@@ -147,8 +150,10 @@ class Listener(object):
             is_recording = self.on
 
         time_since_stop = time.time() - stop_time
+        AUDIO_CHUNKS.inc()
 
         if is_speaking or (time_since_stop < self.speech_cooldown) or not micro_on:
+            AUDIO_DROPPED.inc('tts' if is_speaking else ('cooldown' if micro_on else 'mic_off'))
             return
 
         with self.lock:
@@ -157,6 +162,10 @@ class Listener(object):
             if is_recording:
                 self.rec.append(buf)
 
+        kws = self.kws
+        if kws is not None:
+            kws.feed(buf)
+
     def get_last_audio_chunk(self):
         with self.lock:
             if not self.mon:
@@ -168,12 +177,25 @@ class Listener(object):
         self.on = True
         self.log("[REC] START pre=%d" % len(self.rec), level='debug')
 
+    def peek_recording_wav(self):
+        """WAV de l'enregistrement en cours, sans l'arrêter (transcriptions partielles)."""
+        with self.lock:
+            chunks = list(self.rec)
+        if not chunks: return None
+        return self._to_wav(agc(b"".join(chunks), self.agc_target))
+
     def stop_recording(self, stop_thr):
         self.on = False
+        TURN_TRACER.mark('end_of_speech')
         if not self.rec: return None
         raw = b"".join(self.rec); self.rec = []
         raw = agc(raw, self.agc_target)
         raw = trim_tail_silence(raw, stop_thr, self.sr, 20)
+        wav = self._to_wav(raw)
+        TURN_TRACER.mark('wav_built')
+        return wav
+
+    def _to_wav(self, raw):
         buf = io.BytesIO()
         wf = wave.open(buf, "wb")
         wf.setnchannels(1)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# classLog.py — journal filtré par niveau, formatage paresseux, écriture dans un thread dédié
+#
+# log("[OLLAMA_RAW] %s", chunk, level='debug'): les arguments ne sont formatés que si le niveau
+# est affiché (config log.verbosity: 0 erreurs, 1 avertissements, 2 infos, 3 debug). Les lignes
+# passent par une file lue par le thread LogWriter: une console lente ou le pipe du lanceur plein
+# ne bloque plus les threads audio et chat. Aucune ligne n'est perdue: si la file est pleine,
+# l'appelant attend brièvement puis écrit lui-même la ligne (contre-pression, comptée).
+# L'appel historique log(msg, level=..., color=...) est inchangé; les services reçoivent LOG comme logger et testent log_enabled(self.log, 'debug')
+# avant un formatage coûteux (repr d'une réponse brute, payload complet).
+
+import atexit
+import queue
+import sys
+import threading
+import time
+
+from .classSystem import bcolors
+
+LEVELS = {'error': 0, 'warning': 1, 'info': 2, 'debug': 3}
+DEFAULT_QUEUE_SIZE = 10000
+# Attente max de l'appelant quand la file est pleine, avant d'écrire la ligne lui-même
+FULL_QUEUE_WAIT = 0.05
+
+
+def log_enabled(logger, level='debug'):
+    """Vrai si `logger` affichera ce niveau (les loggers simples, sans is_enabled(), affichent tout)."""
+    check = getattr(logger, 'is_enabled', None)
+    if check is None:
+        return True
+    try:
+        return check(level)
+    except Exception:
+        return True
+
+
+class Logger(object):
+    """
+    Appelable comme l'ancien pepperLife.log: LOG(msg, *args, level='info', color=None).
+    Config "log": verbosity, file (null = console seule), async (false = écriture dans le thread appelant).
+    """
+
+    def __init__(self, verbosity=2, console=True, path=None, asynchronous=True, max_queue=DEFAULT_QUEUE_SIZE):
+        self.verbosity = verbosity
+        self.console = console
+        self.path = path
+        self.asynchronous = asynchronous
+        self.overflow = 0  # lignes écrites par l'appelant faute de place dans la file
+        self._file = None
+        self._file_path = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def configure(self, config):
+        cfg = (config or {}).get('log', {}) or {}
+        try:
+            self.verbosity = int(cfg.get('verbosity', 2))
+        except (TypeError, ValueError):
+            self.verbosity = 2
+        self.path = cfg.get('file') or None
+        self.asynchronous = bool(cfg.get('async', True))
+
+    def is_enabled(self, level='info'):
+        return self.verbosity >= LEVELS.get(level, 2)
+
+    def __call__(self, msg, *args, level='info', color=None, **kwargs):
+        if self.verbosity < LEVELS.get(level, 2):
+            return
+        try:
+            if args:
+                msg = msg % args
+        except Exception:
+            msg = "{} {}".format(msg, args)
+        record = (time.time(), level, msg, color)
+        if not self.asynchronous:
+            with self._write_lock:
+                self._write(record)
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        # File pleine (console bloquée): erreurs et avertissements écrits tout de suite, le reste
+        # attend un peu que le LogWriter se libère. Jamais de ligne perdue.
+        if LEVELS.get(level, 2) > LEVELS['warning']:
+            try:
+                self._queue.put(record, timeout=FULL_QUEUE_WAIT)
+                return
+            except queue.Full:
+                pass
+        with self._write_lock:
+            self.overflow += 1
+            self._write(record)
+
+    # ---------- écriture ----------
+    def _ensure_writer(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._writer_loop, name="LogWriter")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _writer_loop(self):
+        reported = 0
+        while True:
+            record = self._queue.get()
+            try:
+                with self._write_lock:
+                    if self.overflow != reported:
+                        count, reported = self.overflow - reported, self.overflow
+                        self._write((time.time(), 'warning', "[LOG] File de journal pleine: {} message(s) écrit(s) directement par "
+                                     "le thread appelant (ordre possiblement décalé).".format(count), None))
+                    self._write(record)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, record):
+        ts, level, msg, color = record
+        if not isinstance(msg, str):
+            msg = str(msg)
+        if self.console:
+            line = (color + msg + bcolors.ENDC) if color else msg
+            try:
+                try:
+                    sys.stdout.write(line + "\n")
+                except UnicodeEncodeError:
+                    sys.stdout.write(line.encode('ascii', 'replace').decode('ascii') + "\n")
+                sys.stdout.flush()
+            except Exception:
+                pass
+        if self.path:
+            try:
+                if self._file is None or self._file_path != self.path:
+                    if self._file is not None:
+                        self._file.close()
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                    self._file_path = self.path
+                self._file.write("{} {} {}\n".format(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts)),
+                                                     level.upper(), msg))
+                self._file.flush()
+            except Exception:
+                pass
+
+    def flush(self, timeout=2.0):
+        """Attend que la file soit vidée (arrêt du programme)."""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            if self._thread is None or not self._thread.is_alive():
+                return
+            time.sleep(0.01)
+
+
+LOG = Logger()
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# classMetrics.py — registre de métriques en mémoire, exposé au format texte Prometheus (/metrics)
+#
+# Coût minimal sur les chemins chauds: un inc()/observe() = un verrou + une addition
+# (+ un bisect pour les histogrammes). Les jauges système (threads, RSS, CPU) et les
+# statistiques des autres processus ne sont calculées qu'au moment du scrape.
+
+import os
+import time
+import bisect
+import threading
+
+# Secondes: couvre RPC NAOqi (ms) jusqu'aux appels LLM lents (10 s+)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Au-delà, les nouvelles valeurs d'étiquettes sont regroupées sous 'other' (cardinalité bornée)
+MAX_SERIES = 200
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = ['{}="{}"'.format(n, _escape(v)) for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(object):
+    kind = 'untyped'
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _key(self, labelvalues):
+        if labelvalues in self._series:
+            return labelvalues
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError("{}: étiquettes attendues {}".format(self.name, self.labelnames))
+        key = tuple(str(v) for v in labelvalues)
+        if key not in self._series and len(self._series) >= MAX_SERIES:
+            key = tuple('other' for _ in key)
+        return key
+
+    def header(self):
+        return ['# HELP {} {}'.format(self.name, self.doc), '# TYPE {} {}'.format(self.name, self.kind)]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount=1.0):
+        with self._lock:
+            key = self._key(labelvalues)
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, value in items:
+            lines.append('{}{} {}'.format(self.name, _format_labels(self.labelnames, key), _format_value(value)))
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labelvalues):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(labelvalues)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labelvalues):
+        """Contexte: with HIST.time('label'): ... observe la durée du bloc."""
+        return _Timer(self, labelvalues)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = 'le="{}"'.format(_format_value(bound))
+                lines.append('{}_bucket{} {}'.format(self.name, _format_labels(self.labelnames, key, le), cumulative))
+            labels = _format_labels(self.labelnames, key)
+            lines.append('{}_sum{} {}'.format(self.name, labels, repr(float(total))))
+            lines.append('{}_count{} {}'.format(self.name, labels, count))
+        return lines
+
+
+class _Timer(object):
+    __slots__ = ('_hist', '_labels', '_t0')
+
+    def __init__(self, hist, labels):
+        self._hist = hist
+        self._labels = labels
+
+    def __enter__(self):
+        self._t0 = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.monotonic() - self._t0, *self._labels)
+        return False
+
+
+class GaugeFunc(_Metric):
+    """Jauge calculée au scrape: fn() -> nombre, ou {(valeurs d'étiquettes): nombre}."""
+    kind = 'gauge'
+
+    def __init__(self, name, doc, fn, labelnames=(), kind='gauge'):
+        super(GaugeFunc, self).__init__(name, doc, labelnames)
+        self.fn = fn
+        self.kind = kind
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        lines = self.header()
+        if isinstance(value, dict):
+            for key, v in sorted(value.items()):
+                if v is not None:
+                    lines.append('{}{} {}'.format(self.name, _format_labels(self.labelnames, key), _format_value(v)))
+        else:
+            lines.append('{} {}'.format(self.name, _format_value(value)))
+        return lines
+
+
+class MetricsRegistry(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, doc, labelnames=()):
+        return self._get_or_create(Counter, name, doc, labelnames)
+
+    def histogram(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, doc, labelnames, buckets=buckets)
+
+    def gauge_fn(self, name, doc, fn, labelnames=(), kind='gauge'):
+        """(Re)déclare une jauge calculée au scrape (la dernière fonction enregistrée gagne)."""
+        with self._lock:
+            metric = self._metrics[name] = GaugeFunc(name, doc, fn, labelnames, kind=kind)
+            return metric
+
+    def render(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# ---------- métriques du processus ----------
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except Exception:
+            return None
+
+
+def _cpu_seconds():
+    t = os.times()
+    return t[0] + t[1]
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.gauge_fn('process_resident_memory_bytes', 'Mémoire résidente du processus pepperLife.', _rss_bytes)
+REGISTRY.gauge_fn('process_cpu_seconds_total', 'Temps CPU (user + system) du processus pepperLife.', _cpu_seconds,
+                  kind='counter')
+REGISTRY.gauge_fn('pepperlife_threads', 'Threads Python actifs.', threading.active_count)
+
+# Métriques partagées (déclarées ici pour que /metrics les expose même à zéro)
+TURNS = REGISTRY.counter('pepperlife_turns_total', 'Tours de parole terminés, par issue.', ('outcome',))
+TURN_RESPONSE = REGISTRY.histogram('pepperlife_turn_response_seconds', 'Fin de parole utilisateur -> début TTS.')
+STT_REQUESTS = REGISTRY.counter('pepperlife_stt_requests_total', 'Requêtes STT.', ('engine',))
+STT_ERRORS = REGISTRY.counter('pepperlife_stt_errors_total', 'Requêtes STT en erreur.', ('engine',))
+STT_SECONDS = REGISTRY.histogram('pepperlife_stt_seconds', 'Durée des requêtes STT.', ('engine',))
+LLM_REQUESTS = REGISTRY.counter('pepperlife_llm_requests_total', 'Appels LLM.', ('backend',))
+LLM_ERRORS = REGISTRY.counter('pepperlife_llm_errors_total', 'Appels LLM en erreur.', ('backend',))
+LLM_SECONDS = REGISTRY.histogram('pepperlife_llm_seconds', 'Durée des appels LLM (réponse complète).', ('backend',))
+LLM_TTFT = REGISTRY.histogram('pepperlife_llm_ttft_seconds', 'Délai jusqu\'au premier fragment LLM retenu (requêtes doublées incluses).',
+                              ('backend',))
+OLLAMA_TOKENS = REGISTRY.counter('pepperlife_ollama_tokens_total', 'Tokens évalués par Ollama: prompt (hors cache KV) et génération.',
+                                ('phase',))
+OLLAMA_PREFILL_SECONDS = REGISTRY.histogram('pepperlife_ollama_prefill_seconds', 'Durée d\'évaluation du prompt par Ollama (prompt_eval_duration).')
+OLLAMA_DECODE_TPS = REGISTRY.histogram('pepperlife_ollama_decode_tokens_per_second', 'Débit de génération Ollama (eval_count / eval_duration).',
+                                       buckets=(1, 2, 5, 10, 15, 20, 30, 50, 80, 120, 200))
+LLM_FIRST_TURN = REGISTRY.histogram('pepperlife_llm_first_turn_seconds', 'Durée LLM du premier tour de chaque session, modèle préchauffé ou non.',
+                                    ('backend', 'state'))
+OLLAMA_WARMUP_SECONDS = REGISTRY.histogram('pepperlife_ollama_warmup_seconds', 'Préchauffage Ollama au démarrage du chat, par étape.',
+                                           ('stage',), buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+LLM_HEDGES = REGISTRY.counter('pepperlife_llm_hedges_total', 'Requêtes LLM doublées après dépassement du délai de premier fragment, par gagnante.',
+                              ('backend', 'winner'))
+VISION_TURN_SECONDS = REGISTRY.histogram('pepperlife_vision_turn_seconds', 'Tour vision: capture + encodage + requête au modèle, par profil.',
+                                         ('profile',))
+VISION_PAYLOAD_BYTES = REGISTRY.histogram('pepperlife_vision_payload_bytes', 'Taille de l\'image envoyée au modèle vision (base64), par profil.',
+                                          ('profile',), buckets=(10e3, 25e3, 50e3, 100e3, 200e3, 400e3, 800e3, 1.6e6))
+CAMERA_FRAMES = REGISTRY.counter('pepperlife_camera_frames_total', 'Images acquises par le thread caméra (CameraBus).')
+CAMERA_ENCODES = REGISTRY.counter('pepperlife_camera_encodes_total',
+                                  'Variantes d\'image demandées: encodées, ou servies depuis le cache de l\'image.', ('result',))
+GATEWAY_REQUESTS = REGISTRY.counter('pepperlife_gateway_requests_total', 'Requêtes reçues par la passerelle LLM partagée, par issue.',
+                                    ('outcome',))
+GATEWAY_QUEUE_SECONDS = REGISTRY.histogram('pepperlife_gateway_queue_seconds', 'Attente en file de la passerelle LLM avant appel backend.',
+                                           ('backend',))
+HTTP_REQUESTS = REGISTRY.counter('pepperlife_http_requests_total', 'Requêtes HTTP du WebServer.',
+                                 ('method', 'route', 'code'))
+HTTP_SECONDS = REGISTRY.histogram('pepperlife_http_request_seconds', 'Latence des requêtes HTTP du WebServer.',
+                                  ('method', 'route'))
+NAOQI_CALLS = REGISTRY.counter('pepperlife_naoqi_calls_total', 'Appels RPC NAOqi via WebServer.svc().',
+                               ('service', 'method', 'status'))
+NAOQI_SECONDS = REGISTRY.histogram('pepperlife_naoqi_call_seconds', 'Durée des appels RPC NAOqi via svc() (verrou inclus).',
+                                   ('service',))
+AUDIO_CHUNKS = REGISTRY.counter('pepperlife_listener_chunks_total', 'Blocs audio reçus par le Listener.')
+AUDIO_DROPPED = REGISTRY.counter('pepperlife_listener_dropped_chunks_total', 'Blocs audio ignorés par le Listener.',
+                                 ('reason',))
+SPEECH_GATE_CLIPS = REGISTRY.counter('pepperlife_speech_gate_clips_total', 'Clips analysés avant STT, par décision.',
+                                     ('decision',))
+SPEECH_GATE_SAVED_SECONDS = REGISTRY.counter('pepperlife_speech_gate_saved_stt_seconds_total',
+                                             'Secondes STT économisées (estimation) par le rejet des clips non vocaux.')
+WAKEWORD_CANDIDATES = REGISTRY.counter('pepperlife_wakeword_candidates_total', 'Segments audio comparés aux gabarits du mot d\'éveil.')
+WAKEWORD_DETECTIONS = REGISTRY.counter('pepperlife_wakeword_detections_total', 'Mots d\'éveil détectés.')
+SPECULATION_OUTCOMES = REGISTRY.counter('pepperlife_speculation_total',
+                                        'Requêtes LLM anticipées sur transcription partielle, par issue.', ('outcome',))
+SPECULATION_SAVED_SECONDS = REGISTRY.counter('pepperlife_speculation_saved_seconds_total',
+                                             'Latence gagnée par les réponses spéculatives confirmées.')
+INTENTS = REGISTRY.counter('pepperlife_intents_total', 'Commandes traitées localement (appels LLM évités).', ('intent',))
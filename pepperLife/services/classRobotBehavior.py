@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 # robot_comportement.py — gère l’enveloppe "contrôle moteur"
-import threading
 
 class BehaviorManager(object):
     def __init__(self, session, logger, **kwargs):
@@ -17,24 +16,31 @@ class BehaviorManager(object):
             return []
 
     def start_behavior(self, name):
-        """Démarre un comportement dans un thread séparé pour être non bloquant."""
-        def target():
+        """Démarre un comportement sans bloquer: runBehavior en _async (pas de thread par appel)."""
+        try:
+            bm = self.s.service("ALBehaviorManager")
+            if not bm.isBehaviorInstalled(name):
+                self.log(f"Comportement '{name}' non trouvé.", level='warning')
+                return None
+            fut = bm.runBehavior(name, _async=True)
+        except Exception as e:
+            self.log(f"Impossible de démarrer le comportement '{name}': {e}", level='error')
+            return None
+
+        def _on_done(f):
             try:
-                bm = self.s.service("ALBehaviorManager")
-                if bm.isBehaviorInstalled(name):
-                    bm.runBehavior(name)
-                else:
-                    self.log(f"Comportement '{name}' non trouvé.", level='warning')
-            except Exception as e:
-                if "interrupted" not in str(e).lower():
-                    self.log(f"Erreur lors de l'exécution du comportement '{name}': {e}", level='error')
+                if f.hasError():
+                    err = f.error()
+                    if "interrupted" not in str(err).lower():
+                        self.log(f"Erreur lors de l'exécution du comportement '{name}': {err}", level='error')
+            except Exception:
+                pass
 
         try:
-            thread = threading.Thread(target=target)
-            thread.daemon = True
-            thread.start()
-        except Exception as e:
-            self.log(f"Impossible de démarrer le thread pour le comportement '{name}': {e}", level='error')
+            fut.addCallback(_on_done)
+        except Exception:
+            pass
+        return fut
 
     def stop_behavior(self, name):
         """Arrête un comportement s'il est en cours."""
@@ -13,6 +13,8 @@ from urllib.request import Request, urlopen
 from openai import OpenAI
 
 from .chatBots.ollama import normalize_base_url
+from .classMetrics import STT_ERRORS, STT_REQUESTS, STT_SECONDS
+from .classTurnTrace import TURN_TRACER
 
 
 class STT(object):
@@ -59,10 +61,12 @@ class STT(object):
             if callable(method):
                 method(message)
 
-    def _transcribe_openai(self, wav_bytes: bytes, model_override: Optional[str] = None) -> Optional[str]:
+    def _transcribe_openai(self, wav_bytes: bytes, model_override: Optional[str] = None, trace: bool = True) -> Optional[str]:
         model = model_override or self._openai_model or 'gpt-4o-transcribe'
         file_tuple = ("speech.wav", wav_bytes, "audio/wav")
         self._log_msg(f"[STT] Tentative OpenAI ({model})", level='debug')
+        if trace:
+            TURN_TRACER.mark('stt_sent')
         try:
             response = self.client().audio.transcriptions.create(
                 model=model,
@@ -74,10 +78,11 @@ class STT(object):
             self._log_msg(f"[STT] OpenAI ({model}) OK -> '{text}'", level='debug')
             return text
         except Exception as exc:
+            STT_ERRORS.inc('openai')
             self._log_msg(f"[STT] OpenAI ({model}) a échoué: {exc}", level='warning')
             return None
 
-    def _transcribe_local(self, wav_bytes: bytes) -> Optional[str]:
+    def _transcribe_local(self, wav_bytes: bytes, trace: bool = True) -> Optional[str]:
         if not self._local_base_url:
             raise RuntimeError("Serveur Whisper local non configuré.")
         url = urljoin(self._local_base_url + '/', self._local_transcribe.lstrip('/'))
@@ -95,6 +100,8 @@ class STT(object):
         }
         req = Request(url, data=body, headers=headers)
         self._log_msg(f"[STT] Tentative Whisper local: {url}", level='debug')
+        if trace:
+            TURN_TRACER.mark('stt_sent')
         try:
             with urlopen(req, timeout=self.timeout) as resp:
                 raw = resp.read()
@@ -131,24 +138,31 @@ class STT(object):
             self._log_msg("[STT] Whisper local n'a pas renvoyé de texte exploitable.", level='warning')
         return text
 
-    def stt(self, wav_bytes: bytes) -> Optional[str]:
+    def stt(self, wav_bytes: bytes, partial: bool = False) -> Optional[str]:
         """
         Retourne la transcription selon l'engin configuré.
+        partial=True: transcription d'un enregistrement en cours (spéculation), sans trace de tour
+        ni nouvel essai whisper-1, comptée à part dans les métriques.
         """
         engine = self.engine or 'openai'
-        if engine == 'local':
-            try:
-                return self._transcribe_local(wav_bytes)
-            except Exception as exc:
-                self._log_msg(f"[STT] Whisper local indisponible: {exc}", level='error')
-                return None
-
-        # Mode OpenAI par défaut
-        result = self._transcribe_openai(wav_bytes)
-        if result:
-            return result
-
-        if self._openai_model != 'whisper-1':
-            self._log_msg("[STT] Retry avec whisper-1.", level='warning')
-            return self._transcribe_openai(wav_bytes, model_override='whisper-1')
-        return None
+        engine_label = 'local' if engine == 'local' else 'openai'
+        if partial:
+            engine_label += '_partial'
+        STT_REQUESTS.inc(engine_label)
+        with STT_SECONDS.time(engine_label):
+            if engine == 'local':
+                try:
+                    result = self._transcribe_local(wav_bytes, trace=not partial)
+                except Exception as exc:
+                    STT_ERRORS.inc(engine_label)
+                    self._log_msg(f"[STT] Whisper local indisponible: {exc}", level='error')
+                    result = None
+            else:
+                # Mode OpenAI par défaut
+                result = self._transcribe_openai(wav_bytes, trace=not partial)
+                if not result and not partial and self._openai_model != 'whisper-1':
+                    self._log_msg("[STT] Retry avec whisper-1.", level='warning')
+                    result = self._transcribe_openai(wav_bytes, model_override='whisper-1')
+        if not partial:
+            TURN_TRACER.mark('transcript')
+        return result
@@ -5,6 +5,129 @@ import os
 import re
 import threading
 import time
+
+from .classLog import log_enabled
+from .classTurnTrace import TURN_TRACER
+
+class TTSReplacementMap(object):
+    """
+    Carte de remplacements TTS compilée une fois en une seule regex.
+    - Les clés sont factorisées en trie (préfixes communs) : le coût ne dépend plus du nombre d'entrées.
+    - Plus long d'abord, bornes de mot (?<!\\w) / (?!\\w), option insensible à la casse.
+    - Les balises ^start(...)/^wait(...) ne sont jamais modifiées.
+    - Rechargement automatique quand le mtime du fichier change (vérifié au plus une fois par seconde).
+    Format : mot_original=mot_remplacé, lignes vides ou débutant par # ignorées.
+    """
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, path, logger=None, ignore_case=False):
+        self.path = path
+        self.logger = logger or (lambda msg, **kwargs: None)
+        self.ignore_case = bool(ignore_case)
+        self.mapping = {}
+        self._regex = None
+        self._lookup = {}
+        self._mtime = None
+        self._last_check = 0.0
+        self.reload()
+
+    def _read(self):
+        mapping = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for raw_line in f:
+                line = raw_line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if '=' not in line:
+                    continue
+                original, replacement = line.split('=', 1)
+                original = original.strip()
+                replacement = replacement.strip()
+                if original:
+                    mapping[original] = replacement
+        return mapping
+
+    @staticmethod
+    def _trie_pattern(words):
+        """Regex équivalente à l'alternance des mots, factorisée par préfixes (branche la plus longue d'abord)."""
+        trie = {}
+        for word in words:
+            node = trie
+            for ch in word:
+                node = node.setdefault(ch, {})
+            node[''] = None
+
+        def build(node):
+            branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != '']
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+            if '' in node:
+                # Le mot peut s'arrêter ici: la suite est optionnelle (gourmande => plus long d'abord)
+                return '(?:' + body + ')?'
+            return body
+
+        return build(trie)
+
+    def _compile(self, mapping):
+        if not mapping:
+            return None, {}
+        if self.ignore_case:
+            lookup = {}
+            for original, replacement in mapping.items():
+                lookup.setdefault(original.lower(), replacement)
+        else:
+            lookup = dict(mapping)
+        pattern = r'(\^\w+\([^)]*\))|(?<!\w)(?:{})(?!\w)'.format(self._trie_pattern(lookup.keys()))
+        return re.compile(pattern, re.IGNORECASE if self.ignore_case else 0), lookup
+
+    def reload(self):
+        mapping = {}
+        mtime = None
+        try:
+            if self.path and os.path.exists(self.path):
+                mtime = os.path.getmtime(self.path)
+                mapping = self._read()
+            regex, lookup = self._compile(mapping)
+        except Exception as e:
+            self.logger("Impossible de charger la carte TTS '{}': {}".format(self.path, e), level='warning')
+            self._mtime = mtime
+            return False
+        self.mapping, self._regex, self._lookup, self._mtime = mapping, regex, lookup, mtime
+        if mapping:
+            self.logger("[TTS] {} remplacements chargés depuis {}".format(len(mapping), self.path), level='debug')
+        return True
+
+    def _maybe_reload(self):
+        now = time.time()
+        if now - self._last_check < self.CHECK_INTERVAL:
+            return
+        self._last_check = now
+        try:
+            mtime = os.path.getmtime(self.path) if self.path and os.path.exists(self.path) else None
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            if self.reload():
+                self.logger("[TTS] Carte de remplacements rechargée ({} entrées).".format(len(self.mapping)), level='info')
+
+    def apply(self, text):
+        if not text:
+            return text
+        self._maybe_reload()
+        regex, lookup = self._regex, self._lookup
+        if regex is None:
+            return text
+        ignore_case = self.ignore_case
+
+        def _replace(m):
+            if m.group(1):
+                return m.group(1)
+            word = m.group(0)
+            return lookup.get(word.lower() if ignore_case else word, word)
+
+        return regex.sub(_replace, text)
+
 
 class Speaker(object):
     def __init__(self, session, logger, config=None):
@@ -19,56 +142,28 @@ class Speaker(object):
         self.tts_replacements = self._load_tts_replacements()
 
     def _load_tts_replacements(self):
-        """
-        Charge le fichier de remplacements TTS (one-shot). Format attendu :
-        mot_original=mot_remplacé, lignes vides ou débutant par # ignorées.
-        """
-        map_path = None
+        """Construit la carte de remplacements TTS compilée (rechargée à chaud si le fichier change)."""
+        audio_cfg = {}
         try:
-            map_path = self.config.get('audio', {}).get('tts_map_path')
+            audio_cfg = self.config.get('audio', {}) or {}
         except Exception:
-            map_path = None
+            audio_cfg = {}
+        map_path = audio_cfg.get('tts_map_path')
 
         if map_path:
             candidate = os.path.abspath(map_path)
         else:
             base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lang', 'map'))
             candidate = os.path.join(base_dir, 'tts_replacements.txt')
-
-        mapping = {}
-        try:
-            if os.path.exists(candidate):
-                with open(candidate, 'r', encoding='utf-8') as f:
-                    for raw_line in f:
-                        line = raw_line.strip()
-                        if not line or line.startswith('#'):
-                            continue
-                        if '=' not in line:
-                            continue
-                        original, replacement = line.split('=', 1)
-                        original = original.strip()
-                        replacement = replacement.strip()
-                        if original:
-                            mapping[original] = replacement
-                if mapping:
-                    self.logger("[TTS] {} remplacements chargés depuis {}".format(len(mapping), candidate), level='debug')
-        except Exception as e:
-            self.logger("Impossible de charger la carte TTS '{}': {}".format(candidate, e), level='warning')
-        return mapping
+        return TTSReplacementMap(candidate, logger=self.logger, ignore_case=audio_cfg.get('tts_map_ignore_case', False))
 
     def _apply_tts_replacements(self, text):
         """Applique les remplacements TTS avant envoi au service NAOqi."""
-        if not text or not self.tts_replacements:
+        try:
+            return self.tts_replacements.apply(text)
+        except Exception as e:
+            self.logger("[TTS] Remplacements TTS non appliqués: {}".format(e), level='warning')
             return text
-        updated = text
-        for original, replacement in self.tts_replacements.items():
-            try:
-                pattern = r'\b{}\b'.format(re.escape(original))
-                updated = re.sub(pattern, replacement, updated)
-            except Exception:
-                # fallback simple en cas de souci regex
-                updated = updated.replace(original, replacement)
-        return updated
 
     def _connect_to_service(self):
         """Établit la connexion au PepperLifeService si elle n'existe pas."""
@@ -123,7 +218,9 @@ class Speaker(object):
 
                 # 2. Si l'option est activée, extraire l'animation de ^start() et l'ajouter à ^wait()
                 wait_flag = self.config.get('audio', {}).get('add_wait_tag', False)
-                self.logger("[TTS-DEBUG] 'add_wait_tag' config value is: {}".format(wait_flag), level='debug')
+                debug = log_enabled(self.logger, 'debug')
+                if debug:
+                    self.logger("[TTS-DEBUG] 'add_wait_tag' config value is: {}".format(wait_flag), level='debug')
 
                 if wait_flag:
                     try:
@@ -134,12 +231,13 @@ class Speaker(object):
                             end_index = text_to_search.find(')', start_index)
                             if end_index != -1:
                                 anim_name = text_to_search[start_index + 1 : end_index]
-                                self.logger("[TTS-DEBUG] String search found! Animation name: '{}'".format(anim_name), level='debug')
                                 resolved_text += " ^wait({})".format(anim_name)
-                                self.logger("[TTS-DEBUG] Appended wait tag. New text: '{}'".format(resolved_text), level='debug')
-                            else:
+                                if debug:
+                                    self.logger("[TTS-DEBUG] String search found! Animation name: '{}'".format(anim_name), level='debug')
+                                    self.logger("[TTS-DEBUG] Appended wait tag. New text: '{}'".format(resolved_text), level='debug')
+                            elif debug:
                                 self.logger("[TTS-DEBUG] String search: Closing parenthesis NOT found!", level='debug')
-                        else:
+                        elif debug:
                             self.logger("[TTS-DEBUG] String search: '^start(' NOT found at the beginning!", level='debug')
                     except Exception as e:
                         self.logger("Could not extract and append wait animation (string method): {}".format(e), level='warning')
@@ -147,6 +245,7 @@ class Speaker(object):
                 resolved_text = self._apply_tts_replacements(resolved_text)
                 self.logger(u"[TTS] Texte original: '{}' -> Résolu: '{}'".format(text, resolved_text), level='info')
                 self._ensure_channel_ready()
+                TURN_TRACER.mark('first_sentence_queued')
                 try:
                     self.pls.sayAnimated(resolved_text, False, True)
                 except RuntimeError as err:
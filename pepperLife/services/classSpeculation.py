@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# classSpeculation.py — envoi anticipé au LLM sur transcription partielle stable
+#
+# Pendant l'enregistrement, le clip en cours est transcrit à intervalle régulier (STT "partiel").
+# La requête LLM part en tâche de fond quand la transcription partielle ne change plus depuis
+# stable_ms, ou dès le partiel demandé au début d'une pause (silence >= pause_ms): la fin de
+# tour attend encore silhold + STT final, ce temps est gagné. À la transcription finale:
+# - même texte (normalisé)  -> la réponse spéculative est gardée (succès);
+# - texte différent         -> elle est abandonnée et la requête normale part (échec).
+# Les fragments streamés d'une spéculation sont retenus jusqu'à confirmation: rien n'est
+# prononcé pour un texte qui ne sera pas confirmé. Une spéculation abandonnée annule sa requête
+# (CancelToken: connexion fermée) et ses marques de trace sont ignorées jusqu'à confirmation.
+
+import time
+import threading
+
+from .classASRFilters import _norm_text
+from .classLLMHedge import CancelToken
+from .classMetrics import SPECULATION_OUTCOMES, SPECULATION_SAVED_SECONDS
+from .classTurnTrace import TURN_TRACER
+
+DEFAULT_PARTIAL_INTERVAL_MS = 600
+DEFAULT_STABLE_MS = 500
+DEFAULT_MIN_AUDIO_MS = 800
+DEFAULT_PAUSE_MS = 200
+
+
+class SpeculativeReply(object):
+    """Requête LLM lancée sur un texte partiel. run_fn(text, on_chunk, cancel) -> (reply_text, raw_reply)."""
+
+    def __init__(self, text, run_fn):
+        self.text = text
+        self.norm = _norm_text(text)
+        self.started = time.time()
+        self.finished = None
+        self.confirmed_at = None
+        self.cancelled = False
+        self.cancel_token = CancelToken()
+        self._run_fn = run_fn
+        self._lock = threading.Lock()
+        self._sink = None
+        self._forwarded = False
+        self._buffer = []
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="SpeculativeLLM")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        try:
+            # Premier fragment, annotations...: rien n'est tracé tant que la réponse n'est pas confirmée
+            with TURN_TRACER.muted():
+                self._result = self._run_fn(self.text, self._on_chunk, self.cancel_token)
+        except Exception as e:
+            self._error = e
+        finally:
+            self.finished = time.time()
+            self._done.set()
+
+    def _on_chunk(self, event):
+        with self._lock:
+            if self.cancelled:
+                return
+            if self._sink is None:
+                self._buffer.append(event)
+                return
+            self._forward(event)
+
+    def _forward(self, event):
+        # Appelé sous self._lock, une fois la réponse confirmée et branchée sur le tour courant
+        if not self._forwarded:
+            self._forwarded = True
+            with TURN_TRACER.muted(False):
+                TURN_TRACER.mark('llm_first_token')
+        self._sink(event)
+
+    def attach(self, sink):
+        """Rejoue les fragments reçus puis transmet les suivants en direct (ordre préservé)."""
+        with self._lock:
+            buffered, self._buffer = self._buffer, []
+            self._sink = sink
+            if sink is not None:
+                for event in buffered:
+                    self._forward(event)
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise RuntimeError("Réponse spéculative non reçue à temps")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def cancel(self):
+        """Abandonne le résultat et annule la requête en cours (connexion fermée par le backend)."""
+        with self._lock:
+            self.cancelled = True
+            self._buffer = []
+        self.cancel_token.cancel()
+
+
+class SpeculativeDispatcher(object):
+    """
+    Orchestration par tour (boucle de chat mono-thread):
+    begin_turn(stt_fn, run_fn) -> poll(wav_fn) pendant l'enregistrement -> take(texte final)
+    -> collect(handle, on_chunk) si succès -> end_turn().
+    Config "speculation": enabled, partial_interval_ms, stable_ms, min_audio_ms, pause_ms.
+    Chaque transcription partielle est une requête STT de plus: à réserver à un moteur
+    local ou à un usage où la latence prime sur le coût.
+    """
+
+    def __init__(self, config=None, logger=None):
+        self.log = logger or (lambda msg, **kwargs: None)
+        self._lock = threading.Lock()
+        self.enabled = False
+        self.partial_interval = DEFAULT_PARTIAL_INTERVAL_MS / 1000.0
+        self.stable = DEFAULT_STABLE_MS / 1000.0
+        self.min_audio = DEFAULT_MIN_AUDIO_MS / 1000.0
+        self.pause = DEFAULT_PAUSE_MS / 1000.0
+        self._turn = 0
+        self._reset()
+        self.stats_data = {'partials': 0, 'dispatched': 0, 'hits': 0, 'misses': 0, 'cancelled': 0,
+                           'saved_seconds': 0.0}
+        self.configure(config)
+
+    def configure(self, config=None):
+        cfg = (config or {}).get('speculation', {}) or {}
+        self.enabled = bool(cfg.get('enabled', False))
+        self.partial_interval = float(cfg.get('partial_interval_ms') or DEFAULT_PARTIAL_INTERVAL_MS) / 1000.0
+        self.stable = float(cfg.get('stable_ms') or DEFAULT_STABLE_MS) / 1000.0
+        self.min_audio = float(cfg.get('min_audio_ms') or DEFAULT_MIN_AUDIO_MS) / 1000.0
+        self.pause = float(cfg.get('pause_ms') or DEFAULT_PAUSE_MS) / 1000.0
+
+    def _reset(self):
+        self._stt_fn = None
+        self._run_fn = None
+        self._started = 0.0
+        self._last_request = 0.0
+        self._in_flight = False
+        self._pause_served = False
+        self._partial_norm = None
+        self._partial_since = 0.0
+        self._current = None
+
+    # ---------- tour ----------
+    def begin_turn(self, stt_fn, run_fn):
+        with self._lock:
+            self._turn += 1
+            self._reset()
+            if not self.enabled:
+                return
+            self._stt_fn = stt_fn
+            self._run_fn = run_fn
+            self._started = time.time()
+
+    def end_turn(self):
+        with self._lock:
+            current = self._current
+            self._turn += 1
+            self._reset()
+        if current is not None:
+            current.cancel()
+
+    def poll(self, wav_fn, silence=0.0):
+        """
+        Appelé dans la boucle d'enregistrement: lance une transcription partielle si c'est le moment.
+        silence: secondes depuis la dernière trame de voix (début de pause = partiel immédiat).
+        """
+        now = time.time()
+        with self._lock:
+            if self._stt_fn is None or now - self._started < self.min_audio:
+                return
+            if silence < self.pause:
+                self._pause_served = False
+            pause = silence >= self.pause and not self._pause_served
+            if self._in_flight or (not pause and now - self._last_request < self.partial_interval):
+                return
+            self._in_flight = True
+            self._last_request = now
+            if pause:
+                self._pause_served = True
+            turn, stt_fn = self._turn, self._stt_fn
+        worker = threading.Thread(target=self._partial_worker, args=(turn, stt_fn, wav_fn, pause), name="PartialSTT")
+        worker.daemon = True
+        worker.start()
+
+    def _partial_worker(self, turn, stt_fn, wav_fn, pause=False):
+        text = None
+        try:
+            wav = wav_fn()
+            text = stt_fn(wav) if wav else None
+        except Exception as e:
+            self.log("[SPEC] Transcription partielle impossible: {}".format(e), level='debug')
+        finally:
+            with self._lock:
+                if turn == self._turn:
+                    self._in_flight = False
+        if text:
+            self.on_partial(text, turn=turn, pause=pause)
+
+    def on_partial(self, text, ts=None, turn=None, pause=False):
+        norm = _norm_text(text)
+        if not norm:
+            return
+        ts = ts or time.time()
+        stale = None
+        with self._lock:
+            if self._run_fn is None or (turn is not None and turn != self._turn):
+                return
+            self.stats_data['partials'] += 1
+            if norm != self._partial_norm:
+                self._partial_norm = norm
+                self._partial_since = ts
+                if self._current is not None and self._current.norm != norm:
+                    stale, self._current = self._current, None
+                    self.stats_data['cancelled'] += 1
+            if self._current is None and (pause or ts - self._partial_since >= self.stable):
+                self._current = SpeculativeReply(text, self._run_fn)
+                self.stats_data['dispatched'] += 1
+                self.log("[SPEC] Envoi anticipé au LLM: '{}'".format(text), level='debug')
+        if stale is not None:
+            stale.cancel()
+            SPECULATION_OUTCOMES.inc('cancelled')
+            self.log("[SPEC] Transcription partielle modifiée, spéculation abandonnée.", level='debug')
+
+    # ---------- résolution ----------
+    def take(self, final_text):
+        """Réponse spéculative si elle porte sur le texte final, sinon None (et abandon)."""
+        with self._lock:
+            current, self._current = self._current, None
+        if current is None:
+            return None
+        if current.norm == _norm_text(final_text) and not current.cancelled:
+            current.confirmed_at = time.time()
+            with self._lock:
+                self.stats_data['hits'] += 1
+            SPECULATION_OUTCOMES.inc('hit')
+            return current
+        current.cancel()
+        with self._lock:
+            self.stats_data['misses'] += 1
+        SPECULATION_OUTCOMES.inc('miss')
+        self.log("[SPEC] Transcription finale différente ('{}' / '{}'), nouvelle requête.".format(
+            current.text, final_text), level='debug')
+        return None
+
+    def collect(self, handle, on_chunk=None, timeout=None):
+        """Branche le flux sur on_chunk, attend la réponse et comptabilise le temps gagné."""
+        handle.attach(on_chunk)
+        result = handle.wait(timeout)
+        # Sans flux (ou réponse vide), le premier fragment est la réponse complète
+        TURN_TRACER.mark('llm_first_token')
+        # Sans spéculation, la requête serait partie à la confirmation et aurait duré autant.
+        duration = (handle.finished or time.time()) - handle.started
+        saved = max(0.0, min(handle.confirmed_at - handle.started, duration))
+        with self._lock:
+            self.stats_data['saved_seconds'] += saved
+        SPECULATION_SAVED_SECONDS.inc(amount=saved)
+        self.log("[SPEC] Réponse spéculative confirmée ({:.0f} ms gagnées)".format(1000 * saved), level='info')
+        return result
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.stats_data)
+        resolved = data['hits'] + data['misses']
+        data['hit_rate'] = round(data['hits'] / float(resolved), 3) if resolved else None
+        data['saved_seconds'] = round(data['saved_seconds'], 2)
+        data['enabled'] = self.enabled
+        return data
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+# classSpeechGate.py — rejet des clips non vocaux (toux, claquements, portes) AVANT la requête STT
+#
+# Pur Python (pas de numpy sur le robot): échantillons via array('h'), trames de 20 ms,
+# FFT radix-2 de 256 points sur au plus MAX_SPECTRAL_FRAMES trames énergétiques.
+# Coût typique: quelques ms pour un clip de 5 s, à comparer à un aller-retour STT.
+
+import io
+import os
+import sys
+import cmath
+import math
+import time
+import wave
+import threading
+from array import array
+
+from .classMetrics import SPEECH_GATE_CLIPS, SPEECH_GATE_SAVED_SECONDS
+
+FRAME_MS = 20
+FFT_SIZE = 256
+MAX_SPECTRAL_FRAMES = 16
+# Trame "énergétique": au-dessus de -20 dB de la trame la plus forte (invariant au gain AGC)
+RELATIVE_ENERGY = 0.1
+# Trame voisée: énergétique et taux de passages par zéro typique de la voix (par échantillon)
+VOICED_ZCR = (0.01, 0.25)
+# Bande utile pour la platitude spectrale (Hz)
+FLATNESS_BAND = (150.0, 4000.0)
+
+# Niveau d'agressivité -> (durée min s, ratio voisé min, platitude max, crête/moyenne max)
+LEVELS = {
+    1: (0.20, 0.08, 0.60, 40.0),
+    2: (0.30, 0.15, 0.50, 28.0),
+    3: (0.40, 0.25, 0.40, 20.0),
+}
+DEFAULT_LEVEL = 2
+DEFAULT_STT_ESTIMATE = 1.0
+
+
+def _fft_tables(n):
+    bits = n.bit_length() - 1
+    rev = [int('{:0{w}b}'.format(i, w=bits)[::-1], 2) for i in range(n)]
+    twiddles = [cmath.exp(-2j * math.pi * k / n) for k in range(n // 2)]
+    window = [0.5 - 0.5 * math.cos(2 * math.pi * i / (n - 1)) for i in range(n)]
+    return rev, twiddles, window
+
+
+_REV, _TWIDDLES, _WINDOW = _fft_tables(FFT_SIZE)
+# Octet de poids fort -> b'0' (positif) / b'1' (négatif): passages par zéro comptés en C via bytes.count
+_SIGN_TABLE = bytes(b'0'[0] if i < 128 else b'1'[0] for i in range(256))
+
+
+def _power_spectrum(frame):
+    """|FFT|² (moitié basse) d'une trame de FFT_SIZE échantillons, fenêtre de Hann."""
+    n = FFT_SIZE
+    data = [complex(frame[r] * _WINDOW[r]) for r in _REV]
+    size = 2
+    while size <= n:
+        half = size // 2
+        step = n // size
+        for start in range(0, n, size):
+            k = 0
+            for j in range(start, start + half):
+                t = _TWIDDLES[k] * data[j + half]
+                data[j + half] = data[j] - t
+                data[j] = data[j] + t
+                k += step
+        size *= 2
+    return [(c.real * c.real + c.imag * c.imag) for c in data[:n // 2]]
+
+
+def _flatness(power, lo, hi):
+    """Platitude spectrale (moyenne géométrique / arithmétique), 0 = tonal, 1 = bruit blanc."""
+    band = [p + 1e-9 for p in power[lo:hi]]
+    if not band:
+        return 0.0
+    mean = sum(band) / len(band)
+    geo = math.exp(sum(math.log(p) for p in band) / len(band))
+    return geo / mean
+
+
+def pcm_from_wav(wav_bytes):
+    """(octets PCM, fréquence) d'un WAV mono 16 bits en mémoire."""
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as wf:
+        sr = wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+    return raw, sr
+
+
+def analyze_pcm(raw, sr=16000):
+    """
+    Caractéristiques d'un clip PCM 16 bits LE mono:
+    duration (s), voiced_ratio, flatness (moyenne des trames énergétiques), crest (crête / moyenne |x|).
+    """
+    samples = array('h')
+    samples.frombytes(raw[:len(raw) - (len(raw) % 2)])
+    if sys.byteorder != 'little':
+        samples.byteswap()
+    total = len(samples)
+    features = {'duration': total / float(sr or 1), 'voiced_ratio': 0.0, 'flatness': 0.0, 'crest': 0.0}
+    flen = max(1, int(sr * FRAME_MS / 1000))
+    if total < flen:
+        return features
+
+    signs = raw[1:2 * total:2].translate(_SIGN_TABLE)
+    energies = []
+    zcrs = []
+    for start in range(0, total - flen + 1, flen):
+        energies.append(sum(map(abs, samples[start:start + flen])) / flen)
+        seg = signs[start:start + flen]
+        zcrs.append((seg.count(b'01') + seg.count(b'10')) / float(flen))
+
+    loudest = max(energies)
+    if loudest <= 0:
+        return features
+    floor = loudest * RELATIVE_ENERGY
+    energetic = [i for i, e in enumerate(energies) if e >= floor]
+    voiced = [i for i in energetic if VOICED_ZCR[0] <= zcrs[i] <= VOICED_ZCR[1]]
+    features['voiced_ratio'] = len(voiced) / float(len(energies))
+
+    mean_abs = sum(energies) / len(energies)
+    peak = max(max(samples), -min(samples))
+    features['crest'] = peak / mean_abs if mean_abs > 0 else 0.0
+
+    lo = max(1, int(FLATNESS_BAND[0] * FFT_SIZE / sr))
+    hi = min(FFT_SIZE // 2, int(FLATNESS_BAND[1] * FFT_SIZE / sr) + 1)
+    stride = max(1, len(energetic) // MAX_SPECTRAL_FRAMES)
+    values = []
+    for i in energetic[::stride][:MAX_SPECTRAL_FRAMES]:
+        start = i * flen
+        frame = samples[start:start + FFT_SIZE]
+        if len(frame) < FFT_SIZE:
+            continue
+        values.append(_flatness(_power_spectrum(frame), lo, hi))
+    if values:
+        features['flatness'] = sum(values) / len(values)
+    return features
+
+
+def classify(features, level=DEFAULT_LEVEL):
+    """Retourne la raison du rejet ('too_short', 'unvoiced', 'noise', 'impulse') ou None si parole plausible."""
+    min_duration, min_voiced, max_flatness, max_crest = LEVELS.get(level, LEVELS[DEFAULT_LEVEL])
+    if features['duration'] < min_duration:
+        return 'too_short'
+    if features['voiced_ratio'] < min_voiced:
+        return 'unvoiced'
+    if features['flatness'] > max_flatness:
+        return 'noise'
+    if features['crest'] > max_crest and features['voiced_ratio'] < 2 * min_voiced:
+        return 'impulse'
+    return None
+
+
+class SpeechGate(object):
+    """
+    Filtre pré-STT appelé par ChatManager sur le WAV de Listener.stop_recording().
+    Config audio:
+    - nonspeech_filter: 0 = désactivé (défaut), 1 = tolérant, 2 = normal, 3 = agressif
+    - nonspeech_filter_shadow: analyse et journalise sans rien rejeter (évaluation en ligne)
+    - nonspeech_dump_dir: copie chaque clip analysé (<ts>_<accept|reason>.wav) pour le rejouer
+      avec testScripts/eval_speech_gate.py (au plus nonspeech_dump_max fichiers par session)
+    Les secondes STT économisées sont estimées avec la durée moyenne des requêtes STT observées.
+    """
+
+    def __init__(self, config=None, logger=None):
+        self.log = logger or (lambda msg, **kwargs: None)
+        self._lock = threading.Lock()
+        self.level = 0
+        self.shadow = False
+        self.dump_dir = None
+        self.dump_max = 500
+        self._dumped = 0
+        self._stt_avg = None
+        self.stats_data = {'analyzed': 0, 'rejected': 0, 'saved_stt_seconds': 0.0, 'by_reason': {}}
+        self.configure(config)
+
+    def configure(self, config=None):
+        audio_cfg = (config or {}).get('audio', {}) or {}
+        try:
+            self.level = int(audio_cfg.get('nonspeech_filter', 0) or 0)
+        except (TypeError, ValueError):
+            self.level = 0
+        self.shadow = bool(audio_cfg.get('nonspeech_filter_shadow', False))
+        dump_dir = audio_cfg.get('nonspeech_dump_dir')
+        self.dump_dir = os.path.expanduser(dump_dir) if dump_dir else None
+        self.dump_max = int(audio_cfg.get('nonspeech_dump_max') or 500)
+
+    def note_stt(self, seconds):
+        """Durée d'une requête STT réelle (moyenne glissante pour estimer le temps économisé)."""
+        with self._lock:
+            self._stt_avg = seconds if self._stt_avg is None else 0.8 * self._stt_avg + 0.2 * seconds
+
+    def accept(self, wav_bytes):
+        """True si le clip doit partir au STT."""
+        if not self.level or not wav_bytes:
+            return True
+        try:
+            t0 = time.time()
+            raw, sr = pcm_from_wav(wav_bytes)
+            features = analyze_pcm(raw, sr)
+            reason = classify(features, self.level)
+            cost_ms = 1000.0 * (time.time() - t0)
+        except Exception as e:
+            self.log("[GATE] Analyse du clip impossible: {}".format(e), level='warning')
+            return True
+
+        self._dump(wav_bytes, reason)
+        summary = "durée {duration:.2f}s, voisé {voiced_ratio:.2f}, platitude {flatness:.2f}, crête {crest:.1f}".format(**features)
+        with self._lock:
+            self.stats_data['analyzed'] += 1
+            if reason and not self.shadow:
+                saved = self._stt_avg if self._stt_avg is not None else DEFAULT_STT_ESTIMATE
+                self.stats_data['rejected'] += 1
+                self.stats_data['saved_stt_seconds'] += saved
+                by_reason = self.stats_data['by_reason']
+                by_reason[reason] = by_reason.get(reason, 0) + 1
+
+        if reason is None:
+            SPEECH_GATE_CLIPS.inc('accepted')
+            self.log("[GATE] Clip accepté ({}, {:.1f} ms)".format(summary, cost_ms), level='debug')
+            return True
+        if self.shadow:
+            SPEECH_GATE_CLIPS.inc('shadow_' + reason)
+            self.log("[GATE] (ombre) Clip qui serait rejeté: {} ({})".format(reason, summary), level='info')
+            return True
+        SPEECH_GATE_CLIPS.inc(reason)
+        SPEECH_GATE_SAVED_SECONDS.inc(amount=saved)
+        self.log("[GATE] Clip non vocal rejeté avant STT: {} ({}, {:.1f} ms)".format(reason, summary, cost_ms), level='info')
+        return False
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.stats_data)
+            data['by_reason'] = dict(self.stats_data['by_reason'])
+        data['saved_stt_seconds'] = round(data['saved_stt_seconds'], 2)
+        data['level'] = self.level
+        data['shadow'] = self.shadow
+        return data
+
+    def _dump(self, wav_bytes, reason):
+        if not self.dump_dir or self._dumped >= self.dump_max:
+            return
+        try:
+            if not os.path.isdir(self.dump_dir):
+                os.makedirs(self.dump_dir)
+            name = "{}_{}.wav".format(time.strftime('%Y%m%d-%H%M%S'), reason or 'accept')
+            path = os.path.join(self.dump_dir, name)
+            suffix = 1
+            while os.path.exists(path):
+                path = os.path.join(self.dump_dir, "{}_{}_{}.wav".format(time.strftime('%Y%m%d-%H%M%S'), reason or 'accept', suffix))
+                suffix += 1
+            with open(path, 'wb') as f:
+                f.write(wav_bytes)
+            self._dumped += 1
+        except Exception as e:
+            self.log("[GATE] Copie du clip impossible: {}".format(e), level='debug')
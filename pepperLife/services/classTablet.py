@@ -155,9 +155,9 @@ class classTablet(object):
         if not self._ensure_tablet_service():
             return
         try:
-            self.tablet.executeJS("startPngPolling()")
+            self.tablet.executeJS("startCamStream()")
         except Exception as e:
-            self._log("[Tablet] Échec executeJS(startPngPolling): %s" % e)
+            self._log("[Tablet] Échec executeJS(startCamStream): %s" % e)
 
     def update_heartbeat(self, ts=None):
         """Mise à jour du heartbeat depuis la page web (WebServer).
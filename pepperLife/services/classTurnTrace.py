@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+# classTurnTrace.py — traces de latence par tour de parole (anneau mémoire + JSONL)
+#
+# Un tour = de la détection de la voix à la fin de la réponse du robot. Chaque étape est
+# horodatée (time.time(), même horloge que PepperLifeService sur le robot) par le module
+# qui la franchit: Listener, STT, chatGPT/ChatOllama, Speaker, ChatManager.
+# Le tour courant est unique (boucle de chat mono-thread): les modules appellent
+# TURN_TRACER.mark('stage') sans avoir à se passer la trace. Les requêtes lancées avant
+# confirmation (classSpeculation) tournent sous TURN_TRACER.muted(): leurs marques sont ignorées.
+
+import os
+import json
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from .classMetrics import TURNS, TURN_RESPONSE
+
+STAGES = (
+    'speech_onset',           # Listener: seuil d'énergie franchi, enregistrement lancé
+    'end_of_speech',          # Listener: silence détecté, fin d'enregistrement décidée
+    'wav_built',              # Listener: WAV (AGC + trim) prêt
+    'stt_sent',               # STT: requête envoyée
+    'transcript',             # STT: transcription reçue
+    'llm_first_token',        # chatGPT / ChatOllama: premier fragment de réponse
+    'first_sentence_queued',  # Speaker: première phrase envoyée au service
+    'tts_started',            # PepperLifeService: début de la parole
+    'tts_done',               # PepperLifeService: fin de la dernière phrase
+)
+
+DEFAULT_TRACE_PATH = os.path.expanduser('~/.cache/pepperlife/turns.jsonl')
+DEFAULT_RING_SIZE = 200
+MAX_TRACE_BYTES = 5 * 1024 * 1024
+
+
+def _percentile(sorted_values, pct):
+    """Percentile au rang le plus proche (liste déjà triée)."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(math.ceil(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class TurnTracer(object):
+    """
+    Enregistre les tours de parole: begin() -> mark()/annotate() -> finish().
+    Les tours terminés vont dans un anneau (recent(), percentiles()) et sont ajoutés
+    en JSONL (rotation simple en .1 au-delà de MAX_TRACE_BYTES).
+    """
+
+    def __init__(self, path=DEFAULT_TRACE_PATH, ring_size=DEFAULT_RING_SIZE, logger=None):
+        self.path = path
+        self.log = logger or (lambda *a, **k: None)
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._ring = deque(maxlen=ring_size)
+        self._current = None
+        self._seq = 0
+        self._local = threading.local()
+
+    def configure(self, config=None, logger=None):
+        metrics_cfg = (config or {}).get('metrics', {}) or {}
+        if logger:
+            self.log = logger
+        self.enabled = bool(metrics_cfg.get('turn_traces', True))
+        self.path = metrics_cfg.get('turn_trace_path') or DEFAULT_TRACE_PATH
+        ring_size = int(metrics_cfg.get('turn_ring_size') or DEFAULT_RING_SIZE)
+        with self._lock:
+            if ring_size != self._ring.maxlen:
+                self._ring = deque(self._ring, maxlen=ring_size)
+
+    # ---------- tour courant ----------
+    def begin(self, ts=None, **info):
+        """Ouvre un nouveau tour (un tour non terminé est abandonné)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._seq += 1
+            trace = {'id': self._seq, 'start': ts or time.time(), 'marks': {}, 'info': dict(info)}
+            self._current = trace
+        self.mark('speech_onset', trace['start'])
+        return trace
+
+    @contextmanager
+    def muted(self, active=True):
+        """Ignore (active=True) ou rétablit (active=False) les mark()/annotate() du thread courant pendant le bloc."""
+        previous = self.is_muted()
+        self._local.muted = bool(active)
+        try:
+            yield
+        finally:
+            self._local.muted = previous
+
+    def is_muted(self):
+        return getattr(self._local, 'muted', False)
+
+    def mark(self, stage, ts=None, overwrite=False):
+        """Horodate une étape du tour courant (première occurrence sauf overwrite)."""
+        if self.is_muted():
+            return
+        with self._lock:
+            trace = self._current
+            if trace is None:
+                return
+            if overwrite or stage not in trace['marks']:
+                trace['marks'][stage] = ts or time.time()
+
+    def stage_time(self, stage):
+        """Horodatage d'une étape du tour courant, ou None."""
+        with self._lock:
+            return self._current['marks'].get(stage) if self._current is not None else None
+
+    def annotate(self, **info):
+        if self.is_muted():
+            return
+        with self._lock:
+            if self._current is not None:
+                self._current['info'].update(info)
+
+    def finish(self, outcome='ok'):
+        """Clôt le tour courant: anneau mémoire + ligne JSONL. Retourne le résumé."""
+        with self._lock:
+            trace, self._current = self._current, None
+        if trace is None:
+            return None
+        summary = self._summarize(trace, outcome)
+        TURNS.inc(outcome)
+        if 'response' in summary['stages_ms']:
+            TURN_RESPONSE.observe(summary['stages_ms']['response'] / 1000.0)
+        with self._lock:
+            self._ring.append(summary)
+        self._append_jsonl(summary)
+        return summary
+
+    # ---------- restitution ----------
+    @staticmethod
+    def _summarize(trace, outcome):
+        marks = trace['marks']
+        origin = marks.get('speech_onset', trace['start'])
+        offsets = {}
+        gaps = {}
+        previous = None
+        for stage in STAGES:
+            if stage not in marks:
+                continue
+            offsets[stage] = round(1000.0 * (marks[stage] - origin), 1)
+            if previous is not None:
+                gaps[stage] = round(1000.0 * (marks[stage] - marks[previous]), 1)
+            previous = stage
+        if 'end_of_speech' in marks and 'tts_started' in marks:
+            gaps['response'] = round(1000.0 * (marks['tts_started'] - marks['end_of_speech']), 1)
+        return {
+            'id': trace['id'],
+            'ts': round(origin, 3),
+            'outcome': outcome,
+            'offsets_ms': offsets,
+            'stages_ms': gaps,
+            'info': trace['info'],
+        }
+
+    def _append_jsonl(self, summary):
+        if not self.path:
+            return
+        try:
+            trace_dir = os.path.dirname(self.path)
+            if trace_dir and not os.path.isdir(trace_dir):
+                os.makedirs(trace_dir)
+            if os.path.exists(self.path) and os.path.getsize(self.path) > MAX_TRACE_BYTES:
+                os.replace(self.path, self.path + '.1')
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(summary, ensure_ascii=False) + '\n')
+        except Exception as e:
+            self.log("[TRACE] Écriture de {} impossible: {}".format(self.path, e), level='warning')
+
+    def recent(self, n=50):
+        with self._lock:
+            items = list(self._ring)
+        return items[-n:] if n else items
+
+    def percentiles(self, outcome='ok'):
+        """p50/p90/p99 (ms) par étape (écart avec l'étape précédente) + 'response' (fin de parole -> TTS)."""
+        with self._lock:
+            items = [t for t in self._ring if outcome is None or t['outcome'] == outcome]
+        keys = list(STAGES[1:]) + ['response']
+        result = {}
+        for key in keys:
+            values = sorted(t['stages_ms'][key] for t in items if key in t['stages_ms'])
+            if not values:
+                continue
+            result[key] = {
+                'count': len(values),
+                'p50': _percentile(values, 50),
+                'p90': _percentile(values, 90),
+                'p99': _percentile(values, 99),
+            }
+        return result
+
+
+# Instance partagée par les modules du processus pepperLife
+TURN_TRACER = TurnTracer()
@@ -2,13 +2,27 @@
 # classVision.py - Vision chat logic using OpenAI and camera management
 
 import base64
-import io
 import time
-import png
 from openai import OpenAI
 import threading
 import os
 
+from .classCameraBus import CameraBus
+from .classImageCodec import (DEFAULT_JPEG_QUALITY, DEFAULT_PNG_FILTER, DEFAULT_PNG_LEVEL, crop_rgb, downscale_rgb,
+                              encode_image, image_mime)
+from .classMetrics import VISION_PAYLOAD_BYTES
+from .classTurnTrace import TURN_TRACER
+
+# Profils de requête vision_chat (surchargés par vision.profiles); 'full' = ancien comportement
+DEFAULT_PROFILES = {
+    'low': {'max_width': 512, 'format': 'jpeg', 'jpeg_quality': 70, 'detail': 'low', 'crop': 'none'},
+    'high': {'max_width': 1024, 'format': 'jpeg', 'jpeg_quality': 85, 'detail': 'high', 'crop': 'none'},
+    'full': {'max_width': None, 'format': 'png', 'detail': 'auto', 'crop': 'none'},
+}
+# Champ de vision approximatif des caméras 2D de Pepper (radians), pour situer un visage détecté
+CAMERA_HFOV = 0.9983
+CAMERA_VFOV = 0.7732
+
 class Vision(object):
     def __init__(self, config, session, logger):
         self.config = config
@@ -18,16 +32,12 @@ class Vision(object):
         self.res = 2   # 1=QVGA, 2=VGA
         self.color = 11  # kRGBColorSpace
         self.fps = 5
-        self.cam = None
-        self.sub = None
+        # Acquisition unique partagée (flux web, vision_chat, photo): baux nommés, dernière image en mémoire
+        self.bus = CameraBus(session, logger, fps=self.fps, color=self.color)
         self.is_streaming = False
         self.streaming_thread = None
-        self._current_camera_index = 0
-        self.camera_users = 0
-        self.lock = threading.Lock()
-        self.ui_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "html")
-        self.cam_png_path = os.path.join(self.ui_dir, "cam.png")
         self._stream_lock = threading.Lock()
+        self._stream_consumers = 0
         vision_cfg = (self.config.get('vision') or {})
         try:
             idle_value = float(vision_cfg.get('stream_idle_timeout', 15.0))
@@ -36,6 +46,19 @@ class Vision(object):
         self.stream_idle_timeout = idle_value if idle_value and idle_value > 0 else None
         self._last_consumer_ts = 0.0
 
+    def _codec_settings(self):
+        vision_cfg = (self.config.get('vision') or {})
+        try:
+            level = int(vision_cfg.get('png_compression', DEFAULT_PNG_LEVEL))
+        except (TypeError, ValueError):
+            level = DEFAULT_PNG_LEVEL
+        try:
+            quality = int(vision_cfg.get('jpeg_quality', DEFAULT_JPEG_QUALITY))
+        except (TypeError, ValueError):
+            quality = DEFAULT_JPEG_QUALITY
+        png_filter = vision_cfg.get('png_filter') or DEFAULT_PNG_FILTER
+        return min(9, max(0, level)), min(95, max(10, quality)), png_filter
+
     def _normalize_camera_index(self, camera_index):
         """Pepper 2.9 exige un Int32 strict : convertir les entrées texte ou booléennes."""
         if isinstance(camera_index, str):
@@ -55,33 +78,22 @@ class Vision(object):
 
     @property
     def current_camera_index(self):
-        return self._current_camera_index
+        return self.bus.camera_index
 
     @current_camera_index.setter
     def current_camera_index(self, value):
-        self._current_camera_index = self._normalize_camera_index(value)
+        self.bus.camera_index = self._normalize_camera_index(value)
 
     def _stream_loop(self):
+        # Les images sont acquises par le bus caméra; cette boucle garde le bail 'stream' et surveille l'inactivité
         try:
             while True:
                 if not self.is_streaming:
                     break
-                try:
-                    png_data = self.get_png()
-                    if png_data:
-                        try:
-                            temp_path = self.cam_png_path + ".tmp"
-                            with open(temp_path, "wb") as f:
-                                f.write(png_data)
-                            os.rename(temp_path, self.cam_png_path)
-                        except Exception as e:
-                            self.log("[Vision] Error writing cam.png: %s" % e)
-                except Exception as e:
-                    self.log("[Vision] Unhandled error in stream loop: %s" % e, level='error')
-                    time.sleep(1)
-                    continue
-
-                if self.stream_idle_timeout:
+
+                if self._stream_consumers > 0:
+                    self._last_consumer_ts = time.time()
+                elif self.stream_idle_timeout:
                     idle = time.time() - self._last_consumer_ts
                     if idle > self.stream_idle_timeout:
                         self.log("[Vision] No viewer detected for %.1fs, auto-stopping stream." % idle, level='info')
@@ -92,7 +104,7 @@ class Vision(object):
             with self._stream_lock:
                 self.is_streaming = False
                 self.streaming_thread = None
-            self.stop_camera()
+            self.stop_camera('stream')
             self.log("[Vision] Streaming loop terminated.")
 
     def start_streaming(self):
@@ -100,7 +112,7 @@ class Vision(object):
             if self.is_streaming:
                 self._last_consumer_ts = time.time()
                 return True
-            if not self.start_camera():
+            if not self.start_camera('stream'):
                 self.log("[Vision] Cannot start streaming, camera subscription failed.")
                 return False
             self.is_streaming = True
@@ -108,7 +120,7 @@ class Vision(object):
             self.streaming_thread = threading.Thread(target=self._stream_loop)
             self.streaming_thread.daemon = True
             self.streaming_thread.start()
-            self.log("[Vision] Started streaming to cam.png")
+            self.log("[Vision] Started camera stream")
         return True
 
     def stop_streaming(self):
@@ -122,7 +134,7 @@ class Vision(object):
             thread.join()
         with self._stream_lock:
             self.streaming_thread = None
-        self.log("[Vision] Stopped streaming to cam.png")
+        self.log("[Vision] Stopped camera stream")
         return True
 
     def touch_stream_consumer(self, auto_start=False):
@@ -135,50 +147,37 @@ class Vision(object):
                 return False
         return True
 
-    def switch_camera(self, camera_index):
-        with self.lock:
-            camera_index = self._normalize_camera_index(camera_index)
-            was_streaming = self.is_streaming
-            
-            # Temporarily stop the stream to release the camera handle
-            if was_streaming:
-                self.is_streaming = False
-                if self.streaming_thread:
-                    self.streaming_thread.join()
-                self.log("[Vision] Paused streaming for camera switch")
-
-            # Unsubscribe from the current camera if it's active
-            if self.sub:
-                try:
-                    self.cam.unsubscribe(self.sub)
-                    self.log(f"[Cam] Unsubscribed from camera {self.current_camera_index}")
-                    self.sub = None
-                except Exception as e:
-                    self.log(f"[Cam] Error unsubscribing during switch: {e}", level='warning')
-
-            # Update index and resubscribe
-            self.current_camera_index = camera_index
-            try:
-                self.cam = self.sess.service("ALVideoDevice")
-                name = "PepperLifeCam_%d" % int(time.time())
-                self.sub = self.cam.subscribeCamera(name, self.current_camera_index, self.res, self.color, self.fps)
-                self.log(f"[Cam] Resubscribed to camera {self.current_camera_index}")
-            except Exception as e:
-                self.log(u"[Cam] Échec de la souscription à la caméra {}: {}".format(self.current_camera_index, e), level='error')
-                self.sub = None
-                return False
+    def add_stream_consumer(self, auto_start=True):
+        """Un client du flux continu (MJPEG) se connecte: tant qu'il y en a, pas d'arrêt automatique."""
+        with self._stream_lock:
+            self._stream_consumers += 1
+        return self.touch_stream_consumer(auto_start=auto_start)
 
-            # Restart the stream if it was running before
-            if was_streaming:
-                with self._stream_lock:
-                    self.is_streaming = True
-                    self._last_consumer_ts = time.time()
-                    self.streaming_thread = threading.Thread(target=self._stream_loop)
-                    self.streaming_thread.daemon = True
-                    self.streaming_thread.start()
-                self.log("[Vision] Resumed streaming after camera switch")
+    def remove_stream_consumer(self):
+        with self._stream_lock:
+            self._stream_consumers = max(0, self._stream_consumers - 1)
+        # Le délai d'inactivité repart de la déconnexion du dernier client
+        self._last_consumer_ts = time.time()
 
-        return True
+    def wait_stream_frame(self, after_seq=0, timeout=1.0):
+        """
+        Image du flux plus récente que after_seq: (seq, octets, mime) au format vision.stream_format.
+        Attend la suivante au plus `timeout` secondes; None si aucune (flux arrêté ou caméra lente).
+        Un client lent saute des images au lieu d'accumuler du retard; l'encodage est partagé entre clients.
+        """
+        frame = self.bus.wait_next(after_seq, timeout)
+        if frame is None:
+            return None
+        data, mime = self.encode_frame(frame, (self.config.get('vision') or {}).get('stream_format') or 'jpeg')
+        return frame.seq, data, mime
+
+    def switch_camera(self, camera_index):
+        """Le bus caméra se réabonne à la nouvelle caméra sans interrompre le flux ni le chat."""
+        camera_index = self._normalize_camera_index(camera_index)
+        ok = self.bus.switch_camera(camera_index)
+        self.log("[Cam] Caméra %d %s" % (camera_index, "active" if ok else "sans image après changement"),
+                 level='info' if ok else 'warning')
+        return ok
 
     def client(self):
         if self._client is None:
@@ -202,88 +201,144 @@ class Vision(object):
             self._client = OpenAI(**client_kwargs)
         return self._client
 
-    def start_camera(self):
-        with self.lock:
-            self.camera_users += 1
-            self.log(f"[Cam] User added. Total users: {self.camera_users}")
-            if self.camera_users == 1:
-                cam_index = self.current_camera_index
-                self.log(f"[Cam] First user, subscribing to camera index {cam_index}.")
-                try:
-                    self.cam = self.sess.service("ALVideoDevice")
-                    name = "PepperLifeCam_%d" % int(time.time())
-                    self.sub = self.cam.subscribeCamera(name, cam_index, self.res, self.color, self.fps)
-                    self.log("[Cam] ALVideoDevice subscribed: %s" % self.sub)
-                    return True
-                except Exception as e:
-                    self.log(f"[Cam] Abonnement caméra impossible: {e}", level='error')
-                    self.sub = None
-                    self.camera_users = 0 # Revert on failure
-                    return False
-        return True
+    def start_camera(self, purpose='stream'):
+        """
+        Prend le bail caméra `purpose` ('chat', 'stream'). purpose='chat': résolution
+        vision.chat_camera_resolution (ex. 1 = QVGA); la souscription suit la plus haute résolution
+        des baux actifs (un flux web repasse en VGA, et revient en QVGA à son arrêt).
+        """
+        res = self.res
+        if purpose == 'chat':
+            try:
+                res = int((self.config.get('vision') or {}).get('chat_camera_resolution') or self.res)
+            except (TypeError, ValueError):
+                res = self.res
+        return self.bus.acquire(purpose, res)
 
-    def stop_camera(self):
-        with self.lock:
-            if self.camera_users > 0:
-                self.camera_users -= 1
-            self.log(f"[Cam] User removed. Total users: {self.camera_users}")
-            if self.camera_users == 0 and self.sub:
-                self.log("[Cam] Last user, unsubscribing from camera.")
-                try:
-                    self.cam.unsubscribe(self.sub)
-                    self.log("[Cam] Unsubscribed")
-                except Exception as e:
-                    self.log(f"[Cam] Error during unsubscribe: {e}", level='warning')
-                self.sub = None
-        return True
+    def stop_camera(self, purpose=None):
+        """Rend le bail `purpose` (tous si None, ex. à la sortie du programme)."""
+        return self.bus.release(purpose)
+
+    def get_frame(self, timeout=1.0):
+        """Dernière image du bus caméra (CameraFrame), en attendant la première au besoin; None sans bail actif."""
+        frame = self.bus.latest()
+        if frame is None and self.bus.active:
+            frame = self.bus.wait_next(0, timeout)
+        return frame
 
     def get_frame_rgb(self):
-        # No lock here, as getImageRemote should be thread-safe
-        # and locking here can cause deadlocks if switch_camera holds the lock for too long.
-        if not self.cam or not self.sub:
-            return (None, None, None)
-        frame_acquired = False
-        try:
-            f = self.cam.getImageRemote(self.sub)
-            frame_acquired = True
-            w, h = int(f[0]), int(f[1])
-            buf = bytes(f[6]) if f[6] is not None else None
-            return (w, h, buf)
-        except Exception as e:
-            # This error can be spammy if the camera is switching, so log at debug level
-            self.log("[Cam] get_frame_rgb error: %s" % e, level='debug')
-            return (None, None, None)
-        finally:
-            if frame_acquired:
-                try:
-                    self.cam.releaseImage(self.sub)
-                except Exception as release_err:
-                    self.log("[Cam] releaseImage error: %s" % release_err, level='debug')
+        frame = self.get_frame()
+        return frame.as_tuple() if frame is not None else (None, None, None)
+
+    def encode_frame(self, frame, fmt='png'):
+        """(octets, type MIME) de `frame` en PNG ou JPEG, encodé une seule fois par image et par réglages."""
+        level, quality, png_filter = self._codec_settings()
+        return frame.encoded((fmt, level, quality, png_filter), lambda: encode_image(
+            frame.width, frame.height, frame.rgb, fmt, png_level=level, jpeg_quality=quality, png_filter=png_filter))
 
-    def get_png(self):
+    def get_png(self, frame=None):
         """
-        Retourne un PNG (bytes) encodé en pur Python via PyPNG à partir d'un buffer RGB.
+        Retourne un PNG (bytes) encodé directement avec zlib (classImageCodec) à partir du buffer RGB
+        (image courante, ou `frame` déjà lue avec get_frame).
+        Niveau de compression: vision.png_compression (1 par défaut), filtre: vision.png_filter ('up' par défaut).
         """
-        w, h, rgb_bytes = self.get_frame_rgb()
-        if not w:
+        frame = frame or self.get_frame()
+        if frame is None:
             return None
-        out = io.BytesIO()
-        wr = png.Writer(width=w, height=h, greyscale=False, alpha=False, compression=5)
-        # Convertit le buffer plat en une liste de lignes
-        row_len = w * 3
-        rows = [rgb_bytes[i:i+row_len] for i in range(0, len(rgb_bytes), row_len)]
-        wr.write(out, rows)
-        return out.getvalue()
-
-    def vision_chat(self, user_text, image_bytes, hist):
+        return self.encode_frame(frame, 'png')[0]
+
+    def get_image(self, fmt='png'):
+        """
+        Retourne (octets, type MIME) de l'image courante: fmt 'png' ou 'jpeg' (Pillow, sinon repli PNG).
+        """
+        frame = self.get_frame()
+        if frame is None:
+            return None, None
+        return self.encode_frame(frame, fmt)
+
+    # ---------- profil de requête vision ----------
+    def request_profile(self):
+        """Retourne (nom, réglages) du profil vision.profile ('full' par défaut), complété par vision.profiles."""
+        vision_cfg = (self.config.get('vision') or {})
+        name = vision_cfg.get('profile') or 'full'
+        profile = dict(DEFAULT_PROFILES.get(name) or DEFAULT_PROFILES['full'])
+        profile.update((vision_cfg.get('profiles') or {}).get(name) or {})
+        return name, profile
+
+    def _face_box(self, w, h):
+        """Zone autour du dernier visage détecté (ALMemory FaceDetected, même caméra, < 2 s), sinon None."""
+        try:
+            data = self.sess.service("ALMemory").getData("FaceDetected")
+            if not data or len(data) < 2 or not data[1]:
+                return None
+            stamp = data[0][0] + data[0][1] / 1e6
+            if time.time() - stamp > 2.0 or (len(data) > 4 and int(data[4]) != self.current_camera_index):
+                return None
+            # FaceInfo[0] = ShapeInfo [0, alpha, beta, sizeX, sizeY] en radians (caméra)
+            _, alpha, beta, size_x, size_y = data[1][0][0][:5]
+        except Exception:
+            return None
+        cx = w / 2.0 - alpha / CAMERA_HFOV * w
+        cy = h / 2.0 + beta / CAMERA_VFOV * h
+        # Visage + buste: 3 fois la taille du visage
+        half_w = max(size_x / CAMERA_HFOV * w * 1.5, w * 0.15)
+        half_h = max(size_y / CAMERA_VFOV * h * 1.5, h * 0.15)
+        return (cx - half_w, cy - half_h, cx + half_w, cy + half_h)
+
+    def prepare_request_image(self, frame):
+        """
+        Image à envoyer au modèle selon le profil: recadrage (centre/visage), réduction à max_width,
+        JPEG ou PNG. Retourne (octets, type MIME, infos pour le journal). Mise en cache sur l'image.
+        """
+        name, profile = self.request_profile()
+        key = ('request', name, repr(sorted(profile.items())), self._codec_settings())
+        data, mime, info = frame.encoded(key, lambda: self._build_request_image(frame, name, profile))
+        return data, mime, dict(info)
+
+    def _build_request_image(self, frame, name, profile):
+        t0 = time.time()
+        w, h, rgb = frame.as_tuple()
+        info = {'profile': name, 'source': "{}x{}".format(w, h)}
+        crop = (profile.get('crop') or 'none').lower()
+        if crop in ('center', 'centre', 'face'):
+            box = self._face_box(w, h) if crop == 'face' else None
+            info['crop'] = 'face' if box else 'center'
+            if box is None:
+                ratio = float(profile.get('crop_ratio') or 0.6)
+                box = (w * (1 - ratio) / 2, h * (1 - ratio) / 2, w * (1 + ratio) / 2, h * (1 + ratio) / 2)
+            w, h, rgb = crop_rgb(w, h, rgb, box)
+        w, h, rgb = downscale_rgb(w, h, rgb, profile.get('max_width'))
+        level, quality, png_filter = self._codec_settings()
+        quality = profile.get('jpeg_quality') or quality
+        data, mime = encode_image(w, h, rgb, profile.get('format') or 'png', png_level=level,
+                                  jpeg_quality=quality, png_filter=png_filter)
+        info.update({'sent': "{}x{}".format(w, h), 'mime': mime, 'bytes': len(data),
+                     'encode_ms': round(1000.0 * (time.time() - t0), 1), 'detail': profile.get('detail') or 'auto'})
+        return data, mime, info
+
+    def vision_chat(self, user_text, image_bytes, hist, frame=None):
         """
         Chat vision unifié :
         - Prompt système configurable via CONFIG['vision']['system_prompt']
         - Modèle configurable via CONFIG['vision']['model']
         - Historique vision optionnel (passé via hist)
         - Le texte utilisateur est passé tel quel, le modèle décide quoi faire (décrire, compter, etc.)
+        - Avec `frame` (CameraFrame de get_frame), l'image envoyée suit le profil vision.profile (taille, JPEG, détail,
+          recadrage); sinon image_bytes est envoyé tel quel.
         """
+        info = {'profile': None, 'detail': 'auto'}
+        if frame is not None:
+            try:
+                image_bytes, mime, info = self.prepare_request_image(frame)
+            except Exception as e:
+                self.log("[Vision] Préparation de l'image impossible, envoi de l'image complète: %s" % e, level='warning')
+                mime = image_mime(image_bytes)
+        else:
+            mime = image_mime(image_bytes)
         image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+        image_url = {"url": f"data:{mime};base64,{image_base64}"}
+        if info.get('detail') in ('low', 'high'):
+            image_url["detail"] = info['detail']
 
         msgs = [{"role": "system", "content": self.config['vision']['system_prompt'] }]
 
@@ -297,11 +352,12 @@ class Vision(object):
                 {"type": "text", "text": user_text},
                 {
                     "type": "image_url",
-                    "image_url": { "url": f"data:image/png;base64,{image_base64}" }
+                    "image_url": image_url
                 }
             ]
         })
 
+        t0 = time.time()
         try:
             resp = self.client().chat.completions.create(
                 model=self.config['vision'].get('model', 'gpt-4o-mini'),
@@ -309,10 +365,21 @@ class Vision(object):
                 temperature=0.2,
                 max_tokens=120
             )
-            return resp.choices[0].message.content.replace("\n"," ").strip()
+            reply = resp.choices[0].message.content.replace("\n"," ").strip()
         except Exception as e:
             self.log(f"[Vision] OpenAI API error: {e}", level='error')
+            TURN_TRACER.annotate(vision=dict(info, error=str(e)))
             return "Désolé, je n'ai pas pu analyser l'image."
+        info.update({'payload_bytes': len(image_base64), 'request_ms': round(1000.0 * (time.time() - t0), 1)})
+        VISION_PAYLOAD_BYTES.observe(len(image_base64), info.get('profile') or 'image')
+        usage = getattr(resp, 'usage', None)
+        if usage is not None:
+            info['prompt_tokens'] = getattr(usage, 'prompt_tokens', None)
+        TURN_TRACER.annotate(vision=info)
+        self.log("[Vision] Profil {}: {} -> {} {} ({} octets en base64, détail {}), encodage {} ms, requête {} ms, {} tokens d'entrée".format(
+            info.get('profile') or 'image fournie', info.get('source', '?'), info.get('sent', '?'), mime, info['payload_bytes'],
+            info.get('detail'), info.get('encode_ms', 0), info['request_ms'], info.get('prompt_tokens')), level='info')
+        return reply
 
     def _utterance_triggers_vision(self, txt_lower):
         """Retourne True si l'énoncé déclenche une analyse vision.
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+# classWakeWord.py — détection locale du mot d'éveil ("Pepper") par MFCC + DTW, CPU seul
+#
+# Mode "écoute filtrée": tant que le mot d'éveil n'est pas reconnu, aucun enregistrement ne part
+# au STT. Une détection ouvre une fenêtre de conversation de N secondes, prolongée à chaque tour.
+#
+# Coût maîtrisé pour l'Atom du robot:
+# - audio décimé à 8 kHz, trames de 32 ms (FFT 256 de classSpeechGate) toutes les 20 ms;
+# - les MFCC ne sont calculés qu'après un début d'énergie (onset), jamais sur le silence;
+# - un seul alignement DTW par onset, contre quelques gabarits enregistrés.
+
+import os
+import io
+import math
+import time
+import wave
+import threading
+from array import array
+from collections import deque
+
+from .classSpeechGate import _power_spectrum, FFT_SIZE
+from .classMetrics import WAKEWORD_CANDIDATES, WAKEWORD_DETECTIONS
+
+SAMPLE_RATE = 8000          # après décimation 16 kHz -> 8 kHz
+HOP = 160                   # 20 ms
+N_MELS = 20
+N_MFCC = 12                 # c1..c12 (c0 = énergie, écarté)
+MEL_RANGE = (100.0, 3800.0)
+PRE_EMPHASIS = 0.97
+ONSET_RATIO = 3.0           # énergie de trame > ONSET_RATIO x bruit de fond
+ONSET_MIN_ENERGY = 120
+END_SILENCE_FRAMES = 15     # 300 ms de silence terminent un segment
+PRE_FRAMES = 3              # trames gardées avant l'onset
+# Score = distance DTW moyenne par pas (MFCC log + normalisation par la moyenne: indépendant du gain).
+# Banc synthétique (testScripts/bench_wakeword.py): 18-19,5 pour le mot, 21 et plus pour les intrus.
+DEFAULT_THRESHOLD = 20.0
+DEFAULT_WINDOW = 20.0
+DEFAULT_TEMPLATES_DIR = os.path.expanduser('~/.cache/pepperlife/wakeword')
+
+
+def _mel(f):
+    return 2595.0 * math.log10(1.0 + f / 700.0)
+
+
+def _mel_inv(m):
+    return 700.0 * (10 ** (m / 2595.0) - 1.0)
+
+
+def _mel_filterbank():
+    """Filtres triangulaires creux: [(premier bin, [poids...]), ...]."""
+    n_bins = FFT_SIZE // 2
+    lo, hi = _mel(MEL_RANGE[0]), _mel(MEL_RANGE[1])
+    points = [_mel_inv(lo + (hi - lo) * i / (N_MELS + 1)) for i in range(N_MELS + 2)]
+    bins = [min(n_bins - 1, int(round(p * FFT_SIZE / SAMPLE_RATE))) for p in points]
+    filters = []
+    for m in range(1, N_MELS + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        weights = []
+        for k in range(left, right + 1):
+            if k <= center:
+                w = (k - left) / float(max(1, center - left))
+            else:
+                w = (right - k) / float(max(1, right - center))
+            weights.append(w)
+        filters.append((left, weights))
+    return filters
+
+
+_FILTERS = _mel_filterbank()
+_DCT = [[math.cos(math.pi * k * (m + 0.5) / N_MELS) for m in range(N_MELS)] for k in range(1, N_MFCC + 1)]
+
+
+def decimate(raw16k):
+    """PCM 16 bits LE 16 kHz -> liste d'échantillons 8 kHz (moyenne de paires = passe-bas sommaire)."""
+    samples = array('h')
+    samples.frombytes(raw16k[:len(raw16k) - (len(raw16k) % 4)])
+    return [(a + b) * 0.5 for a, b in zip(samples[0::2], samples[1::2])]
+
+
+def mfcc_frame(frame):
+    """MFCC (c1..c12) d'une trame de FFT_SIZE échantillons 8 kHz."""
+    emphasized = [frame[0]] + [frame[i] - PRE_EMPHASIS * frame[i - 1] for i in range(1, len(frame))]
+    power = _power_spectrum(emphasized)
+    logmel = []
+    for start, weights in _FILTERS:
+        energy = 0.0
+        for w, p in zip(weights, power[start:start + len(weights)]):
+            energy += w * p
+        logmel.append(math.log(energy + 1e-6))
+    return [sum(c * v for c, v in zip(row, logmel)) for row in _DCT]
+
+
+def _normalize(seq):
+    """Normalisation cepstrale par la moyenne (indépendance au micro / à la salle)."""
+    if not seq:
+        return seq
+    n = float(len(seq))
+    means = [sum(col) / n for col in zip(*seq)]
+    return [[v - mu for v, mu in zip(vec, means)] for vec in seq]
+
+
+def mfcc_sequence(samples8k):
+    frames = [samples8k[i:i + FFT_SIZE] for i in range(0, len(samples8k) - FFT_SIZE + 1, HOP)]
+    return _normalize([mfcc_frame(f) for f in frames])
+
+
+def dtw_open_end(template, seq):
+    """
+    DTW gabarit complet / début de séquence (fin libre): distance moyenne par pas du meilleur
+    alignement de tout le gabarit sur seq[0:j], j entre 0,6 et 1,5 fois la longueur du gabarit.
+    """
+    t_len, s_len = len(template), len(seq)
+    if not t_len or s_len < int(0.6 * t_len):
+        return float('inf')
+    j_max = min(s_len, int(1.5 * t_len) + 1)
+    inf = float('inf')
+    prev = [inf] * (j_max + 1)
+    prev[0] = 0.0
+    for i in range(1, t_len + 1):
+        tv = template[i - 1]
+        cur = [inf] * (j_max + 1)
+        for j in range(1, j_max + 1):
+            sv = seq[j - 1]
+            d = math.sqrt(sum((a - b) * (a - b) for a, b in zip(tv, sv)))
+            best = prev[j - 1]
+            if prev[j] < best:
+                best = prev[j]
+            if cur[j - 1] < best:
+                best = cur[j - 1]
+            cur[j] = d + best
+        prev = cur
+    j_min = max(1, int(0.6 * t_len))
+    return min(prev[j] / (t_len + j) for j in range(j_min, j_max + 1))
+
+
+class WakeWordSpotter(object):
+    """
+    Détecteur du mot d'éveil alimenté par Listener.processRemote (feed) et traité dans son thread.
+    - Gabarits: WAV 16 kHz mono (le mot seul, 3 à 5 prises) dans wakeword.templates_dir, ou enroll().
+    - Score = meilleure distance DTW moyenne parmi les gabarits; détection si score <= wakeword.threshold
+      (stats()['last_score'] aide à régler le seuil sur place).
+    - is_open(): fenêtre de conversation en cours; keep_open() la prolonge (tour de dialogue abouti).
+    Sans gabarit, le filtre reste ouvert (comportement d'écoute continue habituel).
+    """
+
+    def __init__(self, config=None, logger=None, on_wake=None):
+        self.log = logger or (lambda msg, **kwargs: None)
+        self.on_wake = on_wake
+        self.enabled = False
+        self.phrase = "Pepper"
+        self.threshold = DEFAULT_THRESHOLD
+        self.window = DEFAULT_WINDOW
+        self.templates_dir = DEFAULT_TEMPLATES_DIR
+        self.templates = []
+        self._max_frames = 0
+        self._lock = threading.Lock()
+        self._chunks = deque(maxlen=200)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._open_until = 0.0
+        self._reset_stream()
+        self.stats_data = {'detections': 0, 'candidates': 0, 'cpu_seconds': 0.0, 'audio_seconds': 0.0,
+                           'last_score': None}
+        self.configure(config)
+
+    def configure(self, config=None):
+        cfg = (config or {}).get('wakeword', {}) or {}
+        self.enabled = bool(cfg.get('enabled', False))
+        self.phrase = cfg.get('phrase') or "Pepper"
+        self.threshold = float(cfg.get('threshold') or DEFAULT_THRESHOLD)
+        self.window = float(cfg.get('window_seconds') or DEFAULT_WINDOW)
+        templates_dir = os.path.expanduser(cfg.get('templates_dir') or DEFAULT_TEMPLATES_DIR)
+        if templates_dir != self.templates_dir or not self.templates:
+            self.templates_dir = templates_dir
+            if self.enabled:
+                self.load_templates()
+
+    # ---------- gabarits ----------
+    def load_templates(self):
+        templates = []
+        if os.path.isdir(self.templates_dir):
+            for name in sorted(os.listdir(self.templates_dir)):
+                if not name.lower().endswith('.wav'):
+                    continue
+                try:
+                    with open(os.path.join(self.templates_dir, name), 'rb') as f:
+                        templates.append(self._template_from_wav(f.read()))
+                except Exception as e:
+                    self.log("[WAKE] Gabarit {} illisible: {}".format(name, e), level='warning')
+        self._set_templates(templates)
+        if self.enabled and not templates:
+            self.log("[WAKE] Aucun gabarit dans {}: écoute continue conservée.".format(self.templates_dir), level='warning')
+        return len(templates)
+
+    def enroll(self, wav_bytes, save=True):
+        """Ajoute un gabarit (WAV 16 kHz mono du mot seul), sauvegardé dans templates_dir si save."""
+        template = self._template_from_wav(wav_bytes)
+        if save:
+            if not os.path.isdir(self.templates_dir):
+                os.makedirs(self.templates_dir)
+            path = os.path.join(self.templates_dir, "wake_{}.wav".format(int(time.time() * 1000)))
+            with open(path, 'wb') as f:
+                f.write(wav_bytes)
+        self._set_templates(self.templates + [template])
+        return len(self.templates)
+
+    def _template_from_wav(self, wav_bytes):
+        with wave.open(io.BytesIO(wav_bytes), 'rb') as wf:
+            if wf.getframerate() != 16000 or wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+                raise ValueError("WAV 16 kHz mono 16 bits attendu")
+            raw = wf.readframes(wf.getnframes())
+        samples = decimate(raw)
+        # Retire le silence autour du mot (même critère d'énergie que le flux)
+        energies = [sum(abs(v) for v in samples[i:i + HOP]) / HOP for i in range(0, len(samples) - HOP + 1, HOP)]
+        if not energies:
+            raise ValueError("gabarit vide")
+        floor = max(ONSET_MIN_ENERGY, 0.1 * max(energies))
+        active = [i for i, e in enumerate(energies) if e >= floor]
+        start = max(0, active[0] - PRE_FRAMES) * HOP
+        end = (active[-1] + 1) * HOP + FFT_SIZE
+        sequence = mfcc_sequence(samples[start:end])
+        if len(sequence) < 5:
+            raise ValueError("gabarit trop court")
+        return sequence
+
+    def _set_templates(self, templates):
+        with self._lock:
+            self.templates = templates
+        self._max_frames = int(1.5 * max(len(t) for t in templates)) + 1 if templates else 0
+
+    # ---------- fenêtre de conversation ----------
+    def active(self):
+        """Vrai si le filtre doit s'appliquer (activé et au moins un gabarit)."""
+        return self.enabled and bool(self.templates)
+
+    def is_open(self):
+        return not self.active() or time.time() < self._open_until
+
+    def keep_open(self):
+        self._open_until = max(self._open_until, time.time() + self.window)
+
+    def close_window(self):
+        self._open_until = 0.0
+
+    # ---------- flux audio ----------
+    def feed(self, buf):
+        """Appelé par Listener.processRemote (thread NAOqi): simple mise en file."""
+        self._chunks.append(buf)
+        self._wakeup.set()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._reset_stream()
+        self._thread = threading.Thread(target=self._run, name="WakeWordSpotter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def _reset_stream(self):
+        self._pending = []          # échantillons 8 kHz pas encore découpés en trames
+        self._history = deque(maxlen=PRE_FRAMES + FFT_SIZE // HOP + 1)
+        self._segment = None        # échantillons du segment en cours (depuis l'onset)
+        self._silent_frames = 0
+        self._noise = float(ONSET_MIN_ENERGY)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(0.2)
+            self._wakeup.clear()
+            while self._chunks:
+                try:
+                    buf = self._chunks.popleft()
+                except IndexError:
+                    break
+                t0 = time.time()
+                try:
+                    self.process(buf)
+                except Exception as e:
+                    self.log("[WAKE] Erreur de traitement audio: {}".format(e), level='warning')
+                with self._lock:
+                    self.stats_data['cpu_seconds'] += time.time() - t0
+                    self.stats_data['audio_seconds'] += len(buf) / 32000.0
+
+    def process(self, buf):
+        """Traite un bloc PCM 16 kHz. Retourne True si le mot d'éveil vient d'être détecté."""
+        if not self.templates:
+            return False
+        self._pending.extend(decimate(buf))
+        detected = False
+        while len(self._pending) >= HOP:
+            hop, self._pending = self._pending[:HOP], self._pending[HOP:]
+            energy = sum(abs(v) for v in hop) / HOP
+            self._history.append(hop)
+            if self._segment is None:
+                if energy > max(ONSET_MIN_ENERGY, ONSET_RATIO * self._noise):
+                    self._segment = [v for h in self._history for v in h]
+                    self._silent_frames = 0
+                else:
+                    self._noise = 0.95 * self._noise + 0.05 * max(energy, 1.0)
+                continue
+            self._segment.extend(hop)
+            if energy > max(ONSET_MIN_ENERGY, ONSET_RATIO * self._noise):
+                self._silent_frames = 0
+            else:
+                self._silent_frames += 1
+            frames = (len(self._segment) - FFT_SIZE) // HOP + 1
+            if frames >= self._max_frames or self._silent_frames >= END_SILENCE_FRAMES:
+                detected = self._evaluate(self._segment) or detected
+                self._segment = None
+        return detected
+
+    def _evaluate(self, segment):
+        sequence = mfcc_sequence(segment)
+        with self._lock:
+            templates = self.templates
+        score = min(dtw_open_end(t, sequence) for t in templates)
+        WAKEWORD_CANDIDATES.inc()
+        with self._lock:
+            self.stats_data['candidates'] += 1
+            self.stats_data['last_score'] = round(score, 3)
+        if score > self.threshold:
+            self.log("[WAKE] Segment rejeté (score {:.2f} > {:.2f})".format(score, self.threshold), level='debug')
+            return False
+        WAKEWORD_DETECTIONS.inc()
+        with self._lock:
+            self.stats_data['detections'] += 1
+        self.log("[WAKE] '{}' détecté (score {:.2f}), fenêtre de conversation {:.0f}s".format(
+            self.phrase, score, self.window), level='info')
+        self.keep_open()
+        if self.on_wake:
+            try:
+                self.on_wake()
+            except Exception as e:
+                self.log("[WAKE] Callback de réveil en erreur: {}".format(e), level='warning')
+        return True
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.stats_data)
+        audio = data['audio_seconds']
+        data['cpu_ms_per_audio_second'] = round(1000.0 * data['cpu_seconds'] / audio, 2) if audio else None
+        data['cpu_seconds'] = round(data['cpu_seconds'], 3)
+        data['audio_seconds'] = round(audio, 1)
+        data['enabled'] = self.active()
+        data['window_open'] = self.active() and time.time() < self._open_until
+        data['templates'] = len(self.templates)
+        return data
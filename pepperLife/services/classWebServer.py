@@ -13,7 +13,8 @@ class WebServer.py — Serveur web pour PepperLife (version étendue, v2)
   - /api/autonomous_life/toggle
   - /api/posture/state
   - /api/posture/toggle
-  - /cam.png, /last_capture.png (gérés en statique si présents dans root_dir)
+  - /cam.png (dernière image du flux caméra, en mémoire), /last_capture.png (statique)
+  - GET  /api/camera/mjpeg?fps=5   -> flux caméra multipart/x-mixed-replace (MJPEG)
 ...
   - POST /api/apps/stop  {name}
   - GET  /api/memory/search?pattern=...
@@ -33,6 +34,9 @@ class WebServer.py — Serveur web pour PepperLife (version étendue, v2)
   - GET  /api/tts/languages        -> _get_tts_languages()
   - GET  /api/config/user          -> _config_get_user()
   - GET  /api/system_prompt        -> _get_system_prompt()
+  - GET  /api/metrics/turns?n=50   -> traces de latence par tour + p50/p90/p99 par étape
+  - GET  /api/ollama/servers       -> pool Ollama: santé, modèles chargés, TTFT EWMA par serveur
+  - GET  /metrics                  -> métriques au format texte Prometheus (classMetrics.REGISTRY)
   - log_message() tolère les appels http.server (args[0] peut être HTTPStatus)
 
 Toutes les routes échouent en douceur si le service NAOqi demandé n'est pas disponible.
@@ -86,7 +90,10 @@ from .classSystem import (
     read_naoqi_version_from_file,
 )
 from .chatBots.ollama import call_ollama_api, list_models, normalize_base_url
+from .chatBots.ollamaPool import OLLAMA_POOL
 from .classChoreography import ChoreographyCoordinator
+from .classMetrics import REGISTRY, HTTP_REQUESTS, HTTP_SECONDS, NAOQI_CALLS, NAOQI_SECONDS
+from .classTurnTrace import TURN_TRACER, STAGES as TURN_STAGES
 
 try:
     from .classAudioUtils import avgabs
@@ -94,18 +101,31 @@ except Exception:
     def avgabs(_b):
         return 0
 
+# Réponses en flux continu: leur durée de vie n'entre pas dans HTTP_SECONDS
+STREAMING_ROUTES = ('/api/camera/mjpeg',)
+
 class _LockedServiceProxy(object):
-    """Proxy qui sérialise tous les appels vers un service NAOqi via un RLock."""
-    __slots__ = ("_lock", "_svc")
-    def __init__(self, lock, svc):
+    """Proxy qui sérialise tous les appels vers un service NAOqi via un RLock (comptés dans /metrics)."""
+    __slots__ = ("_lock", "_svc", "_name")
+    def __init__(self, lock, svc, name='?'):
         self._lock = lock
         self._svc = svc
+        self._name = name
     def __getattr__(self, name):
         target = getattr(self._svc, name)
         if callable(target):
+            service = self._name
             def _wrapped(*args, **kwargs):
-                with self._lock:
-                    return target(*args, **kwargs)
+                t0 = time.monotonic()
+                status = 'error'
+                try:
+                    with self._lock:
+                        result = target(*args, **kwargs)
+                    status = 'ok'
+                    return result
+                finally:
+                    NAOQI_CALLS.inc(service, name, status)
+                    NAOQI_SECONDS.observe(time.monotonic() - t0, service)
             return _wrapped
         # Attribut non-callable (ex: propriété)
         with self._lock:
@@ -147,6 +167,10 @@ class WebServer(object):
         self.identity_manager = RobotIdentityManager(self.svc, self._logger)
         self._last_identity_for_choreo = None
         self.choreography = ChoreographyCoordinator(logger=self._logger)
+        REGISTRY.gauge_fn('pepperlife_phrase_cache_events_total', 'Cache de phrases pré-rendues (PepperLifeService).',
+                          self._phrase_cache_metrics, ('result',), kind='counter')
+        REGISTRY.gauge_fn('pepperlife_animation_index_entries', "Index des animations au dernier scan (PepperLifeService).",
+                          self._animation_index_metrics, ('result',))
         try:
             self.choreography.ensure_self_robot(self.get_robot_identity())
             self.choreography.set_service_provider(self.svc)
@@ -253,6 +277,20 @@ class WebServer(object):
             except Exception as exc:
                 self._logger("[Choreo] Reprise du watchdog ALDialog impossible: %s" % exc, level='warning')
 
+    def _phrase_cache_metrics(self):
+        pls = self.svc('PepperLifeService')
+        if not pls:
+            return None
+        stats = pls.getPhraseCacheStats()
+        return {(k,): stats.get(k, 0) for k in ('hits', 'misses', 'renders', 'render_errors', 'evictions', 'invalidations')}
+
+    def _animation_index_metrics(self):
+        pls = self.svc('PepperLifeService')
+        if not pls:
+            return None
+        stats = pls.getAnimationStats()
+        return {('cache_hit',): stats.get('cache_hits', 0), ('rescanned',): stats.get('rescanned', 0)}
+
     def svc(self, name):
         """Récupère un service NAOqi sous verrou, renvoie un proxy verrouillé pour ses méthodes."""
         try:
@@ -265,13 +303,38 @@ class WebServer(object):
                 raw = self.session.service(name)
                 if raw is None:
                     return None
-                proxy = _LockedServiceProxy(self._naoqi_lock, raw)
+                proxy = _LockedServiceProxy(self._naoqi_lock, raw, name)
                 self._svc_cache[name] = proxy
                 return proxy
         except Exception as e:
             self._logger(f"[WebServer] svc({name}): exception while getting service: {e}", level='error')
             return None
 
+    # ---------- actions robot (routes /api/volume, /api/posture et IntentRouter) ----------
+    def get_volume(self):
+        ad = self.svc('ALAudioDevice')
+        return int(ad.getOutputVolume()) if ad else 0
+
+    def set_volume(self, volume):
+        """Règle le volume de sortie (borné 0-100). Retourne la valeur appliquée."""
+        ad = self.svc('ALAudioDevice')
+        if not ad:
+            raise RuntimeError('ALAudioDevice indisponible')
+        volume = max(0, min(100, int(volume)))
+        ad.setOutputVolume(volume)
+        return volume
+
+    def set_posture(self, state):
+        """state: 'wakeUp' ou 'rest'. Retourne True si le robot est réveillé après l'action."""
+        motion = self.svc('ALMotion')
+        if not motion:
+            raise RuntimeError('ALMotion indisponible')
+        if state == 'wakeUp':
+            motion.wakeUp()
+        else:
+            motion.rest()
+        return bool(motion.robotIsWakeUp())
+
     def has_internet_connectivity(self, timeout=1.5):
         try:
             sock = socket.create_connection(('1.1.1.1', 53), timeout)
@@ -489,7 +552,7 @@ class WebServer(object):
             def log_message(self, format, *args):
                 # Ne plante pas si http.server passe un HTTPStatus
                 try:
-                    if args and isinstance(args[0], str) and args[0].startswith('GET /api/'):
+                    if args and isinstance(args[0], str) and args[0].startswith(('GET /api/', 'GET /metrics')):
                         return
                 except Exception:
                     pass
@@ -561,11 +624,48 @@ class WebServer(object):
                 except Exception as e:
                     self._send_503('Error reading index.html: %s' % e)
 
-            # ---------- Routes ----------
+            # ---------- Métriques HTTP ----------
+            def send_response(self, code, message=None):
+                self._status_code = code
+                SimpleHTTPRequestHandler.send_response(self, code, message)
+
+            def _timed(self, method, handler):
+                t0 = time.monotonic()
+                self._status_code = 0
+                # Flux longs (MJPEG): seule la latence jusqu'à la première image est mesurée
+                self._first_frame_at = None
+                try:
+                    handler()
+                finally:
+                    path = urlparse(self.path).path
+                    # Routes API nommées, fichiers statiques regroupés (cardinalité bornée)
+                    route = path if path.startswith('/api/') or path == '/metrics' else 'static'
+                    HTTP_REQUESTS.inc(method, route, self._status_code)
+                    if path not in STREAMING_ROUTES:
+                        HTTP_SECONDS.observe(time.monotonic() - t0, method, route)
+                    elif self._first_frame_at is not None:
+                        HTTP_SECONDS.observe(self._first_frame_at - t0, method, route)
+
             def do_GET(self):
+                self._timed('GET', self._do_GET)
+
+            def do_POST(self):
+                self._timed('POST', self._do_POST)
+
+            def _metrics(self):
+                try:
+                    body = REGISTRY.render()
+                except Exception as e:
+                    self._send_503('metrics error: %s' % e); return
+                self._text(200, body, 'text/plain; version=0.0.4; charset=utf-8')
+
+            # ---------- Routes ----------
+            def _do_GET(self):
                 parsed = urlparse(self.path)
                 path = parsed.path
 
+                if path == '/metrics': self._metrics(); return
+
                 # backend/system
                 if path == '/api/system/status': self._get_system_status(); return
                 if path == '/api/system/logs': self._get_system_logs(); return
@@ -574,7 +674,9 @@ class WebServer(object):
                 if path == '/api/chat/status': self._get_chat_status(); return
                 if path == '/api/chat/detailed_status': self._get_detailed_chat_status(); return
                 if path == '/api/ollama/probe': self._ollama_probe(parsed); return
+                if path == '/api/ollama/servers': self._ollama_servers(); return
                 if path == '/api/stt/probe': self._stt_probe(parsed); return
+                if path == '/api/metrics/turns': self._metrics_turns(parsed); return
 
                 # misc
                 if path == '/api/heartbeat':
@@ -629,9 +731,7 @@ class WebServer(object):
                 # audio/volume
                 if path == '/api/volume/state':
                     try:
-                        ad = parent.svc('ALAudioDevice')
-                        vol = ad.getOutputVolume() if ad else 0
-                        self._json(200, {'volume': int(vol)})
+                        self._json(200, {'volume': parent.get_volume()})
                     except Exception as e:
                         self._send_503('volume/state error: %s' % e)
                     return
@@ -669,6 +769,7 @@ class WebServer(object):
                 if path == '/api/system_prompt': self._get_system_prompt(parsed); return
                 if path == '/api/tts/languages': self._get_tts_languages(); return
                 if path == '/api/camera/status': self._camera_status(); return
+                if path == '/api/camera/mjpeg': self._camera_mjpeg(parsed); return
 
                 # Routes pour les logs
                 if path == '/api/logs/launcher' or path == '/api/logs/service':
@@ -687,15 +788,10 @@ class WebServer(object):
                     self._json(200, {'logs': logs})
                     return
 
+                if path == '/cam.png': self._camera_snapshot(); return
+
                 # Fichiers statiques
-                if path in ('/cam.png', '/last_capture.png'):
-                    if path == '/cam.png':
-                        try:
-                            vision = getattr(self.server.parent, 'vision_service', None)
-                            if vision and hasattr(vision, 'touch_stream_consumer'):
-                                vision.touch_stream_consumer(auto_start=True)
-                        except Exception:
-                            pass
+                if path == '/last_capture.png':
                     p = os.path.join(self.server._root_dir, path.lstrip('/'))
                     if os.path.isfile(p):
                         try:
@@ -716,7 +812,7 @@ class WebServer(object):
                     return
                 return SimpleHTTPRequestHandler.do_GET(self)
 
-            def do_POST(self):
+            def _do_POST(self):
                 parsed = urlparse(self.path)
                 path = parsed.path
                 length = int(self.headers.get('Content-Length', '0') or '0')
@@ -736,10 +832,7 @@ class WebServer(object):
                 if path == '/api/camera/switch': self._camera_switch(payload); return
                 if path == '/api/volume/set':
                     try:
-                        v = int((payload or {}).get('volume', 0))
-                        ad = parent.svc('ALAudioDevice')
-                        if not ad: self._send_503('ALAudioDevice indisponible'); return
-                        ad.setOutputVolume(max(0, min(100, v)))
+                        parent.set_volume((payload or {}).get('volume', 0))
                         self._json(200, {'ok': True})
                     except Exception as e:
                         self._send_503('volume/set error: %s' % e)
@@ -806,6 +899,24 @@ class WebServer(object):
                 else:
                     self._send_503('Callback get_chat_status indisponible')
 
+            def _metrics_turns(self, parsed):
+                try:
+                    qs = parse_qs(parsed.query or '')
+                    n = int((qs.get('n') or ['50'])[0])
+                    self._json(200, {
+                        'stages': list(TURN_STAGES),
+                        'percentiles': TURN_TRACER.percentiles(),
+                        'turns': TURN_TRACER.recent(n),
+                    })
+                except Exception as e:
+                    self._send_503('metrics/turns error: %s' % e)
+
+            def _ollama_servers(self):
+                try:
+                    self._json(200, OLLAMA_POOL.stats())
+                except Exception as e:
+                    self._send_503('ollama/servers error: %s' % e)
+
             def _ollama_probe(self, parsed):
                 qs = parse_qs(parsed.query or '')
                 server = (qs.get('server') or [''])[0].strip()
@@ -917,6 +1028,87 @@ class WebServer(object):
                 except Exception as e:
                     self._send_503('Failed to get camera status: %s' % e)
 
+            def _camera_snapshot(self):
+                """Dernière image du flux (démarré au besoin), sans passer par le disque."""
+                vision = getattr(self.server.parent, 'vision_service', None)
+                frame = None
+                try:
+                    if vision and vision.touch_stream_consumer(auto_start=True):
+                        frame = vision.wait_stream_frame(0, timeout=2.0)
+                except Exception as e:
+                    parent._logger("[WebServer] cam.png error: %s" % e, level='warning')
+                if not frame:
+                    self._send_503('No camera frame available.')
+                    return
+                _seq, data, mime = frame
+                self.send_response(200)
+                self._apply_cors()
+                self.send_header('Content-Type', mime)
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except Exception:
+                    pass
+
+            def _camera_mjpeg(self, parsed):
+                """
+                Flux continu multipart/x-mixed-replace depuis l'image en mémoire du flux caméra.
+                Cadence par client (?fps=, plafonnée à celle de la caméra): un client lent reçoit
+                toujours l'image la plus récente. Le flux s'arrête seul après le dernier client.
+                """
+                vision = getattr(self.server.parent, 'vision_service', None)
+                if not vision:
+                    self._send_503('Vision service not available.')
+                    return
+                try:
+                    fps = float(parse_qs(parsed.query or '').get('fps', [vision.fps])[0])
+                except Exception:
+                    fps = vision.fps
+                interval = 1.0 / max(0.2, min(fps, vision.fps))
+                if not vision.add_stream_consumer(auto_start=True):
+                    vision.remove_stream_consumer()
+                    self._send_503('Failed to start camera stream, check logs.')
+                    return
+                boundary = 'pepperframe'
+                sent = 0
+                try:
+                    self.send_response(200)
+                    self._apply_cors()
+                    self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=%s' % boundary)
+                    self.send_header('Cache-Control', 'no-store')
+                    self.send_header('X-Accel-Buffering', 'no')
+                    self.end_headers()
+                    seq = 0
+                    next_due = 0.0
+                    while True:
+                        delay = next_due - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                        frame = vision.wait_stream_frame(seq, timeout=max(2.0, 2 * interval))
+                        if frame is None:
+                            if not vision.is_streaming:
+                                break
+                            continue
+                        seq, data, mime = frame
+                        next_due = time.monotonic() + interval
+                        self.wfile.write(('--%s\r\nContent-Type: %s\r\nContent-Length: %d\r\n\r\n'
+                                          % (boundary, mime, len(data))).encode('ascii'))
+                        self.wfile.write(data)
+                        self.wfile.write(b'\r\n')
+                        self.wfile.flush()
+                        if not sent:
+                            self._first_frame_at = time.monotonic()
+                        sent += 1
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                except Exception as e:
+                    parent._logger("[WebServer] MJPEG stream error: %s" % e, level='warning')
+                finally:
+                    vision.remove_stream_consumer()
+                    parent._logger("[WebServer] Client MJPEG déconnecté après %d images." % sent, level='debug')
+
             def _camera_switch(self, payload):
                 try:
                     vision = self.server.parent.vision_service
@@ -1165,11 +1357,8 @@ class WebServer(object):
                 try:
                     motion = parent.svc('ALMotion')
                     if not motion: self._send_503('ALMotion indisponible'); return
-                    if motion.robotIsWakeUp():
-                        motion.rest()
-                    else:
-                        motion.wakeUp()
-                    self._json(200, {'is_awake': bool(motion.robotIsWakeUp())})
+                    state = 'rest' if motion.robotIsWakeUp() else 'wakeUp'
+                    self._json(200, {'is_awake': parent.set_posture(state)})
                 except Exception as e:
                     self._send_503('posture/toggle error: %s' % e)
 
@@ -1178,16 +1367,8 @@ class WebServer(object):
                     state = (payload or {}).get('state')
                     if not state in ['wakeUp', 'rest']:
                         self._json(400, {'error': 'Invalid state specified'}); return
-                    
-                    motion = parent.svc('ALMotion')
-                    if not motion: self._send_503('ALMotion indisponible'); return
 
-                    if state == 'wakeUp':
-                        motion.wakeUp()
-                    else: # rest
-                        motion.rest()
-                    
-                    self._json(200, {'is_awake': bool(motion.robotIsWakeUp())})
+                    self._json(200, {'is_awake': parent.set_posture(state)})
                 except Exception as e:
                     self._send_503('posture/set_state error: %s' % e)
 
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# bench_anim_durations.py — compare le calcul des durées d'animations
+#   1) ancien code: ET.parse (arbre complet) + findall
+#   2) anim_durations en séquentiel (balayage des octets / iterparse, arrêt anticipé)
+#   3) anim_durations avec pool de processus
+# sur une bibliothèque synthétique (.qianim + behavior.xar) générée dans un dossier temporaire.
+#
+# Usage: python3 testScripts/bench_anim_durations.py [nb_qianim] [nb_xar]
+
+import os
+import sys
+import time
+import shutil
+import random
+import tempfile
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife', 'bin'))
+from anim_durations import compute_durations, _qianim_iterparse  # noqa: E402
+
+ACTUATORS = ["HeadYaw", "HeadPitch", "LShoulderPitch", "LShoulderRoll", "LElbowYaw", "LElbowRoll",
+             "LWristYaw", "LHand", "RShoulderPitch", "RShoulderRoll", "RElbowYaw", "RElbowRoll",
+             "RWristYaw", "RHand", "HipRoll", "HipPitch", "KneePitch"]
+
+
+def make_qianim(path, rng):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<Animation typeVersion="2.0">']
+    for act in ACTUATORS:
+        lines.append('  <ActuatorCurve fps="25" actuator="%s" mute="0" unit="0">' % act)
+        frame = 0
+        for _ in range(rng.randint(6, 20)):
+            frame += rng.randint(2, 12)
+            lines.append('    <Key frame="%d" value="%.4f">' % (frame, rng.uniform(-90, 90)))
+            lines.append('      <Tangent side="left" interpType="bezier_auto" abscissaParam="-1" ordinateParam="0"/>')
+            lines.append('      <Tangent side="right" interpType="bezier_auto" abscissaParam="1" ordinateParam="0"/>')
+            lines.append('    </Key>')
+        lines.append('  </ActuatorCurve>')
+    lines.append('</Animation>')
+    with open(path, 'w') as f:
+        f.write("\n".join(lines))
+
+
+def make_xar(path, rng):
+    ns = "http://www.aldebaran-robotics.com/schema/choregraphe/project.xsd"
+    boxes = "".join('<Box name="box%d" id="%d"><Input name="onStart" type="1" id="1"/></Box>' % (i, i)
+                    for i in range(rng.randint(20, 60)))
+    data = ('<?xml version="1.0" encoding="UTF-8" ?><ChoregrapheProject xmlns="%s" xar_version="3">'
+            '<Box name="root" id="-1"><Timeline enable="1" fps="25" start_frame="1" end_frame="-1" size="%d">'
+            '<BehaviorLayer name="behavior_layer1">%s</BehaviorLayer></Timeline></Box></ChoregrapheProject>'
+            % (ns, rng.randint(40, 400), boxes))
+    with open(path, 'w') as f:
+        f.write(data)
+
+
+def legacy_qianim(path):
+    root = ET.parse(path).getroot()
+    max_frame, fps = 0, 25
+    for curve in root.findall('ActuatorCurve'):
+        if 'fps' in curve.attrib:
+            fps = int(curve.get('fps'))
+        for key in curve.findall('Key'):
+            max_frame = max(max_frame, int(key.get('frame')))
+    return float(max_frame) / fps if max_frame else 0.0
+
+
+def legacy_xar(path):
+    root = ET.parse(path).getroot()
+    for elem in root.iter():
+        if elem.tag.endswith('Timeline'):
+            fps = float(elem.get('fps', 25))
+            size = float(elem.get('size', 0))
+            return size / fps if fps > 0 and size > 0 else 0.0
+    return 0.0
+
+
+def bench(label, fn):
+    t0 = time.time()
+    result = fn()
+    dt = time.time() - t0
+    print("%-28s %7.3fs" % (label, dt))
+    return result, dt
+
+
+def main():
+    n_qianim = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    n_xar = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    rng = random.Random(42)
+    tmp = tempfile.mkdtemp(prefix="pepper_anims_")
+    try:
+        paths = []
+        for i in range(n_qianim):
+            d = os.path.join(tmp, "animations", "Stand", "Family%03d" % (i // 10))
+            if not os.path.isdir(d):
+                os.makedirs(d)
+            p = os.path.join(d, "Anim_%d.qianim" % (i % 10 + 1))
+            make_qianim(p, rng)
+            paths.append(p)
+        for i in range(n_xar):
+            d = os.path.join(tmp, "animations", "Legacy", "Behavior_%d" % i)
+            os.makedirs(d)
+            p = os.path.join(d, "behavior.xar")
+            make_xar(p, rng)
+            paths.append(p)
+        size_mb = sum(os.path.getsize(p) for p in paths) / 1e6
+        print("Bibliothèque synthétique: %d .qianim + %d .xar (%.1f Mo), %d CPU"
+              % (n_qianim, n_xar, size_mb, os.cpu_count() or 1))
+
+        _, t_iter = bench("iterparse seul (.qianim)", lambda: [
+            _qianim_iterparse(p) for p in paths if p.endswith('.qianim')])
+        legacy, t_legacy = bench("ancien (ET.parse)", lambda: {
+            p: (legacy_xar(p) if p.endswith('.xar') else legacy_qianim(p)) for p in paths})
+        (seq, _), t_seq = bench("anim_durations séquentiel", lambda: compute_durations(paths, workers=1))
+        (pool, _), t_pool = bench("anim_durations + pool", lambda: compute_durations(paths, min_pool_files=1))
+
+        mismatches = [p for p in paths if abs(legacy[p] - seq[p]) > 1e-9 or abs(seq[p] - pool[p]) > 1e-9]
+        print("Écarts de durée: %d" % len(mismatches))
+        print("Gain séquentiel: x%.2f, avec pool: x%.2f" % (t_legacy / max(t_seq, 1e-9), t_legacy / max(t_pool, 1e-9)))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# bench_camera_bus.py — acquisition caméra partagée (CameraBus) avec plusieurs consommateurs
+#
+# Faux ALVideoDevice (VGA, --rpc-ms de latence par getImageRemote, comme un appel NAOqi distant).
+# --viewers clients du flux (Vision.wait_stream_frame, comme /api/camera/mjpeg) et un consommateur
+# "chat" qui lit get_frame()/get_png() plusieurs fois par seconde (vision, photo, tablette), pendant
+# --seconds secondes. Affiche: appels getImageRemote par seconde, encodages réels vs servis depuis
+# le cache de l'image, âge des images livrées aux clients du flux, et un changement de caméra en cours de route.
+#
+# Usage: python3 testScripts/bench_camera_bus.py [--viewers 4] [--seconds 5] [--rpc-ms 25]
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from services.classVision import Vision  # noqa: E402
+from services.classMetrics import CAMERA_ENCODES, CAMERA_FRAMES  # noqa: E402
+from bench_image_encode import synthetic_frame  # noqa: E402
+
+
+class FakeVideoDevice(object):
+    def __init__(self, rpc_ms):
+        self.rpc = rpc_ms / 1000.0
+        self.frame = synthetic_frame(640, 480)
+        self.calls = 0
+        self.subscriptions = []
+        self.lock = threading.Lock()
+
+    def subscribeCamera(self, name, index, resolution, color, fps):
+        self.subscriptions.append((index, resolution))
+        return name
+
+    def unsubscribe(self, sub):
+        pass
+
+    def getImageRemote(self, sub):
+        with self.lock:
+            self.calls += 1
+            time.sleep(self.rpc)
+        return [640, 480, 3, 11, 0, 0, self.frame]
+
+    def releaseImage(self, sub):
+        pass
+
+
+class FakeSession(object):
+    def __init__(self, device):
+        self.device = device
+
+    def service(self, name):
+        return self.device
+
+
+def counter_value(counter, *labels):
+    return int(counter._series.get(tuple(labels), 0))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--viewers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--rpc-ms', type=float, default=25.0)
+    args = parser.parse_args()
+
+    device = FakeVideoDevice(args.rpc_ms)
+    config = {'vision': {'stream_format': 'png', 'stream_idle_timeout': 2}}
+    vision = Vision(config, FakeSession(device), lambda msg, **kwargs: None)
+    vision.start_camera('chat')
+    stop = threading.Event()
+    ages = []
+    delivered = [0]
+
+    def viewer():
+        vision.add_stream_consumer(auto_start=True)
+        seq = 0
+        try:
+            while not stop.is_set():
+                frame = vision.wait_stream_frame(seq, timeout=1.0)
+                if frame is None:
+                    continue
+                seq = frame[0]
+                ages.append(time.time() - vision.bus.latest().ts)
+                delivered[0] += 1
+        finally:
+            vision.remove_stream_consumer()
+
+    def chat():
+        while not stop.is_set():
+            vision.get_png(vision.get_frame())
+            time.sleep(0.25)
+
+    threads = [threading.Thread(target=viewer) for _ in range(args.viewers)] + [threading.Thread(target=chat)]
+    frames0 = counter_value(CAMERA_FRAMES)
+    t0 = time.time()
+    for th in threads:
+        th.start()
+    time.sleep(args.seconds / 2)
+    t_switch = time.time()
+    switched = vision.switch_camera(1)
+    switch_ms = 1000 * (time.time() - t_switch)
+    time.sleep(args.seconds / 2)
+    stop.set()
+    for th in threads:
+        th.join()
+    elapsed = time.time() - t0
+    vision.stop_streaming()
+    vision.stop_camera()
+
+    encoded = counter_value(CAMERA_ENCODES, 'encoded')
+    cached = counter_value(CAMERA_ENCODES, 'cached')
+    ages.sort()
+    print("%d clients du flux + chat, %.1f s, getImageRemote %.0f ms" % (args.viewers, elapsed, args.rpc_ms))
+    print("  getImageRemote: %d appels (%.1f/s), images publiées: %d" % (
+        device.calls, device.calls / elapsed, counter_value(CAMERA_FRAMES) - frames0))
+    print("  images livrées aux clients: %d, encodages: %d réels, %d depuis le cache" % (delivered[0], encoded, cached))
+    if ages:
+        print("  âge des images livrées: médiane %.1f ms, p99 %.1f ms" % (
+            1000 * ages[len(ages) // 2], 1000 * ages[min(len(ages) - 1, int(len(ages) * 0.99))]))
+    print("  changement de caméra: %s en %.0f ms, souscriptions: %s" % ('ok' if switched else 'échec', switch_ms, device.subscriptions))
+
+
+if __name__ == '__main__':
+    main()
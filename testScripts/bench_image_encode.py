@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# bench_image_encode.py — encodage des images caméra: PyPNG (ancien Vision.get_png) vs classImageCodec
+#
+# Image synthétique (dégradés + bruit léger, proche d'une scène caméra) en QVGA et VGA, buffer RGB
+# plat comme celui de ALVideoDevice.getImageRemote. Pour chaque encodeur: ms par image (médiane),
+# images/s possibles et taille. PyPNG et Pillow (JPEG) sont mesurés s'ils sont installés.
+#
+# Usage: python3 testScripts/bench_image_encode.py [--runs 15]
+
+import io
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+from services.classImageCodec import encode_jpeg, encode_png, jpeg_available  # noqa: E402
+
+try:
+    import png
+except ImportError:
+    png = None
+
+
+def synthetic_frame(width, height, seed=5):
+    rng = random.Random(seed)
+    buf = bytearray(width * height * 3)
+    i = 0
+    noise = 0
+    for y in range(height):
+        for x in range(width):
+            if x % 4 == 0:
+                noise = rng.randint(-2, 2)
+            buf[i] = max(0, min(255, (x * 255) // width + noise))
+            buf[i + 1] = max(0, min(255, (y * 255) // height + noise))
+            buf[i + 2] = max(0, min(255, ((x ^ y) & 0x3f) * 3 + 40 + noise))
+            i += 3
+    return bytes(buf)
+
+
+def pypng_encode(width, height, rgb):
+    # Chemin historique de Vision.get_png
+    out = io.BytesIO()
+    wr = png.Writer(width=width, height=height, greyscale=False, alpha=False, compression=5)
+    row_len = width * 3
+    rows = [rgb[i:i + row_len] for i in range(0, len(rgb), row_len)]
+    wr.write(out, rows)
+    return out.getvalue()
+
+
+def measure(fn, runs):
+    times = []
+    data = b''
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        data = fn()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return 1000.0 * times[len(times) // 2], len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=15)
+    args = parser.parse_args()
+
+    for label, (w, h) in (('QVGA', (320, 240)), ('VGA', (640, 480))):
+        rgb = synthetic_frame(w, h)
+        encoders = []
+        if png is not None:
+            encoders.append(('PyPNG niveau 5', lambda: pypng_encode(w, h, rgb)))
+        encoders.append(('PNG niveau 1', lambda: encode_png(w, h, rgb, 1, 'none')))
+        encoders.append(('PNG up niveau 1', lambda: encode_png(w, h, rgb, 1, 'up')))
+        encoders.append(('PNG up niveau 6', lambda: encode_png(w, h, rgb, 6, 'up')))
+        if jpeg_available():
+            encoders.append(('JPEG q80 (Pillow)', lambda: encode_jpeg(w, h, rgb, 80)))
+        for name, fn in encoders:
+            ms, size = measure(fn, args.runs)
+            print("%-5s %-18s %7.2f ms/image  %6.0f images/s  %7.1f Ko" % (label, name, ms, 1000.0 / ms, size / 1024.0))
+    if png is None:
+        print("(PyPNG non installé: pip install pypng pour la comparaison)")
+    if not jpeg_available():
+        print("(Pillow non installé: JPEG non mesuré)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# bench_llm_gateway.py — flotte de robots simulés: appels LLM directs vs passerelle partagée (gatewayServer)
+#
+# Backend simulé (pas de GPU ni de clé): --capacity générations simultanées (un serveur Ollama),
+# --service-ms par réponse répartis sur 12 fragments. Chaque robot enchaîne --turns tours; une part
+# --common % des phrases vient d'un petit répertoire commun ("quelle heure est-il", ...), le reste
+# est propre au robot.
+#   direct    : chaque robot appelle le backend (ChatOllama sur chaque robot, aucun partage);
+#   passerelle: chaque robot passe par ChatGateway -> serveur HTTP local -> même backend.
+# Affiche débit, latence p50/p99, écart entre robots, appels backend, requêtes fusionnées et servies du cache.
+#
+# Usage: python3 testScripts/bench_llm_gateway.py [--robots 12] [--turns 10] [--capacity 2] [--common 40]
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+from services.chatBots.gateway import ChatGateway  # noqa: E402
+from services.chatBots.gatewayServer import serve  # noqa: E402
+from services.classTurnTrace import _percentile  # noqa: E402
+
+COMMON = ["quelle heure est-il", "bonjour Pepper", "raconte une blague", "comment tu t'appelles",
+          "il fait quel temps", "au revoir"]
+
+
+class FakeBackend(object):
+    def __init__(self, capacity, service_s):
+        self.slots = threading.Semaphore(capacity)
+        self.service_s = service_s
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def chat(self, user_text, hist=None, *, model=None, on_chunk=None, stream=None, cancel=None):
+        with self._lock:
+            self.calls += 1
+        with self.slots:
+            parts = []
+            for i in range(12):
+                if cancel is not None and cancel.is_set():
+                    return "", {'cancelled': True}
+                time.sleep(self.service_s / 12.0)
+                parts.append("%s-%d " % (user_text[:8], i))
+                if on_chunk:
+                    on_chunk({'type': 'chunk', 'delta': parts[-1]})
+        return "".join(parts).strip(), {}
+
+
+def phrases(robot, turns, common, seed):
+    rng = random.Random(seed + robot)
+    return [rng.choice(COMMON) if rng.random() < common else "robot %d question %d" % (robot, t)
+            for t in range(turns)]
+
+
+def run_fleet(make_client, robots, turns, common, seed):
+    latencies = []
+    per_robot = {}
+    lock = threading.Lock()
+
+    def robot_loop(robot):
+        client = make_client(robot)
+        mine = []
+        for text in phrases(robot, turns, common, seed):
+            t0 = time.time()
+            client.chat(text, [])
+            mine.append(time.time() - t0)
+        with lock:
+            latencies.extend(mine)
+            per_robot[robot] = sum(mine) / len(mine)
+
+    t0 = time.time()
+    threads = [threading.Thread(target=robot_loop, args=(r,)) for r in range(robots)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.time() - t0, sorted(latencies), per_robot
+
+
+def report(label, elapsed, latencies, per_robot, calls):
+    means = sorted(per_robot.values())
+    print("%-10s %5.1f tours/s  latence p50 %5.2fs  p99 %5.2fs  | moyenne par robot %.2f..%.2fs  | appels backend %d" % (
+        label, len(latencies) / elapsed, _percentile(latencies, 50), _percentile(latencies, 99),
+        means[0], means[-1], calls))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--robots', type=int, default=12)
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--capacity', type=int, default=2)
+    parser.add_argument('--service-ms', type=float, default=300)
+    parser.add_argument('--common', type=float, default=40.0, help="%% de phrases du répertoire commun")
+    parser.add_argument('--port', type=int, default=11577)
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+    service_s = args.service_ms / 1000.0
+    common = args.common / 100.0
+
+    direct = FakeBackend(args.capacity, service_s)
+    report("direct", *run_fleet(lambda robot: direct, args.robots, args.turns, common, args.seed), calls=direct.calls)
+
+    shared = FakeBackend(args.capacity, service_s)
+    config = {'gateway_server': {'workers': {'ollama': args.capacity, 'gpt': 1}, 'rate_per_minute': 10000}}
+    gateway, httpd = serve(config, host='127.0.0.1', port=args.port, logger=lambda msg, **kw: None,
+                           service_factory=lambda backend, prompt: shared)
+
+    def make_client(robot):
+        cfg = {'gateway': {'url': 'http://127.0.0.1:%d' % args.port, 'robot_id': 'pepper-%02d' % robot}}
+        return ChatGateway(cfg, system_prompt="Tu es Pepper.")
+
+    report("passerelle", *run_fleet(make_client, args.robots, args.turns, common, args.seed), calls=shared.calls)
+    robots = gateway.stats()['robots'].values()
+    print("passerelle: %d requêtes fusionnées avec une requête en cours, %d servies par le cache" % (
+        sum(c.get('coalesced', 0) for c in robots), sum(c.get('cached', 0) for c in robots)))
+    httpd.shutdown()
+    gateway.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# bench_llm_hedge.py — requêtes LLM doublées (HedgedChat): taux de doublement et latence de queue
+#
+# Backend simulé (pas de réseau): délai avant premier fragment tiré d'une loi à queue lourde
+# (la plupart des requêtes en ~0.4 s, --stall % bloquées 3 à 10 s comme un serveur saturé),
+# puis 12 fragments. Le backend respecte CancelToken comme chatGPT / ChatOllama.
+# Compare TTFT p50/p90/p99 sans doublement puis avec, et compte les requêtes en plus.
+#
+# Usage: python3 testScripts/bench_llm_hedge.py [--requests 200] [--deadline-ms 1500] [--stall 8] [--scale 0.1]
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+from services.classLLMHedge import HedgedChat  # noqa: E402
+from services.classTurnTrace import _percentile  # noqa: E402
+
+
+class FakeBackend(object):
+    def __init__(self, rng, stall, scale):
+        self.rng = rng
+        self.stall = stall
+        self.scale = scale
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _ttft(self):
+        with self._lock:
+            self.calls += 1
+            if self.rng.random() < self.stall:
+                return self.rng.uniform(3.0, 10.0)
+            return self.rng.lognormvariate(-1.0, 0.35)
+
+    def chat(self, user_text, hist=None, *, model=None, on_chunk=None, stream=None, cancel=None):
+        waited = 0.0
+        ttft = self._ttft() * self.scale
+        while waited < ttft:
+            if cancel is not None and cancel.is_set():
+                return "", {'cancelled': True}
+            time.sleep(min(0.005, ttft - waited))
+            waited += 0.005
+        parts = []
+        for i in range(12):
+            if cancel is not None and cancel.is_set():
+                return "", {'cancelled': True}
+            parts.append("mot%d " % i)
+            if on_chunk:
+                on_chunk({'type': 'chunk', 'delta': parts[-1]})
+            time.sleep(0.03 * self.scale)
+        return "".join(parts).strip(), {}
+
+
+def run(hedger, backend, n):
+    ttfts = []
+    for _ in range(n):
+        t0 = time.time()
+        first = []
+
+        def on_chunk(event):
+            if not first:
+                first.append(time.time() - t0)
+
+        hedger.chat(backend, 'ollama', "bonjour", [], on_chunk=on_chunk)
+        ttfts.append(first[0] / backend.scale if first else float('nan'))
+    return sorted(ttfts)
+
+
+def report(label, ttfts, calls, n):
+    print("%-14s TTFT p50 %5.2fs  p90 %5.2fs  p99 %5.2fs  max %5.2fs   requêtes backend %d (+%.0f %%)" % (
+        label, _percentile(ttfts, 50), _percentile(ttfts, 90), _percentile(ttfts, 99), ttfts[-1],
+        calls, 100.0 * (calls - n) / n))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--deadline-ms', type=float, default=1500)
+    parser.add_argument('--stall', type=float, default=8.0, help="%% de requêtes bloquées")
+    parser.add_argument('--scale', type=float, default=0.1)
+    args = parser.parse_args()
+    s = args.scale
+
+    base = FakeBackend(random.Random(11), args.stall / 100.0, s)
+    plain = HedgedChat({'llm_hedging': {'enabled': False}})
+    report("sans doublement", run(plain, base, args.requests), base.calls, args.requests)
+
+    hedged_backend = FakeBackend(random.Random(11), args.stall / 100.0, s)
+    hedger = HedgedChat({'llm_hedging': {'enabled': True, 'ttft_deadline_ms': {'ollama': args.deadline_ms * s}}})
+    report("avec doublement", run(hedger, hedged_backend, args.requests), hedged_backend.calls, args.requests)
+    stats = hedger.stats()
+    print("Délai TTFT %.0f ms: %d requêtes doublées (taux %s), gagnantes %s"
+          % (args.deadline_ms, stats['hedged'], stats['hedge_rate'], stats['wins']))
+
+
+if __name__ == '__main__':
+    main()
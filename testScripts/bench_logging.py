@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# bench_logging.py — coût des logs par tour de chat: ancien log() vs façade classLog (paresseuse + asynchrone)
+#
+# Un tour simulé reproduit les appels du chemin chaud: --chunks lignes [OLLAMA_RAW] / [OLLAMA_STREAM_CHUNK]
+# (un dict par fragment), le payload initial (prompt système + historique), le repr de la réponse
+# brute ([GPT_FULL]), les lignes [TTS-DEBUG] et quelques infos.
+#   verbosité 2 : temps CPU par tour (formatage de messages jetés ensuite);
+#   verbosité 3 : console lente simulée (--sink-ms par ligne): temps passé dans le thread appelant,
+#                 et vérification qu'aucune ligne n'est perdue (file vidée puis lignes comptées).
+#
+# Usage: python3 testScripts/bench_logging.py [--chunks 400] [--turns 20] [--sink-ms 0.2]
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+from services.classLog import Logger, log_enabled  # noqa: E402
+
+SYSTEM_PROMPT = "Tu es Pepper, un robot humanoïde. " * 80
+HISTORY = [{'role': 'user' if i % 2 == 0 else 'assistant', 'content': "phrase numéro %d de la conversation" % i}
+           for i in range(16)]
+
+
+class SlowSink(object):
+    def __init__(self, delay):
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, line):
+        self.lines += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+
+def make_old_log(verbosity, sink):
+    # Ancien pepperLife.log: message déjà formaté par l'appelant, filtrage puis print() synchrone
+    levels = {'error': 0, 'warning': 1, 'info': 2, 'debug': 3}
+
+    def log(msg, level='info', color=None):
+        if verbosity >= levels.get(level, 2):
+            sink.write(msg)
+    return log
+
+
+def make_new_log(verbosity, sink):
+    logger = Logger(verbosity=verbosity, console=False)
+    logger._write = lambda record: sink.write(record[2])
+    return logger
+
+
+def turn_old(log, chunks):
+    payload = {'model': 'llama3', 'messages': [{'role': 'system', 'content': SYSTEM_PROMPT}] + HISTORY, 'stream': True}
+    log("[OLLAMA_DEBUG] Payload initial: {}".format(payload), level='debug')
+    for i in range(chunks):
+        chunk = {'model': 'llama3', 'created_at': '2026-10-19T10:00:00Z', 'message': {'role': 'assistant', 'content': 'mot%d ' % i}, 'done': False}
+        log("[OLLAMA_RAW] {}".format(chunk), level='debug')
+        log("[OLLAMA_STREAM_CHUNK] idx={} done={} len={} preview='{}'".format(i, False, 6, 'mot '), level='debug')
+    raw = {'message': {'content': "mot " * chunks}, 'chunks': chunks, 'payload': payload}
+    log("[GPT_FULL] {}".format(repr(raw)), level='debug')
+    log("[TTS-DEBUG] 'add_wait_tag' config value is: {}".format(True), level='debug')
+    log("[TTS-DEBUG] Appended wait tag. New text: '{}'".format("^start(x) " + "mot " * 40), level='debug')
+    for _ in range(5):
+        log("[TTS] Texte original: '{}'".format("mot " * 20), level='info')
+
+
+def turn_new(log, chunks):
+    payload = {'model': 'llama3', 'messages': [{'role': 'system', 'content': SYSTEM_PROMPT}] + HISTORY, 'stream': True}
+    if log_enabled(log, 'debug'):
+        log("[OLLAMA_DEBUG] Payload initial: {}".format(payload), level='debug')
+    debug = log_enabled(log, 'debug')
+    for i in range(chunks):
+        chunk = {'model': 'llama3', 'created_at': '2026-10-19T10:00:00Z', 'message': {'role': 'assistant', 'content': 'mot%d ' % i}, 'done': False}
+        if debug:
+            log("[OLLAMA_RAW] %s", chunk, level='debug')
+            log("[OLLAMA_STREAM_CHUNK] idx=%d done=%s len=%d preview='%s'", i, False, 6, 'mot ', level='debug')
+    raw = {'message': {'content': "mot " * chunks}, 'chunks': chunks, 'payload': payload}
+    if debug:
+        log("[GPT_FULL] %r", raw, level='debug')
+        log("[TTS-DEBUG] 'add_wait_tag' config value is: %s", True, level='debug')
+        log("[TTS-DEBUG] Appended wait tag. New text: '%s'", "^start(x) " + "mot " * 40, level='debug')
+    for _ in range(5):
+        log("[TTS] Texte original: '%s'", "mot " * 20, level='info')
+
+
+def measure(turn, log, chunks, turns, clock):
+    samples = []
+    for _ in range(turns):
+        t0 = clock()
+        turn(log, chunks)
+        samples.append(clock() - t0)
+    samples.sort()
+    return 1000.0 * samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunks', type=int, default=400)
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--sink-ms', type=float, default=0.2)
+    args = parser.parse_args()
+
+    sink = SlowSink(0)
+    old = measure(turn_old, make_old_log(2, sink), args.chunks, args.turns, time.process_time)
+    new = measure(turn_new, make_new_log(2, sink), args.chunks, args.turns, time.process_time)
+    print("verbosité 2, CPU par tour      : ancien %6.2f ms   façade %6.2f ms" % (old, new))
+
+    slow_old, slow_new = SlowSink(args.sink_ms / 1000.0), SlowSink(args.sink_ms / 1000.0)
+    new_log = make_new_log(3, slow_new)
+    old = measure(turn_old, make_old_log(3, slow_old), args.chunks, args.turns, time.perf_counter)
+    new = measure(turn_new, new_log, args.chunks, args.turns, time.perf_counter)
+    new_log.flush(timeout=600)
+    print("verbosité 3, console %.1f ms/ligne, temps du thread appelant par tour: ancien %6.1f ms   façade %6.1f ms"
+          % (args.sink_ms, old, new))
+    print("  lignes écrites: ancien %d, façade %d (%d perdues, %d écrites par l'appelant, file pleine)"
+          % (slow_old.lines, slow_new.lines, slow_old.lines - slow_new.lines, new_log.overflow))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# bench_ollama_warmup.py — premier tour Ollama à froid vs après préchauffage (ChatOllama.warm_up)
+#
+# Pour chaque répétition:
+#   froid : déchargement du modèle (keep_alive 0) puis premier chat() chronométré;
+#   chaud : déchargement, warm_up() (chargement + préremplissage du prompt système), puis chat().
+# Le prompt système est celui de prompts/system_prompt_OLLAMA.txt (comme la boucle de chat).
+#
+# Usage: python3 testScripts/bench_ollama_warmup.py http://serveur:11434 llama3.1:8b [--runs 3]
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+from services.chatBots.ollama import ChatOllama, call_ollama_api, WARMUP_TIMEOUT  # noqa: E402
+
+
+def unload(server, model):
+    call_ollama_api(server, "/api/generate", {"model": model, "keep_alive": 0}, timeout=WARMUP_TIMEOUT)
+    time.sleep(1.0)
+
+
+def first_turn(client):
+    t0 = time.time()
+    first = []
+
+    def on_chunk(event):
+        if not first and event.get('delta'):
+            first.append(time.time() - t0)
+
+    client.chat("Bonjour Pepper, comment vas-tu ?", [], on_chunk=on_chunk)
+    total = time.time() - t0
+    return (first[0] if first else total), total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('server')
+    parser.add_argument('model')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    config = {'ollama': {'server': args.server, 'chat_model': args.model, 'stream': True,
+                         'keep_alive': '5m', 'timeout': WARMUP_TIMEOUT}}
+    client = ChatOllama(config, system_prompt=ChatOllama.get_base_prompt(config))
+
+    for run in range(args.runs):
+        unload(client.base_url, args.model)
+        cold_ttft, cold_total = first_turn(client)
+
+        unload(client.base_url, args.model)
+        report = client.warm_up()
+        warm_ttft, warm_total = first_turn(client)
+
+        print("run %d  froid: TTFT %6.0f ms, réponse %6.0f ms | préchauffage: chargement %6.0f ms, "
+              "préremplissage %s ms (%s tokens) | chaud: TTFT %6.0f ms, réponse %6.0f ms"
+              % (run + 1, 1000 * cold_ttft, 1000 * cold_total, report['load_ms'], report.get('prefill_ms'),
+                 report.get('prompt_eval_count'), 1000 * warm_ttft, 1000 * warm_total))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# bench_phrase_cache.py — latence TTS direct vs phrase pré-rendue (à lancer sur le robot)
+#   1) ALTextToSpeech.say(texte)                  : synthèse + lecture
+#   2) ALTextToSpeech.sayToFile + ALAudioPlayer   : lecture seule d'un rendu en cache
+# Pour chaque phrase: temps total et surcoût = temps total - durée audio du rendu.
+#
+# Usage: python3 testScripts/bench_phrase_cache.py [--url tcp://127.0.0.1:9559] [--rounds 3]
+
+import os
+import time
+import wave
+import argparse
+import tempfile
+
+import qi
+
+PHRASES = [
+    u"Je suis prêt.",
+    u"Je suis réveillé !",
+    u"Petit pépin réseau, on réessaie.",
+    u"Je n'ai pas réussi à prendre de photo.",
+]
+RAW_RATE = 22050
+
+
+def render(tts, text, path):
+    raw_path = path + ".raw"
+    t0 = time.time()
+    tts.sayToFile(text, raw_path)
+    render_s = time.time() - t0
+    with open(raw_path, 'rb') as f:
+        data = f.read()
+    os.remove(raw_path)
+    if data[:4] == b'RIFF':
+        with open(path, 'wb') as f:
+            f.write(data)
+    else:
+        out = wave.open(path, 'wb')
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(RAW_RATE)
+        out.writeframes(data)
+        out.close()
+    wav = wave.open(path, 'rb')
+    duration = float(wav.getnframes()) / wav.getframerate()
+    wav.close()
+    return render_s, duration
+
+
+def timed(fn):
+    t0 = time.time()
+    fn()
+    return time.time() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='tcp://127.0.0.1:9559')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    session = qi.Session()
+    session.connect(args.url)
+    tts = session.service("ALTextToSpeech")
+    player = session.service("ALAudioPlayer")
+    tmp = tempfile.mkdtemp(prefix="pepper_phrases_")
+    print("Voix %s (%s), %d tours par phrase" % (tts.getVoice(), tts.getLanguage(), args.rounds))
+    print("%-42s %8s %8s %8s %8s" % ("phrase", "audio", "rendu", "direct", "cache"))
+    total_live = total_cache = 0.0
+    for i, text in enumerate(PHRASES):
+        path = os.path.join(tmp, "phrase_%d.wav" % i)
+        render_s, duration = render(tts, text, path)
+        live = min(timed(lambda: tts.say(text)) for _ in range(args.rounds)) - duration
+        cached = min(timed(lambda: player.playFile(path)) for _ in range(args.rounds)) - duration
+        total_live += live
+        total_cache += cached
+        print("%-42s %7.2fs %7.2fs %+7.0fms %+7.0fms" % (text[:42], duration, render_s, live * 1000, cached * 1000))
+        os.remove(path)
+    os.rmdir(tmp)
+    n = len(PHRASES)
+    print("Surcoût moyen: direct %.0f ms, cache %.0f ms" % (total_live / n * 1000, total_cache / n * 1000))
+
+
+if __name__ == '__main__':
+    main()
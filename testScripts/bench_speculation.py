@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# bench_speculation.py — envoi anticipé au LLM (SpeculativeDispatcher): taux de succès et latence gagnée
+#
+# Simulation en temps réel (accélérée par --scale) de la boucle de chat:
+#   - phrase = mots espacés de 0.25 à 0.45 s, pauses occasionnelles, puis silence de fin (silhold);
+#   - STT simulé: un partiel renvoie les mots prononcés au moment de la requête, après une latence;
+#     avec une probabilité --mismatch, la transcription finale diffère du dernier partiel (dernier mot);
+#   - LLM simulé: --llm secondes, interrompu dès que la spéculation est annulée (CancelToken).
+# Compare, pour chaque phrase, fin de parole -> réponse disponible en séquentiel et avec spéculation.
+# Les requêtes LLM abandonnées (partiel modifié ou final différent) sont comptées: c'est le coût,
+# ainsi que celles réellement interrompues avant la fin.
+#
+# Usage: python3 testScripts/bench_speculation.py [--turns 20] [--stt 0.35] [--llm 1.2] [--silhold 0.5]
+#        [--interval-ms 600] [--stable-ms 500] [--pause-ms 200] [--mismatch 0.15] [--scale 0.5]
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+from services.classSpeculation import SpeculativeDispatcher  # noqa: E402
+
+WORDS = ("quelle heure est il dis moi la meteo de demain a paris tu peux raconter une histoire "
+         "courte sur les robots qui aiment danser avec les enfants").split()
+
+
+def make_turn(rng, mismatch):
+    n = rng.randint(3, 9)
+    start = rng.randint(0, len(WORDS) - n)
+    words = WORDS[start:start + n]
+    timeline = []
+    t = 0.0
+    for w in words:
+        t += rng.uniform(0.25, 0.45)
+        if rng.random() < 0.15:
+            t += rng.uniform(0.3, 0.6)  # hésitation
+        timeline.append((t, w))
+    final = list(words)
+    if rng.random() < mismatch:
+        final[-1] = final[-1] + "s"
+    return timeline, " ".join(final)
+
+
+def run_turn(dispatcher, timeline, final_text, args, llm_calls):
+    s = args.scale
+    spoken_end = timeline[-1][0] * s
+    t0 = time.time()
+
+    def heard(at):
+        return " ".join(w for ts, w in timeline if ts * s <= at - t0)
+
+    def stt_partial(at):
+        time.sleep(args.stt * s)
+        return heard(at)
+
+    def llm(text, on_chunk, cancel=None):
+        with llm_lock:
+            llm_calls[0] += 1
+        end = time.time() + args.llm * s
+        while time.time() < end:
+            if cancel is not None and cancel.is_set():
+                with llm_lock:
+                    llm_calls[1] += 1
+                return "", {'cancelled': True}
+            time.sleep(0.01 * s)
+        return "réponse à " + text, {}
+
+    dispatcher.begin_turn(stt_partial, llm)
+    last_voice = t0
+    while True:
+        now = time.time()
+        if now - t0 <= spoken_end:
+            last_voice = now
+        elif now - last_voice > args.silhold * s:
+            break
+        dispatcher.poll(time.time, silence=now - last_voice)
+        time.sleep(0.02 * s)
+    rec_end = time.time()
+    time.sleep(args.stt * s)  # STT final
+    handle = dispatcher.take(final_text)
+    if handle is not None:
+        dispatcher.collect(handle)
+    else:
+        llm(final_text, None)
+    done = time.time()
+    dispatcher.end_turn()
+    sequential = (rec_end - t0 - spoken_end) + args.stt * s + args.llm * s
+    return (done - t0 - spoken_end) / s, sequential / s, handle is not None
+
+
+llm_lock = threading.Lock()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--stt', type=float, default=0.35)
+    parser.add_argument('--llm', type=float, default=1.2)
+    parser.add_argument('--silhold', type=float, default=0.5)
+    parser.add_argument('--interval-ms', type=int, default=600)
+    parser.add_argument('--stable-ms', type=int, default=500)
+    parser.add_argument('--pause-ms', type=int, default=200)
+    parser.add_argument('--mismatch', type=float, default=0.15)
+    parser.add_argument('--scale', type=float, default=0.5)
+    args = parser.parse_args()
+    rng = random.Random(5)
+
+    s = args.scale
+    dispatcher = SpeculativeDispatcher({'speculation': {
+        'enabled': True,
+        'partial_interval_ms': args.interval_ms * s,
+        'stable_ms': args.stable_ms * s,
+        'min_audio_ms': 800 * s,
+        'pause_ms': args.pause_ms * s,
+    }})
+    llm_calls = [0, 0]  # requêtes lancées, requêtes interrompues
+    spec, seq, hits = [], [], 0
+    for _ in range(args.turns):
+        timeline, final_text = make_turn(rng, args.mismatch)
+        with_spec, sequential, hit = run_turn(dispatcher, timeline, final_text, args, llm_calls)
+        spec.append(with_spec)
+        seq.append(sequential)
+        hits += 1 if hit else 0
+    time.sleep(args.llm * s)  # laisse finir les requêtes abandonnées avant de compter
+
+    spec.sort()
+    seq.sort()
+    stats = dispatcher.stats()
+    print("%d tours, STT %.2fs, LLM %.2fs, silence de fin %.2fs, partiels toutes les %d ms, stabilité %d ms"
+          % (args.turns, args.stt, args.llm, args.silhold, args.interval_ms, args.stable_ms))
+    print("Fin de parole -> réponse: séquentiel médiane %.2fs / spéculation médiane %.2fs (max %.2fs / %.2fs)"
+          % (seq[len(seq) // 2], spec[len(spec) // 2], seq[-1], spec[-1]))
+    print("Succès %d/%d (taux %s), partiels %d, envois anticipés %d, abandonnés en cours %d"
+          % (hits, args.turns, stats['hit_rate'], stats['partials'], stats['dispatched'], stats['cancelled']))
+    print("Requêtes LLM: %d pour %d tours (%.0f %% de surcoût, %d interrompues), temps gagné cumulé %.2fs (horloge simulée)"
+          % (llm_calls[0], args.turns, 100.0 * (llm_calls[0] - args.turns) / args.turns, llm_calls[1],
+             stats['saved_seconds'] / s))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# bench_stream_memory.py — mémoire allouée par tour en streaming Ollama (ChatOllama._chat_stream)
+#
+# Serveur /api/chat local qui renvoie --chunks fragments NDJSON (réponse longue), puis chat()
+# en streaming avec le logger de pepperLife (classLog.Logger, sans console) en verbosité --verbosity.
+# tracemalloc mesure le pic et le total alloué pendant le tour (hors serveur: autre thread,
+# mais même processus, donc compté aussi; identique avant/après).
+#
+# Usage: python3 testScripts/bench_stream_memory.py [--chunks 2000] [--turns 5] [--verbosity 2]
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+from services.chatBots.ollama import ChatOllama  # noqa: E402
+from services.classLog import Logger  # noqa: E402
+
+CHUNKS = 2000
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        created = time.strftime('%Y-%m-%dT%H:%M:%SZ')
+        lines = []
+        for i in range(CHUNKS):
+            lines.append(json.dumps({'model': 'bench', 'created_at': created,
+                                     'message': {'role': 'assistant', 'content': 'mot%d ' % i}, 'done': False}))
+        lines.append(json.dumps({'model': 'bench', 'created_at': created, 'message': {'role': 'assistant', 'content': ''},
+                                 'done': True, 'done_reason': 'stop', 'total_duration': 1, 'prompt_eval_count': 50,
+                                 'prompt_eval_duration': 1000000, 'eval_count': CHUNKS, 'eval_duration': 1000000000}))
+        self.wfile.write(("\n".join(lines) + "\n").encode('utf-8'))
+
+
+def main():
+    global CHUNKS
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunks', type=int, default=2000)
+    parser.add_argument('--turns', type=int, default=5)
+    parser.add_argument('--verbosity', type=int, default=2)
+    parser.add_argument('--port', type=int, default=11599)
+    args = parser.parse_args()
+    CHUNKS = args.chunks
+
+    httpd = HTTPServer(('127.0.0.1', args.port), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    logger = Logger(verbosity=args.verbosity, console=False)
+    config = {'log': {'verbosity': args.verbosity},
+              'ollama': {'server': 'http://127.0.0.1:%d' % args.port, 'chat_model': 'bench', 'stream': True,
+                         'timeout': 30}}
+    client = ChatOllama(config, system_prompt="Tu es Pepper.", logger=logger)
+    client.chat("échauffement", [])
+
+    peaks, totals, times = [], [], []
+    for _ in range(args.turns):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        text, raw = client.chat("Raconte une longue histoire.", [])
+        times.append(time.perf_counter() - t0)
+        snapshot = tracemalloc.take_snapshot()
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        totals.append(sum(stat.size for stat in snapshot.statistics('filename')))
+        del text, raw
+    print("%d fragments/tour, verbosité %d: pic %.0f Ko, retenu en fin de tour %.0f Ko, durée %.0f ms (médianes sur %d tours)" % (
+        args.chunks, args.verbosity, sorted(peaks)[len(peaks) // 2] / 1024.0, sorted(totals)[len(totals) // 2] / 1024.0,
+        1000 * sorted(times)[len(times) // 2], args.turns))
+    httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
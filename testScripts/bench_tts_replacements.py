@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# bench_tts_replacements.py — compare l'application des remplacements TTS
+#   1) ancien code: un re.sub par entrée (\b mot \b)
+#   2) alternance simple compilée une fois (mots triés du plus long au plus court)
+#   3) TTSReplacementMap (regex factorisée en trie, utilisée par classSpeak)
+# sur une carte synthétique (5000 entrées par défaut) et des réponses LLM typiques.
+#
+# Usage: python3 testScripts/bench_tts_replacements.py [nb_entrées] [nb_phrases]
+
+import os
+import re
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+from services.classSpeak import TTSReplacementMap  # noqa: E402
+
+SENTENCES = [
+    "Bonjour, je suis Pepper et je suis ravi de te voir aujourd'hui !",
+    "^start(animations/Stand/Gestures/Explain_1) L'IA générative permet de créer du texte. ^wait(animations/Stand/Gestures/Explain_1)",
+    "Il fait beau à Paris, tu veux que je te raconte une blague ?",
+    "Je peux lever le bras, tourner la tête et parler plusieurs langues.",
+    "^start(animations/Stand/Gestures/Hey_1) Salut ! Comment vas-tu ? ^wait(animations/Stand/Gestures/Hey_1)",
+]
+
+
+def random_word(rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return "".join(rng.choice(letters) for _ in range(rng.randint(3, 12)))
+
+
+def make_map(n, rng):
+    mapping = {"Pepper": "Pèpeur", "IA": "i a", "Paris": "Pari", "blague": "blague"}
+    while len(mapping) < n:
+        mapping[random_word(rng)] = random_word(rng)
+    return mapping
+
+
+def legacy_apply(mapping, text):
+    updated = text
+    for original, replacement in mapping.items():
+        updated = re.sub(r'\b{}\b'.format(re.escape(original)), replacement, updated)
+    return updated
+
+
+def make_alternation(mapping):
+    words = sorted(mapping, key=len, reverse=True)
+    regex = re.compile(r'(?<!\w)(?:{})(?!\w)'.format('|'.join(re.escape(w) for w in words)))
+    return lambda text: regex.sub(lambda m: mapping[m.group(0)], text)
+
+
+def bench(label, fn, texts, rounds):
+    t0 = time.time()
+    for _ in range(rounds):
+        out = [fn(t) for t in texts]
+    dt = time.time() - t0
+    per_call = dt / (rounds * len(texts)) * 1000.0
+    print("%-30s %8.3fs  (%.3f ms/phrase)" % (label, dt, per_call))
+    return out, dt
+
+
+def main():
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_texts = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(42)
+    mapping = make_map(n_entries, rng)
+    texts = [rng.choice(SENTENCES) for _ in range(n_texts)]
+
+    fd, path = tempfile.mkstemp(prefix="tts_map_", suffix=".txt")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for k, v in mapping.items():
+                f.write("%s=%s\n" % (k, v))
+
+        t0 = time.time()
+        alternation = make_alternation(mapping)
+        t_alt_build = time.time() - t0
+        t0 = time.time()
+        tts_map = TTSReplacementMap(path)
+        t_trie_build = time.time() - t0
+        print("Carte: %d entrées, %d phrases" % (len(mapping), len(texts)))
+        print("Compilation: alternance %.3fs, trie %.3fs (rechargement inclus)" % (t_alt_build, t_trie_build))
+
+        legacy, t_legacy = bench("ancien (re.sub par entrée)", lambda t: legacy_apply(mapping, t), texts[:20], 1)
+        _, t_alt = bench("alternance compilée", alternation, texts, 5)
+        trie, t_trie = bench("TTSReplacementMap (trie)", tts_map.apply, texts, 5)
+
+        # Hors balises ^start/^wait, les résultats doivent être identiques à l'ancien code
+        mismatches = sum(1 for a, b in zip(legacy, trie[:20]) if a != b and '^' not in a)
+        print("Écarts (phrases sans balises): %d" % mismatches)
+        per_legacy = t_legacy / 20
+        per_trie = t_trie / (5 * len(texts))
+        print("Gain par phrase: x%.0f" % (per_legacy / max(per_trie, 1e-9)))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# bench_vision_profiles.py — image envoyée par Vision.vision_chat selon le profil (vision.profile)
+#
+# Image VGA synthétique (ou --image photo.png/jpg si Pillow est installé) passée à
+# Vision.prepare_request_image pour chaque profil: taille envoyée, octets base64, temps d'encodage.
+# Avec --live (clé OpenAI dans l'environnement), envoie aussi la requête et mesure le tour complet
+# (encodage + requête) et les tokens d'entrée facturés.
+#
+# Usage: python3 testScripts/bench_vision_profiles.py [--profiles low,high,full] [--image photo.jpg] [--live]
+
+import os
+import sys
+import time
+import base64
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from services.classCameraBus import CameraFrame  # noqa: E402
+from services.classVision import Vision  # noqa: E402
+from bench_image_encode import synthetic_frame  # noqa: E402
+
+
+def load_frame(path):
+    if not path:
+        return 640, 480, synthetic_frame(640, 480)
+    from PIL import Image
+    img = Image.open(path).convert('RGB')
+    return img.width, img.height, img.tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', default='low,high,full')
+    parser.add_argument('--image')
+    parser.add_argument('--live', action='store_true')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    frame = load_frame(args.image)
+    config = {'vision': {'model': 'gpt-4o-mini', 'system_prompt': "Décris l'image en une phrase.", 'triggers': []},
+              'openai': {'api_key': os.getenv('OPENAI_API_KEY')}}
+    vision = Vision(config, None, lambda msg, **kwargs: None)
+    for name in args.profiles.split(','):
+        config['vision']['profile'] = name
+        times = []
+        for run in range(args.runs):
+            # Nouvelle image à chaque essai: l'encodage est mis en cache par image
+            data, mime, info = vision.prepare_request_image(CameraFrame(run + 1, time.time(), 0, *frame))
+            times.append(info['encode_ms'])
+        line = "%-5s %s -> %-8s %-10s %7.1f Ko (base64 %7.1f Ko)  encodage %6.1f ms  detail %s" % (
+            name, info['source'], info['sent'], mime, len(data) / 1024.0, len(base64.b64encode(data)) / 1024.0,
+            sorted(times)[len(times) // 2], info['detail'])
+        if args.live:
+            t0 = time.time()
+            vision.vision_chat("Que vois-tu ?", b'', [], frame=CameraFrame(0, time.time(), 0, *frame))
+            line += "  tour complet %5.0f ms" % (1000 * (time.time() - t0))
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# bench_wakeword.py — mot d'éveil MFCC + DTW (WakeWordSpotter): coût CPU et latence de détection
+#
+# À lancer sur le robot (Atom) pour des chiffres représentatifs; tourne aussi sur PC.
+#   - gabarits: WAV 16 kHz mono de templates_dir, sinon mot synthétique à deux syllabes;
+#   - flux de test: 60 s de bruit de salon + mots cibles + mots intrus + claquements,
+#     envoyé par blocs de 170 ms comme ALAudioDevice;
+#   - mesures: ms CPU par seconde d'audio (silence seul et flux chargé), latence fin du mot -> détection,
+#     détections manquées et fausses alertes.
+#
+# Usage: python3 testScripts/bench_wakeword.py [templates_dir] [--seconds 60] [--threshold X]
+
+import os
+import sys
+import math
+import time
+import random
+import struct
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+from services.classWakeWord import WakeWordSpotter, DEFAULT_THRESHOLD  # noqa: E402
+
+SR = 16000
+CHUNK = 2720  # échantillons par bloc (170 ms)
+
+
+def _pcm(values):
+    return struct.pack('<%dh' % len(values), *[max(-32768, min(32767, int(v))) for v in values])
+
+
+def _wav(values):
+    import io
+    import wave
+    buf = io.BytesIO()
+    wf = wave.open(buf, 'wb')
+    wf.setnchannels(1)
+    wf.setsampwidth(2)
+    wf.setframerate(SR)
+    wf.writeframes(_pcm(values))
+    wf.close()
+    return buf.getvalue()
+
+
+def synth_word(rng, syllables, speed=1.0, pitch=1.0, gain=6000.0):
+    """Syllabes voisées: harmoniques de f0 filtrées par deux formants (F1, F2) + attaque bruitée."""
+    out = []
+    for f1, f2, dur in syllables:
+        n = int(SR * dur / speed)
+        f0 = 140.0 * pitch
+        burst = int(0.015 * SR)
+        harmonics = [(h, math.exp(-((h * f0 - f1) / 180.0) ** 2) + 0.6 * math.exp(-((h * f0 - f2) / 250.0) ** 2))
+                     for h in range(1, int(3800 / f0))]
+        phase = 0.0
+        for i in range(n):
+            t = i / float(SR)
+            env = math.sin(math.pi * i / n) ** 0.6
+            phase += 2 * math.pi * f0 * (1.0 + 0.05 * math.sin(2 * math.pi * 4 * t)) / SR
+            v = sum(a * math.sin(h * phase) for h, a in harmonics)
+            if i < burst:
+                v += rng.gauss(0, 1.5)
+            out.append(gain * env * v / 2.0)
+        out.extend([0.0] * int(0.04 * SR / speed))
+    return out
+
+
+TARGET = [(450, 1900, 0.16), (500, 1300, 0.22)]                 # "pé-peur"
+IMPOSTORS = [
+    [(400, 800, 0.18), (300, 2200, 0.25)],                       # "bon-jour"
+    [(550, 1700, 0.20), (280, 2300, 0.18)],                      # "mer-ci"
+    [(700, 1200, 0.30)],                                         # "ah"
+    [(300, 2300, 0.12), (500, 1000, 0.14), (650, 1500, 0.2)],    # trois syllabes
+]
+
+
+def variant(rng, syllables):
+    return synth_word(rng, syllables, speed=rng.uniform(0.88, 1.12), pitch=rng.uniform(0.85, 1.2),
+                      gain=rng.uniform(3000, 9000))
+
+
+def make_stream(rng, seconds):
+    """Bruit de fond + événements espacés. Retourne (échantillons, [(fin_s, 'target'|'impostor'|'clap')])."""
+    samples = [rng.gauss(0, 60) for _ in range(int(seconds * SR))]
+    events = []
+    t = 1.0
+    while t < seconds - 2.0:
+        kind = rng.choice(['target', 'target', 'impostor', 'impostor', 'clap'])
+        if kind == 'target':
+            word = variant(rng, TARGET)
+        elif kind == 'impostor':
+            word = variant(rng, rng.choice(IMPOSTORS))
+        else:
+            word = [rng.gauss(0, 15000) * math.exp(-i / 150.0) for i in range(int(0.05 * SR))]
+        start = int(t * SR)
+        for i, v in enumerate(word):
+            if start + i < len(samples):
+                samples[start + i] += v
+        events.append(((start + len(word)) / float(SR), kind))
+        t += len(word) / float(SR) + rng.uniform(1.0, 2.5)
+    return samples, events
+
+
+def run_stream(spotter, samples):
+    detections = []
+    cpu = 0.0
+    for start in range(0, len(samples), CHUNK):
+        buf = _pcm(samples[start:start + CHUNK])
+        t0 = time.process_time()
+        hit = spotter.process(buf)
+        cpu += time.process_time() - t0
+        if hit:
+            detections.append((start + CHUNK) / float(SR) + (time.process_time() - t0))
+    return detections, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('templates_dir', nargs='?')
+    parser.add_argument('--seconds', type=float, default=60.0)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+    rng = random.Random(3)
+
+    spotter = WakeWordSpotter({'wakeword': {'enabled': True, 'threshold': args.threshold,
+                                            'templates_dir': args.templates_dir or '/nonexistent'}})
+    if not spotter.templates:
+        t0 = time.process_time()
+        for _ in range(4):
+            spotter.enroll(_wav(variant(rng, TARGET)), save=False)
+        print("4 gabarits synthétiques enregistrés en %.0f ms" % (1000 * (time.process_time() - t0)))
+    print("Gabarits: %d, seuil %.2f" % (len(spotter.templates), spotter.threshold))
+
+    silence = [rng.gauss(0, 60) for _ in range(int(10 * SR))]
+    _, cpu_idle = run_stream(spotter, silence)
+    print("Silence: %.2f ms CPU par seconde d'audio" % (1000 * cpu_idle / 10.0))
+
+    samples, events = make_stream(rng, args.seconds)
+    spotter._reset_stream()
+    detections, cpu = run_stream(spotter, samples)
+    print("Flux chargé (%d événements sur %.0f s): %.2f ms CPU par seconde d'audio (%.1f %% d'un cœur)"
+          % (len(events), args.seconds, 1000 * cpu / args.seconds, 100 * cpu / args.seconds))
+
+    latencies, missed, false_alarms = [], 0, 0
+    remaining = list(detections)
+    for end, kind in events:
+        hit = next((d for d in remaining if end - 0.3 <= d <= end + 1.5), None)
+        if hit is not None:
+            remaining.remove(hit)
+            if kind == 'target':
+                latencies.append(hit - end)
+            else:
+                false_alarms += 1
+        elif kind == 'target':
+            missed += 1
+    false_alarms += len(remaining)
+    targets = sum(1 for _e, k in events if k == 'target')
+    print("Cibles détectées: %d/%d, fausses alertes: %d (intrus + claquements: %d)"
+          % (targets - missed, targets, false_alarms, len(events) - targets))
+    if latencies:
+        latencies.sort()
+        print("Latence fin du mot -> détection: médiane %.0f ms, max %.0f ms"
+              % (1000 * latencies[len(latencies) // 2], 1000 * latencies[-1]))
+    print("Candidats DTW: %d, dernier score %s" % (spotter.stats_data['candidates'], spotter.stats_data['last_score']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# eval_speech_gate.py — rejoue des clips WAV dans le filtre pré-STT (SpeechGate) pour chaque niveau
+#
+# Étiquettes déduites du chemin: dossier ou nom contenant "speech"/"parole" -> parole,
+# "noise"/"bruit" -> bruit. Les clips copiés par audio.nonspeech_dump_dir sont nommés
+# <ts>_<accept|raison>.wav (décision en ligne, pas une étiquette): les trier à l'écoute
+# dans speech/ et noise/ avant de rejouer. Sans dossier, un jeu synthétique est généré.
+#
+# Usage: python3 testScripts/eval_speech_gate.py [dossier_wav] [-v]
+
+import os
+import sys
+import math
+import time
+import random
+import struct
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pepperLife'))
+from services.classSpeechGate import LEVELS, analyze_pcm, classify, pcm_from_wav  # noqa: E402
+
+SR = 16000
+
+
+def _pcm(values):
+    return struct.pack('<%dh' % len(values), *[max(-32768, min(32767, int(v))) for v in values])
+
+
+def synth_speech(rng, seconds):
+    """Voyelles synthétiques: fondamentale + harmoniques, enveloppe syllabique, pauses."""
+    out = []
+    f0 = rng.uniform(100, 220)
+    for i in range(int(SR * seconds)):
+        t = i / float(SR)
+        env = max(0.0, math.sin(2 * math.pi * 3.5 * t)) ** 0.5
+        v = sum(math.sin(2 * math.pi * f0 * h * t) / h for h in range(1, 8))
+        out.append(6000 * env * v + rng.gauss(0, 150))
+    return _pcm(out)
+
+
+def synth_noise(rng, seconds):
+    return _pcm([rng.gauss(0, 5000) for _ in range(int(SR * seconds))])
+
+
+def synth_clap(rng, seconds):
+    """Impulsion brève (claquement, porte) suivie d'un silence bruité."""
+    out = [rng.gauss(0, 100) for _ in range(int(SR * seconds))]
+    start = int(SR * 0.1)
+    for i in range(int(SR * 0.03)):
+        out[start + i] += rng.gauss(0, 20000) * math.exp(-i / 80.0)
+    return _pcm(out)
+
+
+def synthetic_set():
+    rng = random.Random(7)
+    clips = []
+    for k in range(6):
+        clips.append(('synth/speech_%d' % k, 'speech', synth_speech(rng, rng.uniform(0.8, 3.0))))
+        clips.append(('synth/noise_%d' % k, 'noise', synth_noise(rng, rng.uniform(0.5, 2.0))))
+        clips.append(('synth/clap_%d' % k, 'noise', synth_clap(rng, rng.uniform(0.4, 1.2))))
+    clips.append(('synth/click', 'noise', synth_clap(rng, 0.15)))
+    return clips
+
+
+def label_for(path):
+    low = path.lower()
+    if 'speech' in low or 'parole' in low:
+        return 'speech'
+    if 'noise' in low or 'bruit' in low:
+        return 'noise'
+    return None
+
+
+def load_dir(root):
+    clips = []
+    for dirpath, _dirs, files in os.walk(root):
+        for name in sorted(files):
+            if name.lower().endswith('.wav'):
+                path = os.path.join(dirpath, name)
+                with open(path, 'rb') as f:
+                    raw, sr = pcm_from_wav(f.read())
+                if sr != SR:
+                    print("Ignoré (%d Hz): %s" % (sr, path))
+                    continue
+                clips.append((os.path.relpath(path, root), label_for(path), raw))
+    return clips
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('-')]
+    verbose = '-v' in sys.argv
+    clips = load_dir(args[0]) if args else synthetic_set()
+    if not clips:
+        print("Aucun clip WAV 16 kHz trouvé.")
+        return
+
+    t0 = time.time()
+    analyzed = [(name, label, analyze_pcm(raw, SR), len(raw) / 2.0 / SR) for name, label, raw in clips]
+    cost = time.time() - t0
+    audio_s = sum(a[3] for a in analyzed)
+    print("%d clips, %.1f s d'audio, analyse %.1f ms au total (%.2f ms par seconde d'audio)"
+          % (len(analyzed), audio_s, 1000 * cost, 1000 * cost / max(audio_s, 1e-9)))
+
+    if verbose:
+        for name, label, feats, _dur in analyzed:
+            print("  %-32s %-6s durée %.2fs voisé %.2f platitude %.2f crête %5.1f -> %s" % (
+                name, label or '?', feats['duration'], feats['voiced_ratio'], feats['flatness'], feats['crest'],
+                ' / '.join('%d:%s' % (lvl, classify(feats, lvl) or 'ok') for lvl in sorted(LEVELS))))
+
+    print("%-7s %9s %9s %14s %14s" % ("niveau", "acceptés", "rejetés", "parole perdue", "bruit rejeté"))
+    for level in sorted(LEVELS):
+        decisions = [(label, classify(feats, level)) for _name, label, feats, _dur in analyzed]
+        rejected = sum(1 for _l, r in decisions if r)
+        speech = [r for l, r in decisions if l == 'speech']
+        noise = [r for l, r in decisions if l == 'noise']
+        lost = "%d/%d" % (sum(1 for r in speech if r), len(speech)) if speech else "-"
+        caught = "%d/%d" % (sum(1 for r in noise if r), len(noise)) if noise else "-"
+        print("%-7d %9d %9d %14s %14s" % (level, len(decisions) - rejected, rejected, lost, caught))
+
+
+if __name__ == '__main__':
+    main()